@@ -1,5 +1,9 @@
 # agents/__init__.py
 
+import os
+import threading
+import weakref
+from loguru import logger
 from .summarize_tool import SummarizeTool
 from .write_article_tool import WriteArticleTool
 from .sanitize_data_tool import SanitizeDataTool
@@ -9,25 +13,238 @@ from .sanitize_data_validator_agent import SanitizeValidatorAgent
 from .refiner_agent import RefinerAgent # New import
 from .validator_agent import ValidatorAgent  # New import
 from .chatbot_agent import ChatbotAgent
+from .generation_profile import GenerationProfile
+from .agent_base import DEFAULT_MODEL, run_async, warm_model
+from .async_agent_base import AsyncAgentBase
+from .pipeline import AgentPipeline
+from .response_cache import ResponseCache
+from .phi_rules import PHIRuleEngine
+from .chunking import TextChunker
+from .csv_sanitizer import CSVSanitizer, sanitize_csv
+from .rlhf_state import RLHFStateStore, RLHFStateMixin
+from .backend_pool import BackendPool, BackendUnavailableError
+from .retry_policy import RetryPolicy, HedgePolicy, EmptyResponseError
+from .scheduler import RequestScheduler, SchedulerRejectedError, PRIORITY_CLASSES
+from .metrics import metrics, start_metrics_server
+from .structured_validation import VALIDATION_SCHEMA, parse_validation, StructuredValidatorMixin
+from .retrieval import RetrievalMixin
+from .conversation import ConversationManager
+from .prompts import PromptTemplate, PromptRegistry, prompts
+from .heuristic_validation import SanitizeHeuristics, SummaryHeuristics
+
+
+def __getattr__(name):
+    # SemanticIndex needs numpy; import it on first use so `import agents` stays light
+    if name == "SemanticIndex":
+        from .semantic_index import SemanticIndex
+        return SemanticIndex
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Scheduler priority class of each agent: chat first, long article generations last
+AGENT_PRIORITIES = {
+    "chatbot": "chat",
+    "sanitize_data": "sanitize",
+    "sanitize_data_validator": "sanitize",
+    "summarize": "summarize",
+    "summarize_validator": "summarize",
+    "validator": "summarize",
+    "write_article": "article",
+    "write_article_validator": "article",
+    "refiner": "article",
+}
+
+
+# Validators that try VALIDATOR_DRAFT_MODEL first and escalate to their own model only when needed
+CASCADE_VALIDATORS = ("summarize_validator", "sanitize_data_validator")
+
+
+def parse_model_map(value):
+    """
+    Parses "agent=model,agent=model" (e.g. the AGENT_MODELS variable) into a dict.
+    """
+    models = {}
+    for item in (value or "").split(","):
+        agent_name, _, model = item.partition("=")
+        if agent_name.strip() and model.strip():
+            models[agent_name.strip()] = model.strip()
+    return models
+
+
+# Agent name -> factory; agents are built on first use so startup does not pay for all of them
+AGENT_FACTORIES = {
+    "summarize": SummarizeTool,
+    "write_article": WriteArticleTool,
+    "sanitize_data": SanitizeDataTool,
+    "summarize_validator": SummarizeValidatorAgent,
+    "write_article_validator": WriteArticleValidatorAgent,
+    "sanitize_data_validator": SanitizeValidatorAgent,
+    "refiner": RefinerAgent,
+    "validator": ValidatorAgent,
+    "chatbot": ChatbotAgent,
+}
+
+
+def _weak_collector(manager):
+    reference = weakref.ref(manager)
+
+    def collect():
+        manager = reference()
+        return manager.collect_metrics() if manager is not None else []
+    return collect
 
 
 class AgentManager:
-    def __init__(self, max_retries=2, verbose=True):
-        self.agents = {
-            "summarize": SummarizeTool(max_retries=max_retries, verbose=verbose),
-            "write_article": WriteArticleTool(max_retries=max_retries, verbose=verbose),
-            "sanitize_data": SanitizeDataTool(max_retries=max_retries, verbose=verbose),
-            "summarize_validator": SummarizeValidatorAgent(max_retries=max_retries, verbose=verbose),
-            "write_article_validator": WriteArticleValidatorAgent(max_retries=max_retries, verbose=verbose),
-            "sanitize_data_validator": SanitizeValidatorAgent(max_retries=max_retries, verbose=verbose),
-            "refiner": RefinerAgent(max_retries=max_retries, verbose=verbose),      # New agent
-            "validator": ValidatorAgent(max_retries=max_retries, verbose=verbose) , # New agent
-            "chatbot": ChatbotAgent(max_retries=max_retries, verbose=verbose)       # New agent
-        }
+    def __init__(self, max_retries=2, verbose=True, cache=None, state_store=None, host=None, warm_up=False,
+                 backends=None, hedge=False, scheduler=None, semantic_index=None, models=None, draft_models=None):
+        self.max_retries = max_retries
+        self.verbose = verbose
+        self.factories = dict(AGENT_FACTORIES)
+        # Agents instantiated so far; get_agent fills this on first use
+        self.agents = {}
+        self._agents_lock = threading.Lock()
+        # All agents share one response cache so identical calls are answered once
+        self.cache = cache
+        # RLHF-tuned agents warm-start from, and persist to, the shared state store
+        self.state_store = state_store
+        # Every agent talks to the same Ollama server through the shared, pooled client
+        self.host = host
+        # Per-agent models (AGENT_MODELS); agents not listed keep OLLAMA_MODEL
+        self.models = parse_model_map(os.getenv("AGENT_MODELS")) if models is None else dict(models)
+        # Small models the validators try first (VALIDATOR_DRAFT_MODEL for the cascade validators)
+        if draft_models is None:
+            draft_model = os.getenv("VALIDATOR_DRAFT_MODEL")
+            draft_models = {agent_name: draft_model for agent_name in CASCADE_VALIDATORS} if draft_model else {}
+        self.draft_models = dict(draft_models)
+        # Past rated examples serve as few-shot exemplars and a semantic cache for the generators
+        self.semantic_index = semantic_index
+        # Several Ollama servers (a BackendPool, a host list or OLLAMA_HOSTS) share the load instead
+        if backends is None:
+            backends = BackendPool.from_env(os.getenv("OLLAMA_HOSTS"))
+        elif not isinstance(backends, BackendPool):
+            backends = BackendPool(backends)
+        self.backend_pool = backends
+        if backends is not None:
+            backends.start_health_checks()
+        # Hedging duplicates requests that are slower than the agent's recent p95 on a second host
+        self.hedge = hedge
+        # One scheduler orders every agent's Ollama calls by priority and caps them per model
+        self.scheduler = scheduler or RequestScheduler()
+        # Live state (queues, backends, cache) is read into the metrics at export time. The collector
+        # holds the manager weakly, so registering it neither keeps the manager alive nor outlives it.
+        self._collector = _weak_collector(self)
+        metrics.add_collector(self._collector)
+        weakref.finalize(self, metrics.remove_collector, self._collector)
+        if warm_up:
+            # Load the models in the background so construction stays instant
+            threading.Thread(target=self.warm_up, name="ollama-warm-up", daemon=True).start()
+
+    def close(self):
+        """
+        Stops reporting this manager's state in the metrics and stops the backend health checks.
+        """
+        metrics.remove_collector(self._collector)
+        if self.backend_pool is not None:
+            self.backend_pool.stop_health_checks()
+
+    def register_agent(self, agent_name, factory):
+        """
+        Registers (or replaces) a factory called as factory(max_retries=..., verbose=...) on first use.
+        """
+        with self._agents_lock:
+            self.factories[agent_name] = factory
+            self.agents.pop(agent_name, None)
+
+    def _build_agent(self, agent_name):
+        agent = self.factories[agent_name](max_retries=self.max_retries, verbose=self.verbose)
+        agent.cache = self.cache
+        if agent_name in self.models:
+            agent.model = self.models[agent_name]
+        if agent_name in self.draft_models and isinstance(agent, StructuredValidatorMixin):
+            agent.draft_model = self.draft_models[agent_name]
+        if self.state_store is not None and isinstance(agent, RLHFStateMixin):
+            agent.attach_state_store(self.state_store)
+        if self.semantic_index is not None and isinstance(agent, RetrievalMixin):
+            agent.attach_semantic_index(self.semantic_index)
+        if self.host is not None:
+            agent.host = self.host
+        if self.backend_pool is not None:
+            agent.backend_pool = self.backend_pool
+        if self.hedge:
+            agent.hedge_policy = HedgePolicy()
+        agent.scheduler = self.scheduler
+        agent.priority = AGENT_PRIORITIES.get(agent_name, "summarize")
+        return agent
+
+    def collect_metrics(self):
+        """
+        Returns gauge samples (name, labels, value) for the scheduler, backend pool and response cache.
+        """
+        samples = []
+        scheduler_stats = self.scheduler.stats()
+        for priority, depth in scheduler_stats["queued"].items():
+            samples.append(("scheduler_queue_depth", {"priority": priority}, depth))
+        for priority, wait in scheduler_stats["mean_wait"].items():
+            samples.append(("scheduler_mean_wait_seconds", {"priority": priority}, wait))
+        for model, in_flight in scheduler_stats["in_flight"].items():
+            samples.append(("scheduler_in_flight", {"model": model}, in_flight))
+        samples.append(("scheduler_rejected_requests", {}, scheduler_stats["rejected"]))
+        samples.append(("scheduler_timed_out_requests", {}, scheduler_stats["timed_out"]))
+        if self.backend_pool is not None:
+            for backend in self.backend_pool.stats():
+                labels = {"host": backend["host"]}
+                samples.append(("backend_outstanding_requests", labels, backend["outstanding"]))
+                samples.append(("backend_circuit_open", labels, int(backend["circuit_open"])))
+                if backend["latency"] is not None:
+                    samples.append(("backend_latency_seconds", labels, backend["latency"]))
+        if self.cache is not None:
+            cache_stats = self.cache.stats()
+            samples.append(("response_cache_entries", {}, cache_stats["memory_entries"]))
+            samples.append(("response_cache_hit_rate", {}, cache_stats["hit_rate"]))
+        return samples
+
+    def model_names(self):
+        """
+        Returns the distinct models the agents use, including validator draft models, without building any agent.
+        """
+        models = []
+        for agent_name, factory in list(self.factories.items()):
+            agent = self.agents.get(agent_name)
+            if agent is not None:
+                names = [agent.model, getattr(agent, "draft_model", None)]
+            else:
+                cascades = isinstance(factory, type) and issubclass(factory, StructuredValidatorMixin)
+                names = [self.models.get(agent_name, DEFAULT_MODEL), self.draft_models.get(agent_name) if cascades else None]
+            models.extend(name for name in names if name and name not in models)
+        return models
+
+    def warm_up(self):
+        """
+        Pre-loads every distinct (host, model) used by the agents and returns the load time of each.
+
+        Only sends load requests; agents are still built on first use.
+        """
+        timings = {}
+        hosts = self.backend_pool.hosts if self.backend_pool is not None else [self.host]
+        for host in hosts:
+            for model in self.model_names():
+                try:
+                    timings[(host, model)] = warm_model(model, host)
+                    if self.verbose:
+                        logger.info(f"[AgentManager] Pre-warmed {model} on {host or 'default host'} "
+                                    f"in {timings[(host, model)]:.2f}s.")
+                except Exception as e:
+                    logger.warning(f"[AgentManager] Could not pre-warm {model} on {host or 'default host'}: {e}")
+                    timings[(host, model)] = None
+        return timings
 
     def get_agent(self, agent_name, **kwargs):
         agent = self.agents.get(agent_name)
-        if not agent:
-            raise ValueError(f"Agent '{agent_name}' not found.")
+        if agent is not None:
+            return agent
+        with self._agents_lock:
+            agent = self.agents.get(agent_name)
+            if agent is None:
+                if agent_name not in self.factories:
+                    raise ValueError(f"Agent '{agent_name}' not found.")
+                agent = self.agents[agent_name] = self._build_agent(agent_name)
         return agent
-
@@ -1,70 +1,563 @@
-
-
 # agents/agent_base.py
 
+import asyncio
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import asynccontextmanager, contextmanager
+import httpx
 import ollama
 from abc import ABC, abstractmethod
 from loguru import logger
+from utils.logger import redact, request_context
+from .generation_profile import GenerationProfile
+from .metrics import metrics, record_usage
+from .retry_policy import EmptyResponseError, RetryPolicy
+
+# Connection settings for the managed Ollama clients
+OLLAMA_HOST = os.getenv("OLLAMA_HOST")  # None uses the library default (http://localhost:11434)
+OLLAMA_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "300"))  # Seconds per request (generation included)
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5"))
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "16"))
+# Model used by agents that are not configured otherwise
+DEFAULT_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2:3b")
+
+# How long Ollama keeps a model loaded after a call, unless an agent's profile says otherwise
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+_clients = {}
+_clients_lock = threading.Lock()
+# httpx async connection pools are bound to the event loop that created them,
+# so each loop (e.g. one per asyncio.run in a Streamlit rerun) gets its own clients;
+# run_async closes them before its loop ends.
+_async_clients = weakref.WeakKeyDictionary()
+_hedge_pool = None
+
+
+def _client_options():
+    return {
+        "timeout": httpx.Timeout(OLLAMA_TIMEOUT, connect=OLLAMA_CONNECT_TIMEOUT),
+        "limits": httpx.Limits(
+            max_connections=OLLAMA_MAX_CONNECTIONS,
+            max_keepalive_connections=OLLAMA_MAX_CONNECTIONS,
+            keepalive_expiry=60
+        ),
+    }
+
+
+def get_client(host=None):
+    """
+    Returns the process-wide ollama.Client for `host`, sharing one pooled HTTP connection pool.
+    """
+    host = host or OLLAMA_HOST
+    with _clients_lock:
+        client = _clients.get(host)
+        if client is None:
+            client = ollama.Client(host=host, **_client_options())
+            _clients[host] = client
+        return client
+
+
+def get_async_client(host=None):
+    """
+    Returns the ollama.AsyncClient for `host` on the running event loop.
+    """
+    host = host or OLLAMA_HOST
+    loop_clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    client = loop_clients.get(host)
+    if client is None:
+        client = ollama.AsyncClient(host=host, **_client_options())
+        loop_clients[host] = client
+    return client
+
+
+async def close_async_clients():
+    """
+    Closes the running event loop's async clients and their connections.
+    """
+    for client in _async_clients.pop(asyncio.get_running_loop(), {}).values():
+        await client._client.aclose()
+
+
+def run_async(coroutine):
+    """
+    asyncio.run for code using the managed async clients: their connections are closed before the loop is.
+    """
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await close_async_clients()
+
+    return asyncio.run(main())
+
+
+def _hedge_executor():
+    # Threads running the two sides of hedged synchronous requests
+    global _hedge_pool
+    with _clients_lock:
+        if _hedge_pool is None:
+            _hedge_pool = ThreadPoolExecutor(max_workers=OLLAMA_MAX_CONNECTIONS * 2, thread_name_prefix="ollama-hedge")
+        return _hedge_pool
+
+
+class LlamaStream:
+    """
+    Iterator over the token chunks of a streamed Ollama reply.
+
+    Iterating yields the content chunks as they arrive. Once exhausted,
+    `text` holds the aggregated reply and `stats` the timing statistics,
+    which are also recorded in the metrics unless `record_metrics` is False.
+    Its log lines carry `request_id`, the correlation ID of the call that started it.
+    """
+
+    def __init__(self, chunks, agent_name, started_at, verbose=False, on_complete=None, record_metrics=True,
+                 request_id=None):
+        self._chunks = chunks
+        self.request_id = request_id
+        self.agent_name = agent_name
+        self.started_at = started_at
+        self.verbose = verbose
+        self.on_complete = on_complete
+        self.record_metrics = record_metrics
+        self.parts = []
+        self.stats = {}
+        self.done = False
+
+    def __iter__(self):
+        first_token_at = None
+        final_chunk = None
+        try:
+            for chunk in self._chunks:
+                content = chunk.get("message", {}).get("content", "")
+                if content:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    self.parts.append(content)
+                    yield content
+                if chunk.get("done"):
+                    final_chunk = chunk
+        except Exception:
+            if self.record_metrics:
+                metrics.inc("ollama_requests_total", agent=self.agent_name, mode="stream", outcome="error")
+            raise
+
+        finished_at = time.perf_counter()
+        self.stats = {
+            "time_to_first_token": (first_token_at - self.started_at) if first_token_at else None,
+            "total_time": finished_at - self.started_at,
+        }
+        if final_chunk is not None:
+            for key in ("prompt_eval_count", "eval_count", "eval_duration", "load_duration", "total_duration"):
+                self.stats[key] = final_chunk.get(key)
+        self.done = True
+
+        if self.record_metrics:
+            outcome = "success" if self.text else "error"
+            metrics.inc("ollama_requests_total", agent=self.agent_name, mode="stream", outcome=outcome)
+            metrics.observe("ollama_request_seconds", self.stats["total_time"], agent=self.agent_name, mode="stream")
+            if first_token_at is not None:
+                metrics.observe("ollama_time_to_first_token_seconds", self.stats["time_to_first_token"], agent=self.agent_name)
+            if final_chunk is not None:
+                record_usage(self.agent_name, final_chunk)
+
+        if not self.text:
+            raise EmptyResponseError("Received empty response from Ollama.")
+
+        if self.verbose:
+            with request_context(self.request_id):
+                logger.bind(sample=True).debug(f"[{self.agent_name}] Streamed response: {redact(self.text)}")
+                logger.info(f"[{self.agent_name}] Stream stats: {self.stats}")
+
+        if self.on_complete is not None:
+            self.on_complete(self.text)
+
+    @property
+    def text(self):
+        return "".join(self.parts).strip()
+
+
+def in_request_context(chunks, request_id):
+    """
+    Runs each step of the generator `chunks` inside request_context(request_id).
+
+    A context entered once around a generator's body would stay set in the consumer's context
+    between chunks and fail to reset if the stream is resumed elsewhere, so every step enters
+    and leaves it on its own.
+    """
+    while True:
+        with request_context(request_id):
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+        yield chunk
+
+
+def warm_model(model, host=None, keep_alive=OLLAMA_KEEP_ALIVE):
+    """
+    Loads `model` into the memory of the Ollama server at `host` with an empty generate request.
+
+    Returns:
+        float: Seconds the load took.
+    """
+    started = time.perf_counter()
+    get_client(host).generate(model=model, prompt="", keep_alive=keep_alive)
+    return time.perf_counter() - started
+
 
 class AgentBase(ABC):
-    def __init__(self, name, model='llama3.2:3b', max_retries=2, verbose=True):
+    # Ollama `format` for replies: None (free text), "json" or a JSON schema dict
+    response_format = None
+
+    def __init__(self, name, model=None, max_retries=2, verbose=True, profile=None, cache=None, host=None,
+                 backend_pool=None, retry_policy=None, hedge_policy=None):
         """
         Base class for all agents.
 
         Args:
             name (str): Agent name (used for logging).
-            model (str): Name of the Ollama model to use.
-            max_retries (int): Number of retry attempts for API calls.
+            model (str): Name of the Ollama model to use; defaults to OLLAMA_MODEL or llama3.2:3b.
+            max_retries (int): Retries after a failed API call (attempts = max_retries + 1); ignored with `retry_policy`.
             verbose (bool): Whether to enable verbose logging.
+            profile (GenerationProfile): Generation settings applied to every call.
+            cache (ResponseCache): Shared reply cache; None disables caching.
+            host (str): Ollama server; None uses OLLAMA_HOST or the library default.
+            backend_pool (BackendPool): Servers to spread requests over; takes precedence over `host`.
+            retry_policy (RetryPolicy): Backoff and error classification for failed calls.
+            hedge_policy (HedgePolicy): Enables hedged requests when a backend pool has several hosts.
         """
         self.name = name
-        self.model = model
-        self.max_retries = max_retries
+        self.model = model or DEFAULT_MODEL
         self.verbose = verbose
+        self.profile = profile or GenerationProfile()
+        self.cache = cache
+        self.host = host
+        self.backend_pool = backend_pool
+        self.retry_policy = retry_policy or RetryPolicy(max_retries=max_retries)
+        self.hedge_policy = hedge_policy
+        # Set by AgentManager: shared RequestScheduler and this agent's priority class
+        self.scheduler = None
+        self.priority = "summarize"
+
+    @property
+    def max_retries(self):
+        return self.retry_policy.max_retries
+
+    @max_retries.setter
+    def max_retries(self, value):
+        self.retry_policy.max_retries = value
+
+    @property
+    def client(self):
+        return get_client(self.host)
+
+    @contextmanager
+    def scheduled(self, model=None):
+        """
+        Holds a scheduler slot for `model` (default: the agent's model), if a scheduler is set, for one request.
+        """
+        if self.scheduler is None:
+            yield
+            return
+        with self.scheduler.slot(model or self.model, self.priority):
+            yield
+
+    @asynccontextmanager
+    async def ascheduled(self, model=None):
+        if self.scheduler is None:
+            yield
+            return
+        async with self.scheduler.aslot(model or self.model, self.priority):
+            yield
+
+    @contextmanager
+    def backend(self, exclude=(), model=None):
+        """
+        Yields (host, ollama.Client) for one request, leased from the backend pool when one is set.
+        """
+        with self.scheduled(model):
+            if self.backend_pool is None:
+                yield self.host, self.client
+                return
+            with self.backend_pool.lease(exclude) as backend:
+                yield backend.host, backend.client
+
+    @asynccontextmanager
+    async def abackend(self, exclude=(), model=None):
+        """
+        Async variant of `backend` yielding (host, ollama.AsyncClient).
+        """
+        async with self.ascheduled(model):
+            if self.backend_pool is None:
+                yield self.host, get_async_client(self.host)
+                return
+            async with self.backend_pool.alease(exclude) as backend:
+                yield backend.host, backend.async_client
+
+    @property
+    def temperature(self):
+        return self.profile.temperature
+
+    @temperature.setter
+    def temperature(self, value):
+        self.profile.temperature = value
+
+    @property
+    def max_tokens(self):
+        return self.profile.num_predict
+
+    @max_tokens.setter
+    def max_tokens(self, value):
+        self.profile.num_predict = value
 
     @abstractmethod
     def execute(self, *args, **kwargs):
         pass
 
-    def call_llama(self, messages, temperature=0.7,max_tokens=512):
+    def resolve_profile(self, temperature=None, max_tokens=None, profile=None):
+        """
+        Returns the profile for one call: the agent's profile (or the given one) with per-call overrides applied.
+        """
+        resolved = (profile or self.profile).copy(temperature=temperature, num_predict=max_tokens)
+        if resolved.keep_alive is None:
+            resolved.keep_alive = OLLAMA_KEEP_ALIVE
+        return resolved
+
+    def warm_up(self, host=None, model=None):
+        """
+        Loads the agent's model into Ollama memory (an empty generate request) so the first real call skips the load.
+
+        Args:
+            host (str): Server to warm; defaults to the agent's host.
+            model (str): Model to load; defaults to the agent's model.
+        """
+        model = model or self.model
+        elapsed = warm_model(model, host or self.host, self.resolve_profile().keep_alive)
+        if self.verbose:
+            logger.info(f"[{self.name}] Pre-warmed {model} on {host or self.host or 'default host'} in {elapsed:.2f}s.")
+        return elapsed
+
+    def cache_key(self, messages, profile, use_cache=True, model=None):
+        """
+        Returns the response-cache key for a call, or None when the call must not be cached.
+        """
+        if not use_cache or self.cache is None or not self.cache.accepts(profile):
+            return None
+        return self.cache.make_key(model or self.model, profile, messages, format=self.response_format)
+
+    def cached_reply(self, cache_key):
+        """
+        Returns the cached reply for `cache_key` (None on a miss or without a key) and counts the lookup.
+        """
+        if cache_key is None:
+            return None
+        cached = self.cache.get(cache_key)
+        metrics.inc("response_cache_requests_total", agent=self.name, result="miss" if cached is None else "hit")
+        if cached is not None and self.verbose:
+            logger.info(f"[{self.name}] Response served from cache.")
+        return cached
+
+    def log_request(self, messages, mode="sync", model=None):
+        """
+        Logs an outgoing call: a one-line summary, plus the (redacted, sampled) messages at debug level.
+        """
+        if not self.verbose:
+            return
+        logger.info(
+            f"[{self.name}] Sending {len(messages)} messages to Ollama ({model or self.model}, {mode}, "
+            f"{sum(len(msg['content']) for msg in messages)} chars)."
+        )
+        content_logger = logger.bind(sample=True)
+        for msg in messages:
+            content_logger.debug(f"[{self.name}]   {msg['role']}: {redact(msg['content'])}")
+
+    def log_reply(self, reply):
+        if self.verbose:
+            logger.bind(sample=True).debug(f"[{self.name}] Response: {redact(reply)}")
+
+    def record_call(self, started, mode, outcome="success"):
+        """
+        Records the wall time and outcome of one LLM call (all attempts included) in the metrics.
+        """
+        metrics.inc("ollama_requests_total", agent=self.name, mode=mode, outcome=outcome)
+        metrics.observe("ollama_request_seconds", time.perf_counter() - started, agent=self.name, mode=mode)
+
+    def call_llama(self, messages, temperature=None, max_tokens=None, profile=None, use_cache=True, model=None):
         """
         Calls the Llama model via Ollama and retrieves the response.
 
+        Failed attempts are retried according to `retry_policy`; with a `hedge_policy` and
+        several backends, a request slower than the recent p95 latency is duplicated on
+        another backend and the first reply wins.
+
         Args:
             messages (list): A list of message dictionaries with 'role' and 'content'.
-            temperature (float): Sampling temperature.
+            temperature (float): Sampling temperature; defaults to the agent's profile.
+            max_tokens (int): Maximum tokens to generate; defaults to the agent's profile.
+            profile (GenerationProfile): Profile to use instead of the agent's own.
+            use_cache (bool): Whether the response cache may serve and store this call.
+            model (str): Model to use instead of the agent's own.
 
         Returns:
             str: The model's response content.
         """
-        retries = 0
-        while retries < self.max_retries:
+        model = model or self.model
+        profile = self.resolve_profile(temperature, max_tokens, profile)
+        cache_key = self.cache_key(messages, profile, use_cache, model)
+        cached = self.cached_reply(cache_key)
+        if cached is not None:
+            return cached
+
+        with request_context():
+            self.log_request(messages, model=model)
+            started = time.perf_counter()
             try:
-                if self.verbose:
-                    logger.info(f"[{self.name}] Sending messages to Ollama ({self.model}):")
-                    for msg in messages:
-                        logger.debug(f"  {msg['role']}: {msg['content']}")
+                reply = self.retry_policy.run(lambda: self._hedged_chat(messages, profile, model), self.name)
+            except Exception:
+                self.record_call(started, "sync", "error")
+                raise
+            self.record_call(started, "sync")
+            self.log_reply(reply)
 
-                # Call Ollama's chat API
-                response = ollama.chat(
-                    model=self.model,
-                    messages=messages,
-                    options={"temperature": temperature}
-                )
+        if cache_key is not None:
+            self.cache.set(cache_key, reply)
 
-                # Extract and return the response content
-                reply = response.get("message", {}).get("content", "").strip()
+        return reply
 
-                if not reply:
-                    raise ValueError("Received empty response from Ollama.")
+    def _chat(self, messages, profile, exclude=(), hosts=None, model=None):
+        """
+        Sends one chat request and returns the stripped reply.
 
-                if self.verbose:
-                    logger.info(f"[{self.name}] Response: {reply}")
+        Args:
+            exclude (tuple): Hosts the backend pool must not pick.
+            hosts (list): If given, the host serving the request is appended to it.
+            model (str): Model to use instead of the agent's own.
+        """
+        with self.backend(exclude, model) as (host, client):
+            if hosts is not None:
+                hosts.append(host)
+            response = client.chat(
+                model=model or self.model,
+                messages=messages,
+                options=profile.options(),
+                keep_alive=profile.keep_alive,
+                format=self.response_format
+            )
+        record_usage(self.name, response)
 
-                return reply
+        reply = response.get("message", {}).get("content", "").strip()
+        if not reply:
+            raise EmptyResponseError("Received empty response from Ollama.")
+        return reply
 
-            except Exception as e:
-                retries += 1
-                logger.error(f"[{self.name}] Ollama error: {e} (Retry {retries}/{self.max_retries})")
+    def hedge_delay(self):
+        """
+        Returns how long to wait before hedging a request, or None if hedging is off or impossible.
+        """
+        if self.hedge_policy is None or self.backend_pool is None or len(self.backend_pool.backends) < 2:
+            return None
+        return self.hedge_policy.delay()
+
+    def _hedged_chat(self, messages, profile, model=None):
+        started = time.perf_counter()
+        reply = self._first_reply(messages, profile, model)
+        # Only the latency the caller saw counts; a hedge's losing request would inflate the p95
+        if self.hedge_policy is not None:
+            self.hedge_policy.record(time.perf_counter() - started)
+        return reply
+
+    def _first_reply(self, messages, profile, model=None):
+        delay = self.hedge_delay()
+        if delay is None:
+            return self._chat(messages, profile, model=model)
 
-        raise RuntimeError(f"[{self.name}] Failed to get response from Ollama after {self.max_retries} retries.")
+        hosts = []
+        primary = _hedge_executor().submit(self._chat, messages, profile, (), hosts, model)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        # The synchronous client cannot abort the slower request; it finishes in the background
+        self.hedge_policy.hedged += 1
+        if self.verbose:
+            logger.info(f"[{self.name}] No reply after {delay:.2f}s; hedging on another backend.")
+        hedge = _hedge_executor().submit(self._chat, messages, profile, tuple(hosts), None, model)
+        pending, error = {primary, hedge}, None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self.hedge_policy.hedge_wins += 1
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def call_llama_stream(self, messages, temperature=None, max_tokens=None, profile=None, use_cache=True, model=None):
+        """
+        Streaming variant of `call_llama`.
+
+        Args:
+            messages (list): A list of message dictionaries with 'role' and 'content'.
+            temperature (float): Sampling temperature; defaults to the agent's profile.
+            max_tokens (int): Maximum tokens to generate; defaults to the agent's profile.
+            profile (GenerationProfile): Profile to use instead of the agent's own.
+            use_cache (bool): Whether the response cache may serve and store this call.
+            model (str): Model to use instead of the agent's own.
+
+        Returns:
+            LlamaStream: Iterator of token chunks; exposes `text` and `stats` once exhausted.
+        """
+        model = model or self.model
+        profile = self.resolve_profile(temperature, max_tokens, profile)
+        started_at = time.perf_counter()
+        with request_context() as request_id:
+            cache_key = self.cache_key(messages, profile, use_cache, model)
+            cached = self.cached_reply(cache_key)
+        if cached is not None:
+            # A cache hit streams as a single chunk so callers need no special case
+            return LlamaStream(
+                iter([{"message": {"content": cached}, "done": True}]), self.name, started_at, record_metrics=False,
+                request_id=request_id
+            )
+
+        chunks = in_request_context(self._stream_chunks(messages, profile, model), request_id)
+        on_complete = None if cache_key is None else lambda reply: self.cache.set(cache_key, reply)
+        return LlamaStream(chunks, self.name, started_at, self.verbose, on_complete=on_complete, request_id=request_id)
+
+    def _stream_chunks(self, messages, profile, model=None):
+        model = model or self.model
+        self.log_request(messages, "stream", model=model)
+
+        started_at = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            received = False
+            try:
+                # The backend stays leased until the whole reply has streamed
+                with self.backend((), model) as (_, client):
+                    for chunk in client.chat(
+                        model=model,
+                        messages=messages,
+                        options=profile.options(),
+                        keep_alive=profile.keep_alive,
+                        format=self.response_format,
+                        stream=True
+                    ):
+                        received = True
+                        yield chunk
+                return
+
+            except Exception as e:
+                # Tokens already shown to the user cannot be taken back, so only retry before the first chunk.
+                if received:
+                    raise
+                delay = self.retry_policy.next_delay(e, attempt, started_at)
+                self.retry_policy.note_failure(self.name, e, attempt, delay)
+                if delay is None:
+                    raise self.retry_policy.failure(self.name, attempt, e) from e
+                time.sleep(delay)
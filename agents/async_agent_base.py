@@ -0,0 +1,115 @@
+# agents/async_agent_base.py
+
+import asyncio
+import time
+from loguru import logger
+from utils.logger import request_context
+from .agent_base import AgentBase
+from .metrics import record_usage
+from .retry_policy import EmptyResponseError
+
+
+class AsyncAgentBase(AgentBase):
+    """
+    Agent base with an asyncio execution path next to the synchronous one.
+
+    Subclasses implement `aexecute` on top of `acall_llama`; the default falls back
+    to running `execute` in a worker thread.
+    """
+
+    async def aexecute(self, *args, **kwargs):
+        return await asyncio.to_thread(self.execute, *args, **kwargs)
+
+    async def acall_llama(self, messages, temperature=None, max_tokens=None, profile=None, use_cache=True, model=None):
+        """
+        Async variant of `call_llama` using ollama.AsyncClient.
+
+        Args:
+            messages (list): A list of message dictionaries with 'role' and 'content'.
+            temperature (float): Sampling temperature; defaults to the agent's profile.
+            max_tokens (int): Maximum tokens to generate; defaults to the agent's profile.
+            profile (GenerationProfile): Profile to use instead of the agent's own.
+            use_cache (bool): Whether the response cache may serve and store this call.
+            model (str): Model to use instead of the agent's own.
+
+        Returns:
+            str: The model's response content.
+        """
+        model = model or self.model
+        profile = self.resolve_profile(temperature, max_tokens, profile)
+        cache_key = self.cache_key(messages, profile, use_cache, model)
+        cached = self.cached_reply(cache_key)
+        if cached is not None:
+            return cached
+
+        with request_context():
+            self.log_request(messages, "async", model)
+            started = time.perf_counter()
+            try:
+                reply = await self.retry_policy.arun(lambda: self._ahedged_chat(messages, profile, model), self.name)
+            except Exception:
+                self.record_call(started, "async", "error")
+                raise
+            self.record_call(started, "async")
+            self.log_reply(reply)
+
+        if cache_key is not None:
+            self.cache.set(cache_key, reply)
+
+        return reply
+
+    async def _achat(self, messages, profile, exclude=(), hosts=None, model=None):
+        async with self.abackend(exclude, model) as (host, client):
+            if hosts is not None:
+                hosts.append(host)
+            response = await client.chat(
+                model=model or self.model,
+                messages=messages,
+                options=profile.options(),
+                keep_alive=profile.keep_alive,
+                format=self.response_format
+            )
+        record_usage(self.name, response)
+
+        reply = response.get("message", {}).get("content", "").strip()
+        if not reply:
+            raise EmptyResponseError("Received empty response from Ollama.")
+        return reply
+
+    async def _ahedged_chat(self, messages, profile, model=None):
+        started = time.perf_counter()
+        reply = await self._afirst_reply(messages, profile, model)
+        if self.hedge_policy is not None:
+            self.hedge_policy.record(time.perf_counter() - started)
+        return reply
+
+    async def _afirst_reply(self, messages, profile, model=None):
+        delay = self.hedge_delay()
+        if delay is None:
+            return await self._achat(messages, profile, model=model)
+
+        hosts = []
+        primary = asyncio.ensure_future(self._achat(messages, profile, (), hosts, model))
+        done, _ = await asyncio.wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        self.hedge_policy.hedged += 1
+        if self.verbose:
+            logger.info(f"[{self.name}] No reply after {delay:.2f}s; hedging on another backend.")
+        hedge = asyncio.ensure_future(self._achat(messages, profile, tuple(hosts), None, model))
+        pending, error = {primary, hedge}, None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedge_policy.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # Cancelling the slower request closes its connection, which stops the generation on that server
+            for task in pending:
+                task.cancel()
@@ -0,0 +1,297 @@
+# agents/backend_pool.py
+
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+import httpx
+import ollama
+from loguru import logger
+from .agent_base import get_async_client, get_client
+
+ROUTING_STRATEGIES = ("least_outstanding", "latency")
+
+
+class BackendUnavailableError(RuntimeError):
+    """Raised when no Ollama backend can take a request (all circuits open or the wait timed out)."""
+
+
+def is_host_failure(error):
+    """
+    Whether `error` says the host itself is unwell: no connection, a timeout or a 5xx answer.
+    Errors the server answered deliberately (unknown model, bad request) do not count.
+    """
+    if isinstance(error, ollama.ResponseError):
+        # status_code -1 means the request never got an HTTP answer
+        return error.status_code >= 500 or error.status_code == -1
+    return isinstance(error, (ConnectionError, TimeoutError, httpx.TransportError))
+
+
+class OllamaBackend:
+    def __init__(self, host, max_concurrency=4):
+        """
+        One Ollama server in a BackendPool, with its routing and circuit-breaker state.
+
+        Args:
+            host (str): Server URL, e.g. "http://node-2:11434".
+            max_concurrency (int): Requests allowed in flight on this server at once.
+        """
+        self.host = host
+        self.max_concurrency = max_concurrency
+        self.outstanding = 0
+        self.latency = None  # Moving average of request latency in seconds
+        self.consecutive_failures = 0
+        self.open_until = 0.0  # Circuit is open (host skipped) until this monotonic time
+        self.probing = False  # A half-open circuit's single trial request is in flight
+        self.requests = 0
+        self.errors = 0
+
+    @property
+    def client(self):
+        return get_client(self.host)
+
+    @property
+    def async_client(self):
+        return get_async_client(self.host)
+
+    def is_open(self, now=None):
+        return (now if now is not None else time.monotonic()) < self.open_until
+
+    def is_half_open(self, now=None):
+        # Cooldown over but no request has succeeded since: the next one is a trial
+        return self.open_until > 0.0 and not self.is_open(now)
+
+    def has_capacity(self):
+        return self.outstanding < self.max_concurrency
+
+    def stats(self):
+        return {
+            "host": self.host,
+            "outstanding": self.outstanding,
+            "latency": self.latency,
+            "requests": self.requests,
+            "errors": self.errors,
+            "circuit_open": self.is_open(),
+            "circuit_half_open": self.is_half_open(),
+        }
+
+
+class BackendPool:
+    def __init__(self, hosts, strategy="least_outstanding", max_concurrency=4, failure_threshold=3,
+                 cooldown=30.0, acquire_timeout=60.0, latency_smoothing=0.3):
+        """
+        Spreads Ollama requests over several servers.
+
+        Each request leases one backend: the least loaded one ("least_outstanding") or the
+        one with the lowest expected wait, average latency times queued requests ("latency").
+        A backend that fails `failure_threshold` times in a row is skipped for `cooldown`
+        seconds (circuit open). Afterwards the circuit is half-open: it takes a single trial
+        request at a time, and the host rejoins when one succeeds or is skipped for another
+        cooldown when it fails. Only connection errors, timeouts and 5xx answers count as
+        failures; an unknown model or a bad request says nothing about the host's health.
+
+        Args:
+            hosts (iterable): Server URLs.
+            strategy (str): "least_outstanding" or "latency".
+            max_concurrency (int): Per-host limit of requests in flight.
+            failure_threshold (int): Consecutive failures that open a host's circuit.
+            cooldown (float): Seconds a host stays out of rotation once its circuit opens.
+            acquire_timeout (float): Seconds to wait for a free slot before giving up.
+            latency_smoothing (float): Weight of the newest sample in the latency average.
+        """
+        if strategy not in ROUTING_STRATEGIES:
+            raise ValueError(f"Unknown routing strategy '{strategy}'; expected one of {', '.join(ROUTING_STRATEGIES)}.")
+        self.backends = [OllamaBackend(host, max_concurrency) for host in hosts]
+        if not self.backends:
+            raise ValueError("BackendPool needs at least one host.")
+        self.strategy = strategy
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.acquire_timeout = acquire_timeout
+        self.latency_smoothing = latency_smoothing
+        self._condition = threading.Condition()
+        self._health_stop = None
+
+    @classmethod
+    def from_env(cls, value, **kwargs):
+        """
+        Builds a pool from a comma-separated host list (e.g. the OLLAMA_HOSTS variable); None if empty.
+        """
+        hosts = [host.strip() for host in (value or "").split(",") if host.strip()]
+        return cls(hosts, **kwargs) if hosts else None
+
+    @property
+    def hosts(self):
+        return [backend.host for backend in self.backends]
+
+    def _score(self, backend):
+        if self.strategy == "latency":
+            # Hosts without samples yet are tried first so every host gets measured
+            return (backend.latency or 0.0) * (backend.outstanding + 1), backend.outstanding
+        return backend.outstanding / backend.max_concurrency, backend.latency or 0.0
+
+    def _pick(self, exclude):
+        # Caller holds self._condition
+        now = time.monotonic()
+        closed = [backend for backend in self.backends if backend.host not in exclude and not backend.is_open(now)]
+        if not closed:
+            raise BackendUnavailableError("No Ollama backend available: every circuit is open.")
+        candidates = [backend for backend in closed if backend.has_capacity() and not backend.probing]
+        if not candidates:
+            return None
+        backend = min(candidates, key=self._score)
+        backend.probing = backend.is_half_open(now)
+        backend.outstanding += 1
+        backend.requests += 1
+        return backend
+
+    def acquire(self, exclude=(), timeout=None):
+        """
+        Reserves a slot on the best available backend, waiting while every host is at its limit.
+
+        Args:
+            exclude (iterable): Hosts not to use (e.g. the one a hedged request already runs on).
+            timeout (float): Seconds to wait; defaults to `acquire_timeout`.
+        """
+        deadline = time.monotonic() + (self.acquire_timeout if timeout is None else timeout)
+        with self._condition:
+            while True:
+                backend = self._pick(exclude)
+                if backend is not None:
+                    return backend
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise BackendUnavailableError("Timed out waiting for a free Ollama backend.")
+                self._condition.wait(min(remaining, 1.0))  # Wake up periodically to notice circuits closing
+
+    async def aacquire(self, exclude=(), timeout=None):
+        """
+        Async variant of `acquire`; polls instead of blocking the event loop.
+        """
+        deadline = time.monotonic() + (self.acquire_timeout if timeout is None else timeout)
+        while True:
+            with self._condition:
+                backend = self._pick(exclude)
+            if backend is not None:
+                return backend
+            if time.monotonic() >= deadline:
+                raise BackendUnavailableError("Timed out waiting for a free Ollama backend.")
+            await asyncio.sleep(0.05)
+
+    def release(self, backend, latency=None, error=None, cancelled=False):
+        """
+        Returns a slot and records the outcome of the request for routing and circuit breaking.
+
+        A `cancelled` request has no outcome; if it was a half-open circuit's trial, the next
+        request becomes the trial instead.
+        """
+        with self._condition:
+            backend.outstanding -= 1
+            probe, backend.probing = backend.probing, False
+            if error is not None:
+                backend.errors += 1
+            if cancelled:
+                pass
+            elif error is not None and is_host_failure(error):
+                backend.consecutive_failures += 1
+                if probe or (backend.consecutive_failures >= self.failure_threshold and not backend.is_open()):
+                    backend.open_until = time.monotonic() + self.cooldown
+                    logger.warning(
+                        f"[BackendPool] Circuit {'reopened' if probe else 'opened'} for {backend.host} after "
+                        f"{backend.consecutive_failures} failures: {error}"
+                    )
+            else:
+                # The host answered, even if with an error of the request's own making
+                backend.consecutive_failures = 0
+                if backend.open_until:
+                    backend.open_until = 0.0
+                    logger.info(f"[BackendPool] Circuit closed for {backend.host}.")
+                if error is None and latency is not None:
+                    backend.latency = latency if backend.latency is None else (
+                        self.latency_smoothing * latency + (1 - self.latency_smoothing) * backend.latency
+                    )
+            self._condition.notify_all()
+
+    @contextmanager
+    def lease(self, exclude=()):
+        """
+        Context manager around one request: yields the chosen OllamaBackend and releases it afterwards.
+        """
+        backend = self.acquire(exclude)
+        started = time.perf_counter()
+        try:
+            yield backend
+        except Exception as e:
+            self.release(backend, error=e)
+            raise
+        except BaseException:
+            # Cancelled or abandoned (e.g. the losing side of a hedge): no latency sample either way
+            self.release(backend, cancelled=True)
+            raise
+        else:
+            self.release(backend, time.perf_counter() - started)
+
+    @asynccontextmanager
+    async def alease(self, exclude=()):
+        backend = await self.aacquire(exclude)
+        started = time.perf_counter()
+        try:
+            yield backend
+        except Exception as e:
+            self.release(backend, error=e)
+            raise
+        except BaseException:
+            # Cancelled or abandoned (e.g. the losing side of a hedge): no latency sample either way
+            self.release(backend, cancelled=True)
+            raise
+        else:
+            self.release(backend, time.perf_counter() - started)
+
+    def check_health(self):
+        """
+        Probes every backend (lists its loaded models); healthy hosts have their circuit closed,
+        unreachable ones have it opened.
+
+        Returns:
+            dict: Host -> True if it answered.
+        """
+        results = {}
+        for backend in self.backends:
+            try:
+                backend.client.ps()
+                healthy = True
+            except Exception as e:
+                healthy = False
+                logger.warning(f"[BackendPool] Health check failed for {backend.host}: {e}")
+            with self._condition:
+                if healthy:
+                    backend.consecutive_failures = 0
+                    backend.open_until = 0.0
+                else:
+                    backend.open_until = time.monotonic() + self.cooldown
+                self._condition.notify_all()
+            results[backend.host] = healthy
+        return results
+
+    def start_health_checks(self, interval=15.0):
+        """
+        Runs `check_health` every `interval` seconds in a daemon thread until `stop_health_checks`.
+        """
+        if self._health_stop is not None:
+            return
+        self._health_stop = threading.Event()
+
+        def loop(stop):
+            while not stop.wait(interval):
+                self.check_health()
+
+        threading.Thread(target=loop, args=(self._health_stop,), name="ollama-health", daemon=True).start()
+
+    def stop_health_checks(self):
+        if self._health_stop is not None:
+            self._health_stop.set()
+            self._health_stop = None
+
+    def stats(self):
+        with self._condition:
+            return [backend.stats() for backend in self.backends]
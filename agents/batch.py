@@ -0,0 +1,126 @@
+# agents/batch.py
+"""
+Headless batch runner for the agent pipelines.
+
+Usage:
+    python -m agents.batch summarize|sanitize|write_article <dir or .jsonl> [-o results.jsonl]
+
+A directory is read as one document per `.txt` file; a `.jsonl` file as one document
+per line (the text in `--text-field`, an optional `id`). Documents are fanned out over a
+bounded pool of concurrent Ollama requests, each output is checked by the matching
+validator, and results are streamed to JSONL as they complete.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from loguru import logger
+from . import AgentManager, run_async, start_metrics_server
+from .pipeline import AgentPipeline, PIPELINE_TASKS
+
+
+def iter_documents(source, text_field="text"):
+    """
+    Yields (document_id, text) pairs from a directory of .txt files or a .jsonl file.
+    """
+    if os.path.isdir(source):
+        for filename in sorted(os.listdir(source)):
+            path = os.path.join(source, filename)
+            if filename.endswith(".txt") and os.path.isfile(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    yield filename, f.read()
+    elif source.endswith(".jsonl"):
+        with open(source, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                yield record.get("id", line_number), record[text_field]
+    else:
+        raise ValueError(f"Unsupported batch source '{source}': expected a directory or a .jsonl file.")
+
+
+async def run_batch(task, source, output, concurrency=4, text_field="text", agent_manager=None):
+    """
+    Runs `task` over every document in `source` and appends one JSON line per document to `output`.
+
+    Returns:
+        dict: Counts of processed and failed documents and the total wall time.
+    """
+    owns_manager = agent_manager is None
+    agent_manager = agent_manager or AgentManager(verbose=False)
+    pipeline = AgentPipeline(agent_manager, max_concurrency=concurrency)
+
+    # Document ids are kept only while their document is in flight
+    ids = {}
+
+    def texts():
+        for index, (document_id, text) in enumerate(iter_documents(source, text_field)):
+            ids[index] = document_id
+            yield text
+
+    processed = failed = 0
+    started = time.perf_counter()
+    with open(output, "a", encoding="utf-8") as out:
+        async for result in pipeline.iter_results(task, texts()):
+            record = {"id": ids.pop(result["index"]), "task": task}
+            if "error" in result:
+                record["error"] = result["error"]
+                failed += 1
+            else:
+                record.update({
+                    "output": result["output"],
+                    "validation": result["validation"],
+                    "ai_rating": result["ai_rating"],
+                    "issues": result["issues"],
+                    "corrected": result["corrected"],
+                    "latency": result["timings"],
+                })
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            processed += 1
+            logger.info(f"[batch] {task} {record['id']} done ({processed} processed, {failed} failed)")
+
+    if owns_manager:
+        agent_manager.close()
+    return {"processed": processed, "failed": failed, "wall_time": time.perf_counter() - started}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m agents.batch", description="Run an agent pipeline over a batch of documents.")
+    parser.add_argument("task", choices=sorted(PIPELINE_TASKS), help="Pipeline to run.")
+    parser.add_argument("source", help="Directory of .txt files or a .jsonl file.")
+    parser.add_argument("-o", "--output", default="batch_results.jsonl", help="JSONL file results are appended to.")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="Maximum documents in flight against Ollama.")
+    parser.add_argument("--text-field", default="text", help="Field holding the document text in JSONL input.")
+    parser.add_argument("--max-retries", type=int, default=2, help="Retries after a failed Ollama call.")
+    parser.add_argument("--hedge", action="store_true",
+                        help="Duplicate requests slower than the recent p95 on a second host (needs OLLAMA_HOSTS).")
+    parser.add_argument("--metrics-port", type=int, default=0,
+                        help="Serve Prometheus metrics on this port while the batch runs (0 disables).")
+    parser.add_argument("--verbose", action="store_true", help="Log every message sent to Ollama.")
+    args = parser.parse_args(argv)
+
+    if args.metrics_port:
+        start_metrics_server(args.metrics_port)
+
+    agent_manager = AgentManager(max_retries=args.max_retries, verbose=args.verbose, hedge=args.hedge)
+    summary = run_async(run_batch(
+        args.task, args.source, args.output,
+        concurrency=args.concurrency,
+        text_field=args.text_field,
+        agent_manager=agent_manager
+    ))
+    agent_manager.close()
+    logger.info(
+        f"[batch] {summary['processed']} documents in {summary['wall_time']:.1f}s "
+        f"({summary['failed']} failed) → {args.output}"
+    )
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
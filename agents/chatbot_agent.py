@@ -1,20 +1,37 @@
 
 from .agent_base import AgentBase
+from .conversation import ConversationManager
+from .generation_profile import GenerationProfile
+from .prompts import prompts
 
 class ChatbotAgent(AgentBase):
     def __init__(self, max_retries=2, verbose=True):
-        super().__init__("ChatbotAgent", max_retries=max_retries, verbose=verbose)
+        super().__init__(
+            "ChatbotAgent",
+            max_retries=max_retries,
+            verbose=verbose,
+            profile=GenerationProfile(temperature=0.7, num_predict=512, num_ctx=4096)
+        )
+        # Per-session memory; calls without a session_id stay stateless
+        self.conversations = ConversationManager(self)
 
-    def execute(self, user_input):
+    def system_prompt(self):
+        return prompts.get("chat").system
+
+    def build_messages(self, user_input, session_id=None):
+        if session_id is not None:
+            return self.conversations.build_messages(session_id, user_input)
+        return prompts.render("chat", message=user_input)
+
+    def execute(self, user_input, session_id=None):
         # Always use Ollama (call_llama)
-        messages = [
-            {"role": "system", "content": (
-                "You are a highly knowledgeable, careful, and ethical medical assistant. "
-                "Always provide evidence-based, up-to-date, and safe advice. "
-                "If you are unsure, say so and recommend consulting a healthcare professional. "
-                "Cite guidelines or reputable sources when possible."
-            )},
-            {"role": "user", "content": user_input}
-        ]
-        return self.call_llama(messages)
+        reply = self.call_llama(self.build_messages(user_input, session_id))
+        if session_id is not None:
+            self.conversations.record(session_id, user_input, reply)
+        return reply
 
+    def stream(self, user_input, session_id=None):
+        """
+        Streams a reply; with a session_id, call `conversations.record` once the stream is consumed.
+        """
+        return self.call_llama_stream(self.build_messages(user_input, session_id))
@@ -0,0 +1,83 @@
+# agents/chunking.py
+
+import re
+
+# Rough BPE density for English clinical text (llama tokenizers average ~4 characters per token)
+CHARS_PER_TOKEN = 4
+
+_SENTENCE_RE = re.compile(r"[^.!?\n]+(?:[.!?]+|\n+|$)")
+
+
+def estimate_tokens(text):
+    """
+    Approximates the number of model tokens in `text` without loading a tokenizer.
+    """
+    return max(1, (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN) if text else 0
+
+
+def split_sentences(text):
+    return [sentence for sentence in _SENTENCE_RE.findall(text) if sentence.strip()]
+
+
+class TextChunker:
+    def __init__(self, chunk_tokens=1500, overlap_tokens=150):
+        """
+        Token-aware splitter that packs whole sentences into chunks.
+
+        Consecutive chunks share up to `overlap_tokens` of trailing sentences so facts
+        spanning a boundary are seen by both sides.
+
+        Args:
+            chunk_tokens (int): Maximum estimated tokens per chunk.
+            overlap_tokens (int): Estimated tokens repeated from the end of the previous chunk.
+        """
+        if overlap_tokens >= chunk_tokens:
+            raise ValueError("overlap_tokens must be smaller than chunk_tokens.")
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+
+    def _pieces(self, text):
+        # Sentences longer than a whole chunk are cut on word boundaries
+        for sentence in split_sentences(text):
+            if estimate_tokens(sentence) <= self.chunk_tokens:
+                yield sentence
+                continue
+            words = sentence.split(" ")
+            piece = []
+            for word in words:
+                if piece and estimate_tokens(" ".join(piece + [word])) > self.chunk_tokens:
+                    yield " ".join(piece) + " "
+                    piece = []
+                piece.append(word)
+            if piece:
+                yield " ".join(piece)
+
+    def split(self, text):
+        """
+        Returns the list of chunks for `text`; short texts come back as a single chunk.
+        """
+        if estimate_tokens(text) <= self.chunk_tokens:
+            return [text]
+
+        chunks = []
+        current, current_tokens = [], 0
+        for piece in self._pieces(text):
+            piece_tokens = estimate_tokens(piece)
+            if current and current_tokens + piece_tokens > self.chunk_tokens:
+                chunks.append("".join(current).strip())
+                # Carry trailing sentences over as overlap
+                overlap, overlap_tokens = [], 0
+                for previous in reversed(current):
+                    previous_tokens = estimate_tokens(previous)
+                    if overlap_tokens + previous_tokens > self.overlap_tokens:
+                        break
+                    overlap.insert(0, previous)
+                    overlap_tokens += previous_tokens
+                if overlap_tokens + piece_tokens > self.chunk_tokens:
+                    overlap, overlap_tokens = [], 0
+                current, current_tokens = overlap, overlap_tokens
+            current.append(piece)
+            current_tokens += piece_tokens
+        if current:
+            chunks.append("".join(current).strip())
+        return chunks
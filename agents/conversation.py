@@ -0,0 +1,200 @@
+# agents/conversation.py
+
+import threading
+from collections import OrderedDict
+from loguru import logger
+from .chunking import estimate_tokens
+from .generation_profile import GenerationProfile
+from .prompts import prompts
+
+
+class Conversation:
+    def __init__(self, max_turns=200):
+        """
+        History of one chat session.
+
+        Turns are stored as (role, content, tokens) tuples. `window_start` is the index of the
+        first turn still sent verbatim; everything before it is represented by `summary`.
+        Only `max_turns` turns are kept for display; older ones survive in the summary.
+        """
+        self.max_turns = max_turns
+        self.turns = []
+        self.summary = ""
+        self.summary_tokens = 0
+        self.window_start = 0
+        self.dropped = 0  # Turns removed from `turns` because of max_turns
+        self.compacting = False  # A summary of older turns is being written in the background
+        self.lock = threading.Lock()
+
+    def append(self, role, content):
+        self.turns.append((role, content, estimate_tokens(content)))
+        overflow = len(self.turns) - self.max_turns
+        if overflow > 0 and overflow <= self.window_start:
+            # Only turns that were already summarized may be forgotten
+            del self.turns[:overflow]
+            self.window_start -= overflow
+            self.dropped += overflow
+
+    def window_tokens(self):
+        return sum(tokens for _, _, tokens in self.turns[self.window_start:])
+
+
+class ConversationManager:
+    def __init__(self, agent, token_budget=None, low_water=0.5, summary_tokens=256, max_sessions=500,
+                 max_turns=200, background=True):
+        """
+        Per-session chat memory that keeps prompts within a token budget.
+
+        A prompt is the system prompt, then the running summary of older turns, then recent
+        turns verbatim, then the new message. When the verbatim window outgrows the budget,
+        the oldest turns are folded into the summary until the window is down to `low_water`
+        of the budget. Compacting in such batches, rather than dropping one turn per message,
+        keeps the prompt prefix identical from one turn to the next, so Ollama can reuse the
+        KV cache it already holds for that prefix and only evaluates the new tokens.
+
+        The summary is written in a background thread after a reply was recorded and swapped
+        in when done, so no turn waits for it; a prompt built meanwhile leaves out the oldest
+        exchanges that do not fit instead.
+
+        Args:
+            agent (AgentBase): Agent that answers, and writes the summaries.
+            token_budget (int): Estimated tokens for summary plus history; defaults to what
+                the agent's num_ctx leaves after the system prompt and num_predict.
+            low_water (float): Fraction of the budget the window is compacted down to.
+            summary_tokens (int): Maximum length of the running summary.
+            max_sessions (int): Sessions kept in memory; the least recently used is dropped.
+            max_turns (int): Turns kept per session for display.
+            background (bool): Summarize in a background thread; False summarizes inside `record`.
+        """
+        self.agent = agent
+        self.low_water = low_water
+        self.summary_tokens = summary_tokens
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+        self.background = background
+        self.token_budget = token_budget or self.default_budget()
+        self.summary_profile = GenerationProfile(temperature=0.2, num_predict=summary_tokens, num_ctx=agent.profile.num_ctx)
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+
+    def default_budget(self):
+        profile = self.agent.profile
+        system_tokens = prompts.get("chat").static_tokens
+        return max(256, (profile.num_ctx or 2048) - (profile.num_predict or 512) - system_tokens - 64)
+
+    def session(self, session_id):
+        with self._lock:
+            conversation = self._sessions.get(session_id)
+            if conversation is None:
+                conversation = self._sessions[session_id] = Conversation(self.max_turns)
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            self._sessions.move_to_end(session_id)
+            return conversation
+
+    def clear(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def build_messages(self, session_id, user_input):
+        """
+        Returns the messages for a new user message: system prompt, summary, recent turns, message.
+        """
+        conversation = self.session(session_id)
+        with conversation.lock:
+            window = conversation.turns[conversation.window_start:]
+            budget = self.token_budget - estimate_tokens(user_input) - conversation.summary_tokens
+            remaining = sum(tokens for _, _, tokens in window)
+            # Until a pending summary lands, leave out the oldest exchanges that do not fit
+            while window and remaining > budget:
+                remaining -= sum(tokens for _, _, tokens in window[:2])
+                window = window[2:]
+            messages = [{"role": "system", "content": self.agent.system_prompt()}]
+            if conversation.summary:
+                messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{conversation.summary}"})
+            messages.extend({"role": role, "content": content} for role, content, _ in window)
+        messages.append({"role": "user", "content": user_input})
+        return messages
+
+    def record(self, session_id, user_input, reply):
+        """
+        Adds a finished exchange to the session's history and, if it is over budget, starts
+        summarizing its oldest turns (in a background thread unless `background` is False).
+        """
+        conversation = self.session(session_id)
+        with conversation.lock:
+            conversation.append("user", user_input)
+            conversation.append("assistant", reply)
+            evicted = self._plan_compaction(conversation)
+            summary = conversation.summary
+        if not evicted:
+            return
+        if self.background:
+            threading.Thread(target=self._compact, args=(conversation, summary, evicted),
+                             name="conversation-summary", daemon=True).start()
+        else:
+            self._compact(conversation, summary, evicted)
+
+    def _plan_compaction(self, conversation):
+        # Caller holds conversation.lock. Returns the turns to fold into the summary, if any.
+        if conversation.compacting or conversation.summary_tokens + conversation.window_tokens() <= self.token_budget:
+            return []
+        target = int(self.token_budget * self.low_water) - self.summary_tokens
+        window = conversation.turns[conversation.window_start:]
+        evicted, remaining = [], sum(tokens for _, _, tokens in window)
+        # Evict whole exchanges (user + assistant) so the window never starts mid-exchange
+        while window and remaining > max(target, 0):
+            pair, window = window[:2], window[2:]
+            evicted.extend(pair)
+            remaining -= sum(tokens for _, _, tokens in pair)
+        conversation.compacting = bool(evicted)
+        return evicted
+
+    def _compact(self, conversation, summary, evicted):
+        # Runs without the lock so the session stays usable during the LLM call; summarize does not raise
+        summary = self.summarize(summary, evicted)
+        with conversation.lock:
+            # Turns trimmed by max_turns meanwhile shifted window_start with them, so the
+            # evicted turns still start there
+            conversation.compacting = False
+            conversation.summary = summary
+            conversation.summary_tokens = estimate_tokens(summary)
+            conversation.window_start += len(evicted)
+
+    def summarize(self, summary, turns):
+        """
+        Folds `turns` into the running `summary` with one LLM call; on failure keeps a clipped transcript.
+        """
+        transcript = "\n".join(f"{role.capitalize()}: {content}" for role, content, _ in turns)
+        messages = prompts.render("chat.summary", summary=summary or "(none)", transcript=transcript,
+                                  words=self.summary_tokens * 3 // 4)
+        try:
+            return self.agent.call_llama(messages, profile=self.summary_profile, use_cache=False)
+        except Exception as e:
+            logger.warning(f"[ConversationManager] Could not summarize earlier turns: {e}")
+            clipped = (summary + "\n" + transcript).strip()
+            return clipped[-self.summary_tokens * 4:]
+
+    def page(self, session_id, page=0, page_size=10):
+        """
+        Returns (turns, page_count) for display; page 0 holds the most recent `page_size` turns.
+
+        Turns are (role, content) tuples in chronological order.
+        """
+        conversation = self.session(session_id)
+        with conversation.lock:
+            turns = [(role, content) for role, content, _ in conversation.turns]
+        page_count = max(1, -(-len(turns) // page_size))
+        end = len(turns) - page * page_size
+        return turns[max(0, end - page_size):max(0, end)], page_count
+
+    def stats(self, session_id):
+        conversation = self.session(session_id)
+        with conversation.lock:
+            return {
+                "turns": len(conversation.turns) + conversation.dropped,
+                "verbatim_turns": len(conversation.turns) - conversation.window_start,
+                "window_tokens": conversation.window_tokens(),
+                "summary_tokens": conversation.summary_tokens,
+                "token_budget": self.token_budget,
+            }
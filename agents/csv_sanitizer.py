@@ -0,0 +1,170 @@
+# agents/csv_sanitizer.py
+
+import csv
+import re
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+
+# Free-text cells in clinical exports can exceed csv's default 128 KB field limit
+csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+
+# Whole headers (as token tuples) of person-name columns
+PATIENT_NAME_HEADERS = {
+    ("name",), ("patient",), ("patient", "name"), ("first", "name"), ("last", "name"), ("full", "name"),
+    ("middle", "name"), ("given", "name"), ("family", "name"), ("surname",), ("firstname",), ("lastname",),
+}
+PROVIDER_TOKENS = {"provider", "physician", "doctor", "attending", "referring"}
+
+# (placeholder, test on the header's token tuple) in priority order; the first match wins
+PHI_COLUMN_RULES = (
+    ("[SSN]", lambda tokens: "ssn" in tokens or _has_sequence(tokens, ("social", "security"))),
+    ("[MRN]", lambda tokens: "mrn" in tokens or _has_sequence(tokens, ("medical", "record"))),
+    ("[EMAIL]", lambda tokens: "email" in tokens or _has_sequence(tokens, ("e", "mail"))),
+    ("[PHONE]", lambda tokens: bool({"phone", "telephone", "mobile", "fax"} & set(tokens))),
+    ("[DATE]", lambda tokens: bool({"dob", "birth", "birthdate", "birthday"} & set(tokens))),
+    ("[LOCATION]", lambda tokens: bool({"address", "street", "city", "zip", "zipcode", "postcode"} & set(tokens))
+                                  or _has_sequence(tokens, ("postal", "code"))),
+    # Only names: "provider_name" or "attending_physician", but not "provider_id" or "doctor_notes"
+    ("[PROVIDER_NAME]", lambda tokens: bool(PROVIDER_TOKENS & set(tokens)) and set(tokens) <= PROVIDER_TOKENS | {"name"}),
+    ("[PATIENT_NAME]", lambda tokens: tokens in PATIENT_NAME_HEADERS),
+)
+
+
+def _has_sequence(tokens, sequence):
+    return any(tokens[index:index + len(sequence)] == sequence for index in range(len(tokens)))
+
+
+def header_tokens(column):
+    """
+    Splits a header into lowercase tokens on underscores, spaces, punctuation and camelCase.
+    """
+    spaced = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", column.strip())
+    return tuple(token.lower() for token in re.split(r"[^A-Za-z0-9]+", spaced) if token)
+
+
+def infer_phi_columns(header):
+    """
+    Maps header names that denote identifier columns (name, DOB, phone...) to their placeholder.
+
+    Headers are compared as whole tokens, so "medication_name", "username" or "renamed_flag"
+    keep their values; a date column counts only for birth dates.
+    """
+    phi_columns = {}
+    for column in header:
+        tokens = header_tokens(column)
+        for placeholder, matches in PHI_COLUMN_RULES:
+            if matches(tokens):
+                phi_columns[column] = placeholder
+                break
+    return phi_columns
+
+
+class CSVSanitizer:
+    def __init__(self, sanitize_agent, text_columns=None, phi_columns=None, max_workers=4, window_rows=256, verbose=True):
+        """
+        Streams a CSV through PHI sanitization with bounded memory.
+
+        Rows are read lazily and processed in parallel; at most `window_rows` rows are held
+        at a time and output is written in the original order as soon as the oldest row is done.
+        Free-text columns go through the full SanitizeDataTool (rule pre-pass, LLM when needed),
+        identifier columns are replaced wholesale by their placeholder, and every other column
+        only gets the deterministic rule pass.
+
+        Args:
+            sanitize_agent (SanitizeDataTool): Agent used for free-text cells.
+            text_columns (iterable): Header names of free-text columns; None treats every column as free text.
+            phi_columns (dict): Header name -> placeholder for identifier columns; None infers them from the header.
+            max_workers (int): Rows sanitized concurrently.
+            window_rows (int): Maximum rows in flight (read but not yet written).
+            verbose (bool): Whether to log progress.
+        """
+        self.sanitize_agent = sanitize_agent
+        self.text_columns = set(text_columns) if text_columns is not None else None
+        self.phi_columns = phi_columns
+        self.max_workers = max_workers
+        self.window_rows = max(window_rows, max_workers)
+        self.verbose = verbose
+
+    def _sanitize_cell(self, value, mode):
+        if not value.strip():
+            return value
+        if mode == "text":
+            # One embedding request per cell would cost more than the cell's own LLM call
+            return self.sanitize_agent.execute(value, retrieval=False)
+        if mode is not None:
+            return mode  # Identifier column: the placeholder replaces the whole value
+        masked, _ = self.sanitize_agent.rule_engine.mask(value)
+        return masked
+
+    def _sanitize_row(self, row, modes):
+        return [
+            self._sanitize_cell(value, modes[index] if index < len(modes) else None)
+            for index, value in enumerate(row)
+        ]
+
+    def sanitize(self, source, destination, on_progress=None):
+        """
+        Reads CSV rows from the `source` text stream and writes sanitized rows to `destination`.
+
+        Args:
+            source: Text file object opened with newline="".
+            destination: Text file object opened with newline="".
+            on_progress (callable): Called with the number of rows written so far.
+
+        Returns:
+            int: Number of data rows written (header excluded).
+        """
+        reader = csv.reader(source)
+        writer = csv.writer(destination)
+
+        header = next(reader, None)
+        if header is None:
+            return 0
+        writer.writerow(header)
+
+        text_columns = set(header) if self.text_columns is None else self.text_columns
+        missing = text_columns.difference(header)
+        if missing:
+            raise ValueError(f"Columns not found in CSV header: {', '.join(sorted(missing))}")
+        phi_columns = infer_phi_columns(header) if self.phi_columns is None else self.phi_columns
+        # Per column: "text" for free text, a placeholder for identifier columns, None for the rule pass
+        modes = ["text" if column in text_columns else phi_columns.get(column) for column in header]
+
+        written = 0
+        in_flight = deque()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for row in reader:
+                in_flight.append(pool.submit(self._sanitize_row, row, modes))
+                if len(in_flight) >= self.window_rows:
+                    writer.writerow(in_flight.popleft().result())
+                    written += 1
+                    if on_progress is not None:
+                        on_progress(written)
+            while in_flight:
+                writer.writerow(in_flight.popleft().result())
+                written += 1
+                if on_progress is not None:
+                    on_progress(written)
+
+        if self.verbose:
+            logger.info(f"[CSVSanitizer] Sanitized {written} rows.")
+        return written
+
+
+def sanitize_csv(input_path, output_path, sanitize_agent, text_columns=None, phi_columns=None,
+                 max_workers=4, window_rows=256, encoding="utf-8"):
+    """
+    Sanitizes the CSV file at `input_path` into `output_path` without loading it into memory.
+
+    Returns:
+        int: Number of data rows written.
+    """
+    sanitizer = CSVSanitizer(
+        sanitize_agent, text_columns=text_columns, phi_columns=phi_columns,
+        max_workers=max_workers, window_rows=window_rows
+    )
+    with open(input_path, "r", encoding=encoding, newline="") as source, \
+            open(output_path, "w", encoding=encoding, newline="") as destination:
+        return sanitizer.sanitize(source, destination)
@@ -0,0 +1,49 @@
+# agents/generation_profile.py
+
+
+class GenerationProfile:
+    """
+    Generation settings an agent applies to every Ollama call.
+
+    Args:
+        temperature (float): Sampling temperature.
+        num_predict (int): Maximum number of tokens to generate (the agent's `max_tokens`).
+        num_ctx (int): Context window size; None keeps the model default.
+        stop (list): Stop sequences that end generation early.
+        top_k (int): Top-k sampling cutoff.
+        top_p (float): Nucleus sampling cutoff.
+        keep_alive (str | float): How long Ollama keeps the model loaded after the call.
+    """
+
+    OPTION_FIELDS = ("temperature", "num_predict", "num_ctx", "stop", "top_k", "top_p")
+
+    def __init__(self, temperature=0.7, num_predict=512, num_ctx=None, stop=None,
+                 top_k=None, top_p=None, keep_alive=None):
+        self.temperature = temperature
+        self.num_predict = num_predict
+        self.num_ctx = num_ctx
+        self.stop = list(stop) if stop else None
+        self.top_k = top_k
+        self.top_p = top_p
+        self.keep_alive = keep_alive
+
+    def options(self):
+        """
+        Returns the Ollama `options` mapping, leaving out unset fields so the model defaults apply.
+        """
+        return {field: getattr(self, field) for field in self.OPTION_FIELDS if getattr(self, field) is not None}
+
+    def copy(self, **overrides):
+        """
+        Returns a new profile with the given fields replaced; None overrides are ignored.
+        """
+        values = {field: getattr(self, field) for field in self.OPTION_FIELDS + ("keep_alive",)}
+        values.update({key: value for key, value in overrides.items() if value is not None})
+        return GenerationProfile(**values)
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.OPTION_FIELDS + ("keep_alive",)}
+
+    def __repr__(self):
+        settings = ", ".join(f"{key}={value!r}" for key, value in self.to_dict().items() if value is not None)
+        return f"GenerationProfile({settings})"
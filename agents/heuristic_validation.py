@@ -0,0 +1,192 @@
+# agents/heuristic_validation.py
+
+import re
+from collections import Counter
+from utils.term_cloud import tokenize
+from .phi_rules import FIELD_LABELS, PHIRuleEngine
+from .structured_validation import format_report
+
+_PLACEHOLDER_RE = re.compile(r"\[[A-Z_]+\]")
+_WORD_RE = re.compile(r"[A-Za-z][A-Za-z'-]+")
+# Capitalized word after a lowercase word, digit, comma, placeholder or bracket: likely a proper noun
+_MIDSENTENCE_CAPITAL_RE = re.compile(r"(?<=[a-z0-9,\]\)])[ \t]+([A-Z][a-z][A-Za-z'-]*)")
+
+
+def heuristic_evaluation(score, analysis, issues=(), corrected=None):
+    """
+    Returns an evaluation shaped like parse_validation's, for a verdict reached without the LLM.
+    """
+    issues = list(issues)
+    return {
+        "score": score,
+        "analysis": analysis,
+        "issues": issues,
+        "corrected": corrected,
+        "report": format_report(analysis, issues),
+        "structured": True,
+        "model": "rules",
+    }
+
+
+def _stem(token):
+    # Prefix stemming: "hypertension" and "hypertensive" match, which is enough for overlap statistics
+    return token[:6]
+
+
+class SanitizeHeuristics:
+    def __init__(self, rule_engine=None, min_length_ratio=0.5, max_length_ratio=1.5):
+        """
+        Rule-based verdicts on sanitized text, so the LLM validator only sees ambiguous cases.
+
+        Fails the output when the PHI rules still find identifiers in it, when a value the
+        rules detected in the original survives verbatim, or when its length shows it was
+        truncated or padded; the failed output comes with a rule-masked correction when that
+        is possible. Passes it when nothing detectable remains, there are at least as many
+        placeholders as distinct identifiers in the original, no new words were added and no
+        capitalized mid-sentence word (a possible name) is left. Anything else is
+        inconclusive and goes to the LLM.
+
+        Args:
+            rule_engine (PHIRuleEngine): Shared with the sanitizer so dictionary terms count here too.
+            min_length_ratio (float): Lowest sanitized/original length ratio for a pass.
+            max_length_ratio (float): Highest sanitized/original length ratio for a pass.
+        """
+        self.rule_engine = rule_engine or PHIRuleEngine()
+        self.min_length_ratio = min_length_ratio
+        self.max_length_ratio = max_length_ratio
+
+    def check(self, original, sanitized):
+        """
+        Returns an evaluation when the rules are conclusive, otherwise None.
+        """
+        if not sanitized or not sanitized.strip():
+            return heuristic_evaluation(1, "The sanitized output is empty.", ["No sanitized text was returned."])
+
+        issues = []
+        residual = Counter(label for _, _, label in self.rule_engine.find(sanitized))
+        for label, count in sorted(residual.items()):
+            issues.append(f"{count} unmasked {label.lower().replace('_', ' ')} value(s) remain; expected [{label}].")
+
+        original_values = {}
+        for start, end, label in self.rule_engine.find(original):
+            value = original[start:end].strip()
+            if len(value) >= 3:
+                original_values[value] = label
+        leaked = {value: label for value, label in original_values.items() if value in sanitized}
+        if leaked:
+            labels = ", ".join(sorted({f"[{label}]" for label in leaked.values()}))
+            issues.append(f"{len(leaked)} identifier(s) from the original appear unchanged (should be {labels}).")
+
+        if issues:
+            corrected = self.rule_engine.mask(sanitized)[0]
+            for value in sorted(leaked, key=len, reverse=True):
+                corrected = corrected.replace(value, f"[{leaked[value]}]")
+            return heuristic_evaluation(1, "Rule-based check: PHI remains in the sanitized text.", issues, corrected)
+
+        length_ratio = len(sanitized) / max(len(original), 1)
+        if length_ratio < self.min_length_ratio / 2 or length_ratio > self.max_length_ratio * 2:
+            return heuristic_evaluation(
+                2, f"Rule-based check: the sanitized text is {length_ratio:.0%} of the original's length.",
+                ["The output looks truncated or contains text that is not in the original."]
+            )
+
+        if not self.min_length_ratio <= length_ratio <= self.max_length_ratio:
+            return None
+        if len(_PLACEHOLDER_RE.findall(sanitized)) < len(original_values):
+            return None
+        original_words = {word.lower() for word in _WORD_RE.findall(original)}
+        if any(word.lower() not in original_words for word in _WORD_RE.findall(_PLACEHOLDER_RE.sub(" ", sanitized))):
+            return None
+        if any(word.lower() not in FIELD_LABELS for word in _MIDSENTENCE_CAPITAL_RE.findall(sanitized)):
+            return None
+        return heuristic_evaluation(
+            5, f"Rule-based check: no detectable PHI remains; {len(original_values)} identifier(s) masked, "
+               f"no names or added text found."
+        )
+
+
+class SummaryHeuristics:
+    def __init__(self, min_words=40, max_compression=0.6, min_support=0.85, min_bigram_support=0.4,
+                 min_coverage=0.5, key_terms=10, pass_score=4):
+        """
+        Rule-based verdicts on summaries from length and n-gram overlap with the original.
+
+        Content words are compared after stopword removal and prefix stemming. `support` is
+        the share of the summary's unigrams (and bigrams) found in the original, a
+        ROUGE-style precision that drops when the summary states things the original does
+        not; `coverage` is the share of the original's most frequent terms the summary keeps.
+        Summaries that are not shorter than the original, mostly unsupported or miss nearly
+        all key terms fail; compressed, well-supported summaries with good coverage pass.
+        Short originals and everything in between go to the LLM.
+
+        Args:
+            min_words (int): Originals shorter than this are left to the LLM.
+            max_compression (float): Highest summary/original word ratio for a pass.
+            min_support (float): Lowest unigram support for a pass.
+            min_bigram_support (float): Lowest bigram support for a pass.
+            min_coverage (float): Lowest key-term coverage for a pass.
+            key_terms (int): Number of most frequent original terms checked for coverage.
+            pass_score (int): Score given to a pass; overlap cannot prove a summary excellent.
+        """
+        self.min_words = min_words
+        self.max_compression = max_compression
+        self.min_support = min_support
+        self.min_bigram_support = min_bigram_support
+        self.min_coverage = min_coverage
+        self.key_terms = key_terms
+        self.pass_score = pass_score
+
+    def statistics(self, original, summary):
+        """
+        Returns compression, support, bigram_support and coverage (with the missed key terms).
+        """
+        surface = {}
+        original_tokens = []
+        for token in tokenize(original):
+            stem = _stem(token)
+            surface.setdefault(stem, token)
+            original_tokens.append(stem)
+        summary_tokens = [_stem(token) for token in tokenize(summary)]
+        original_set = set(original_tokens)
+        original_bigrams = set(zip(original_tokens, original_tokens[1:]))
+        summary_bigrams = list(zip(summary_tokens, summary_tokens[1:]))
+        key_terms = [term for term, _ in Counter(original_tokens).most_common(self.key_terms)]
+        summary_set = set(summary_tokens)
+        missed = [surface[term] for term in key_terms if term not in summary_set]
+        return {
+            "compression": len(summary.split()) / max(len(original.split()), 1),
+            "support": sum(token in original_set for token in summary_tokens) / max(len(summary_tokens), 1),
+            "bigram_support": sum(bigram in original_bigrams for bigram in summary_bigrams) / max(len(summary_bigrams), 1),
+            "coverage": (len(key_terms) - len(missed)) / max(len(key_terms), 1),
+            "missed": missed,
+        }
+
+    def check(self, original, summary):
+        """
+        Returns an evaluation when the statistics are conclusive, otherwise None.
+        """
+        if not summary or not summary.strip():
+            return heuristic_evaluation(1, "The summary is empty.", ["No summary was returned."])
+        if len(original.split()) < self.min_words or not list(tokenize(summary)):
+            return None
+
+        stats = self.statistics(original, summary)
+        analysis = (
+            f"Rule-based check: compression {stats['compression']:.0%}, term support {stats['support']:.0%}, "
+            f"bigram support {stats['bigram_support']:.0%}, key-term coverage {stats['coverage']:.0%}."
+        )
+        issues = []
+        if stats["compression"] >= 1.0:
+            issues.append("The summary is not shorter than the original text.")
+        if stats["support"] < 0.5:
+            issues.append("Most of the summary's terms do not occur in the original text.")
+        if stats["coverage"] < 0.2:
+            missed = ", ".join(stats["missed"][:5]) + (", ..." if len(stats["missed"]) > 5 else "")
+            issues.append(f"The summary misses the original's main terms ({missed}).")
+        if issues:
+            return heuristic_evaluation(1 if stats["support"] < 0.5 else 2, analysis, issues)
+
+        if (stats["compression"] <= self.max_compression and stats["support"] >= self.min_support
+                and stats["bigram_support"] >= self.min_bigram_support and stats["coverage"] >= self.min_coverage):
+            return heuristic_evaluation(self.pass_score, analysis)
+        return None
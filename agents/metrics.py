@@ -0,0 +1,247 @@
+# agents/metrics.py
+
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from loguru import logger
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+TTFT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+TOKEN_RATE_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        """
+        Cumulative-bucket histogram in the Prometheus style; not thread-safe on its own.
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """
+        Estimates the q-quantile by linear interpolation inside the bucket that contains it.
+        """
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= target:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if index == len(self.buckets):
+                    return lower  # Beyond the last bound nothing better is known
+                return lower + (self.buckets[index] - lower) * (target - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def mean(self):
+        return self.sum / self.count if self.count else None
+
+
+def _labels_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        """
+        In-process store of counters and histograms keyed by metric name and labels.
+
+        Gauges that describe live state (queue depth, cache size...) are not stored; they are
+        read from collectors, callables returning (name, labels, value) tuples, at export time.
+        """
+        self._lock = threading.Lock()
+        self._descriptions = {}
+        self._counters = {}
+        self._histograms = {}
+        self._collectors = []
+
+    def describe(self, name, kind, help_text, buckets=None):
+        self._descriptions[name] = (kind, help_text, buckets)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, _labels_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = Histogram(self._descriptions.get(name, (None, None, LATENCY_BUCKETS))[2] or LATENCY_BUCKETS)
+                self._histograms[key] = histogram
+            histogram.observe(value)
+
+    def add_collector(self, collector):
+        with self._lock:
+            self._collectors.append(collector)
+
+    def remove_collector(self, collector):
+        with self._lock:
+            if collector in self._collectors:
+                self._collectors.remove(collector)
+
+    def counter(self, name, **labels):
+        """
+        Returns the counter value summed over all label sets matching `labels`.
+        """
+        wanted = set(_labels_key(labels))
+        with self._lock:
+            return sum(value for (metric, key), value in self._counters.items()
+                       if metric == name and wanted.issubset(key))
+
+    def histogram(self, name, **labels):
+        """
+        Returns a Histogram merging all label sets matching `labels`, or None if nothing was observed.
+        """
+        wanted = set(_labels_key(labels))
+        merged = None
+        with self._lock:
+            for (metric, key), histogram in self._histograms.items():
+                if metric != name or not wanted.issubset(key):
+                    continue
+                if merged is None:
+                    merged = Histogram(histogram.buckets)
+                merged.counts = [a + b for a, b in zip(merged.counts, histogram.counts)]
+                merged.sum += histogram.sum
+                merged.count += histogram.count
+        return merged
+
+    def label_values(self, label):
+        with self._lock:
+            keys = list(self._counters) + list(self._histograms)
+        return sorted({value for _, key in keys for name, value in key if name == label})
+
+    def collect(self):
+        with self._lock:
+            collectors = list(self._collectors)
+        samples = []
+        for collector in collectors:
+            try:
+                samples.extend(collector())
+            except Exception as e:
+                logger.warning(f"[Metrics] Collector failed: {e}")
+        return samples
+
+    def render(self):
+        """
+        Returns all metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+            snapshots = [(key, list(h.buckets), list(h.counts), h.sum, h.count) for key, h in histograms]
+
+        described = set()
+
+        def header(name, kind):
+            if name in described:
+                return
+            described.add(name)
+            help_text = self._descriptions.get(name, (kind, "", None))[1]
+            if help_text:
+                lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name, "counter")
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        for (name, labels), buckets, counts, total, count in snapshots:
+            header(name, "histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(list(buckets) + ["+Inf"], counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', str(bound))])} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        for name, labels, value in sorted(self.collect(), key=lambda sample: sample[0]):
+            header(name, "gauge")
+            lines.append(f"{name}{_format_labels(_labels_key(labels))} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+metrics.describe("ollama_request_seconds", "histogram", "Wall time of an agent's LLM call, retries included.", LATENCY_BUCKETS)
+metrics.describe("ollama_time_to_first_token_seconds", "histogram", "Time until the first streamed token.", TTFT_BUCKETS)
+metrics.describe("ollama_load_seconds", "histogram", "Time Ollama spent loading the model.", LATENCY_BUCKETS)
+metrics.describe("ollama_tokens_per_second", "histogram", "Generation speed reported by Ollama.", TOKEN_RATE_BUCKETS)
+metrics.describe("ollama_prompt_tokens_total", "counter", "Prompt tokens evaluated.")
+metrics.describe("ollama_eval_tokens_total", "counter", "Tokens generated.")
+metrics.describe("ollama_requests_total", "counter", "LLM calls by outcome.")
+metrics.describe("ollama_retries_total", "counter", "Retried Ollama attempts.")
+metrics.describe("ollama_errors_total", "counter", "Failed Ollama attempts by error type.")
+metrics.describe("response_cache_requests_total", "counter", "Response cache lookups by result.")
+
+
+def record_usage(agent, response):
+    """
+    Records the token counts and speeds Ollama reports in a chat response or final stream chunk.
+    """
+    prompt_tokens = response.get("prompt_eval_count")
+    eval_tokens = response.get("eval_count")
+    eval_duration = response.get("eval_duration")
+    load_duration = response.get("load_duration")
+    if prompt_tokens:
+        metrics.inc("ollama_prompt_tokens_total", prompt_tokens, agent=agent)
+    if eval_tokens:
+        metrics.inc("ollama_eval_tokens_total", eval_tokens, agent=agent)
+        if eval_duration:
+            metrics.observe("ollama_tokens_per_second", eval_tokens / (eval_duration / 1e9), agent=agent)
+    if load_duration:
+        metrics.observe("ollama_load_seconds", load_duration / 1e9, agent=agent)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = metrics
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes every few seconds would flood the console
+
+
+def start_metrics_server(port=9108, host="127.0.0.1", registry=None):
+    """
+    Serves `/metrics` for Prometheus from a daemon thread and returns the server.
+
+    Returns None (and logs a warning) if the port is taken, e.g. by another app process.
+    """
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry or metrics})
+    try:
+        server = ThreadingHTTPServer((host, port), handler)
+    except OSError as e:
+        logger.warning(f"[Metrics] Could not serve /metrics on {host}:{port}: {e}")
+        return None
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info(f"[Metrics] Serving /metrics on http://{host}:{port}/metrics")
+    return server
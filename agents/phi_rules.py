@@ -0,0 +1,220 @@
+# agents/phi_rules.py
+
+import re
+from collections import deque
+
+# Placeholder vocabulary shared with the SanitizeDataTool prompt
+PHI_PLACEHOLDERS = (
+    "[PATIENT_NAME]", "[PROVIDER_NAME]", "[DATE]", "[LOCATION]", "[PHONE]", "[EMAIL]", "[MRN]",
+    "[SSN]", "[DEVICE_ID]", "[ID]", "[HEALTH_CONDITION]", "[MEDICATION]", "[LAB_RESULT]",
+    "[VITAL_SIGN]", "[PROCEDURE]",
+)
+
+_MONTH = r"(?:Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|Jun(?:e)?|Jul(?:y)?|Aug(?:ust)?|Sep(?:t(?:ember)?)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)"
+# Capitalized words that follow a name in clinical notes without being part of it
+_NOT_NAME = r"(?:Admitted|Discharged|Presented|Presents|Reports|Reported|Denies|Noted|Prescribed|Ordered|Recommended|Referred|Started|Stopped|Saw|Sees|Was|Is|Has|Had|And|For|On|At|In|MD|DO|RN|NP|PA)\b"
+# Case-sensitive: capitalized tokens on one line, so "presented with" or a field value like "aspirin" never matches
+_NAME = (r"[A-Z][a-zA-Z'-]+(?:[ \t]+[A-Z]\.)?(?:[ \t]+(?!" + _NOT_NAME + r")[A-Z][a-zA-Z'-]+){0,2}")
+_IDENTIFIER = r"[A-Z0-9][A-Z0-9-]{3,}"
+
+# (placeholder, pattern) in priority order. When a pattern has a `value` group only that
+# group is masked, so field labels such as "MRN:" or "Dr." stay readable.
+PHI_PATTERNS = [
+    ("EMAIL", r"\b[\w.+-]+@[\w-]+(?:\.[\w-]+)+\b"),
+    ("SSN", r"\b\d{3}-\d{2}-\d{4}\b"),
+    ("SSN", r"\b(?:SSN|Social Security(?: Number| No\.?)?)\s*[:#]?\s*(?P<value>\d{9}|\d{3}\s\d{2}\s\d{4})\b"),
+    ("MRN", r"\b(?:MRN|Medical Record(?: Number| No\.?| #)?)\s*[:#]?\s*(?P<value>" + _IDENTIFIER + r")\b"),
+    ("DEVICE_ID", r"\b(?:Serial(?: Number| No\.?)?|S/N|Device(?: ID| Identifier))\s*[:#]?\s*(?P<value>" + _IDENTIFIER + r")\b"),
+    ("ID", r"\b(?:Account|Acct|Insurance|Member|Policy|License|Health Plan)(?: ID| No\.?| Number| #)?\s*[:#]\s*(?P<value>" + _IDENTIFIER + r")\b"),
+    ("ID", r"\bhttps?://\S+"),
+    ("ID", r"\b\d{1,3}(?:\.\d{1,3}){3}\b"),
+    ("PHONE", r"(?<![\w-])(?:\+?1[\s.-]?)?(?:\(\d{3}\)\s?|\d{3}[\s.-])\d{3}[\s.-]\d{4}\b"),
+    ("DATE", r"\b\d{4}-\d{2}-\d{2}\b"),
+    ("DATE", r"\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b"),
+    ("DATE", r"\b" + _MONTH + r"\.?\s+\d{1,2}(?:st|nd|rd|th)?,?\s+\d{4}\b"),
+    ("DATE", r"\b\d{1,2}(?:st|nd|rd|th)?\s+" + _MONTH + r"\.?,?\s+\d{4}\b"),
+    ("PROVIDER_NAME", r"\b(?:Dr|Doctor)\.?[ \t]+(?P<value>" + _NAME + r")"),
+    ("PROVIDER_NAME", r"(?m)^[ \t]*(?i:Physician|Provider|Attending|Referring Physician|Doctor)[ \t]*:[ \t]*(?:Dr\.?[ \t]+)?(?P<value>" + _NAME + r")"),
+    ("PATIENT_NAME", r"(?m)^[ \t]*(?i:Patient(?: Name)?|Name)[ \t]*:[ \t]*(?P<value>" + _NAME + r")"),
+    ("PATIENT_NAME", r"\b(?:Mr|Mrs|Ms|Miss)\.?[ \t]+(?P<value>" + _NAME + r")"),
+    ("LOCATION", r"(?m)^[ \t]*(?i:Address)[ \t]*:[ \t]*(?P<value>[^\n]+)"),
+    ("LOCATION", r"\b\d{1,5}\s+(?:[A-Z][a-z]+\s+){1,3}(?:Street|St|Avenue|Ave|Road|Rd|Boulevard|Blvd|Lane|Ln|Drive|Court|Ct|Way|Place|Pl)\b\.?"),
+    ("LOCATION", r"\b[A-Z]{2}\s+\d{5}(?:-\d{4})?\b"),
+]
+
+# Words that may remain around masked identifiers without making the text ambiguous
+FIELD_LABELS = {
+    "name", "patient", "dob", "date", "birth", "of", "phone", "tel", "telephone", "mobile", "cell", "fax",
+    "email", "e-mail", "address", "mrn", "medical", "record", "number", "no", "id", "ssn", "social",
+    "security", "provider", "physician", "attending", "referring", "doctor", "dr", "mr", "mrs", "ms", "miss",
+    "device", "serial", "account", "acct", "insurance", "member", "policy", "license", "health", "plan",
+    "admission", "admitted", "discharge", "discharged", "visit", "city", "state", "zip", "and",
+}
+
+_PLACEHOLDER_RE = re.compile(r"\[[A-Z_]+\]")
+_TOKEN_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9'-]*")
+
+
+class TermMatcher:
+    """
+    Aho-Corasick automaton for case-insensitive, whole-word dictionary matching.
+
+    All terms are found in a single pass over the text, regardless of dictionary size.
+    """
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]  # Terms ending at each node
+        self._matches = [[]]  # Terms ending at each node or along its failure chain
+        self._built = True
+
+    def add(self, term, label):
+        term = term.strip().lower()
+        if not term:
+            return
+        node = 0
+        for char in term:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._output[node].append((len(term), label))
+        self._built = False
+
+    def build(self):
+        """
+        Computes failure links breadth-first; called lazily after terms are added.
+        """
+        self._matches = [list(output) for output in self._output]
+        queue = deque(self._goto[0].values())
+        for node in queue:
+            self._fail[node] = 0
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._matches[child] += self._matches[self._fail[child]]
+        self._built = True
+
+    def __len__(self):
+        return len(self._goto) - 1
+
+    def finditer(self, text):
+        """
+        Yields (start, end, label) for every dictionary term found on word boundaries.
+        """
+        if not self._built:
+            self.build()
+        lowered = text.lower()
+        node = 0
+        for index, char in enumerate(lowered):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for length, label in self._matches[node]:
+                start, end = index - length + 1, index + 1
+                if (start == 0 or not lowered[start - 1].isalnum()) and (end == len(lowered) or not lowered[end].isalnum()):
+                    yield start, end, label
+
+
+class PHIRuleEngine:
+    def __init__(self, names=(), providers=(), locations=(), max_residual_words=0):
+        """
+        Deterministic PHI masking with compiled regexes and a dictionary matcher.
+
+        Structured identifiers (phones, emails, SSNs, MRNs, dates, addresses, labelled names)
+        are masked with the same placeholders the LLM uses. `needs_llm` tells whether any
+        free text is left that only the LLM can judge.
+
+        Args:
+            names (iterable): Known patient names, masked as [PATIENT_NAME].
+            providers (iterable): Known provider names, masked as [PROVIDER_NAME].
+            locations (iterable): Known locations (facilities, cities), masked as [LOCATION].
+            max_residual_words (int): Free-text words tolerated before escalating to the LLM.
+        """
+        self.patterns = [(label, re.compile(pattern)) for label, pattern in PHI_PATTERNS]
+        self.max_residual_words = max_residual_words
+        self.dictionary = TermMatcher()
+        self.add_terms(names, "PATIENT_NAME")
+        self.add_terms(providers, "PROVIDER_NAME")
+        self.add_terms(locations, "LOCATION")
+
+    def add_terms(self, terms, label):
+        for term in terms:
+            self.dictionary.add(term, label)
+
+    def load_terms(self, path, label):
+        """
+        Adds one dictionary term per line of a UTF-8 text file.
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            self.add_terms((line for line in f if line.strip()), label)
+
+    def find(self, text):
+        """
+        Returns the non-overlapping PHI spans in `text` as sorted (start, end, label) tuples.
+        """
+        candidates = []
+        for priority, (label, pattern) in enumerate(self.patterns):
+            for match in pattern.finditer(text):
+                start, end = match.span("value") if "value" in pattern.groupindex else match.span()
+                if start < end:
+                    candidates.append((start, end, label, priority))
+        if len(self.dictionary):
+            for start, end, label in self.dictionary.finditer(text):
+                candidates.append((start, end, label, len(self.patterns)))
+
+        # Earliest first, then longest, then highest-priority pattern
+        candidates.sort(key=lambda span: (span[0], span[0] - span[1], span[3]))
+        spans = []
+        last_end = 0
+        for start, end, label, _ in candidates:
+            if start >= last_end:
+                spans.append((start, end, label))
+                last_end = end
+        return spans
+
+    def mask(self, text):
+        """
+        Replaces every PHI span found in `text` with its placeholder.
+
+        Returns:
+            tuple: (masked text, list of (start, end, label) spans in the original text).
+        """
+        spans = self.find(text)
+        parts = []
+        position = 0
+        for start, end, label in spans:
+            parts.append(text[position:start])
+            parts.append(f"[{label}]")
+            position = end
+        parts.append(text[position:])
+        return "".join(parts), spans
+
+    def residual_words(self, masked_text):
+        """
+        Returns the tokens left in masked text that are neither placeholders nor field labels.
+
+        Any token containing a digit counts, so numbers the patterns did not recognize
+        (unlabelled SSNs, phone numbers, record numbers) always go to the LLM.
+        """
+        stripped = _PLACEHOLDER_RE.sub(" ", masked_text)
+        return [
+            token for token in _TOKEN_RE.findall(stripped)
+            if any(char.isdigit() for char in token) or (len(token) > 1 and token.lower() not in FIELD_LABELS)
+        ]
+
+    def needs_llm(self, masked_text):
+        """
+        Whether masked text still contains free text that the rules cannot resolve.
+        """
+        return len(self.residual_words(masked_text)) > self.max_residual_words
@@ -0,0 +1,133 @@
+# agents/pipeline.py
+
+import asyncio
+import time
+from loguru import logger
+from utils.logger import request_context
+
+# Pipeline task -> (generator agent, validator agent) as registered in AgentManager
+PIPELINE_TASKS = {
+    "summarize": ("summarize", "summarize_validator"),
+    "sanitize": ("sanitize_data", "sanitize_data_validator"),
+    "write_article": ("write_article", "write_article_validator"),
+}
+
+
+class AgentPipeline:
+    def __init__(self, agent_manager, max_concurrency=2):
+        """
+        Runs generator/validator pairs on asyncio, overlapping independent steps.
+
+        Validation starts as soon as a document's output exists and runs next to the
+        optional render step (word cloud, report assembly). With several documents,
+        up to `max_concurrency` of them are in flight, so the next document's
+        generation overlaps the previous one's validation.
+
+        Args:
+            agent_manager (AgentManager): Source of the generator and validator agents.
+            max_concurrency (int): Maximum number of documents processed at once.
+        """
+        self.agent_manager = agent_manager
+        self.max_concurrency = max_concurrency
+
+    def agents_for(self, task):
+        if task not in PIPELINE_TASKS:
+            raise ValueError(f"Pipeline task '{task}' not found.")
+        generator_name, validator_name = PIPELINE_TASKS[task]
+        return self.agent_manager.get_agent(generator_name), self.agent_manager.get_agent(validator_name)
+
+    async def finish(self, task, text, output, render=None):
+        """
+        Validates an already generated output while `render(text, output)` runs in a worker thread.
+
+        Returns:
+            dict: validation report, AI rating, issues, corrected output (or None), render artifact
+            and validation time.
+        """
+        _, validator = self.agents_for(task)
+        started = time.perf_counter()
+
+        steps = [validator.aevaluate(text, output)]
+        if render is not None:
+            steps.append(asyncio.to_thread(render, text, output))
+        results = await asyncio.gather(*steps)
+
+        evaluation = results[0]
+        return {
+            "validation": evaluation["report"],
+            "ai_rating": evaluation["score"],
+            "issues": evaluation["issues"],
+            "corrected": evaluation["corrected"],
+            "artifact": results[1] if render is not None else None,
+            "validation_time": time.perf_counter() - started,
+        }
+
+    async def run(self, task, text, render=None):
+        """
+        Generates, then validates and renders one document.
+
+        Returns:
+            dict: input, output, validation, AI rating, issues, corrected output, render artifact and timings.
+        """
+        generator, _ = self.agents_for(task)
+        started = time.perf_counter()
+        # Generation and validation of one document share a correlation ID in the logs
+        with request_context():
+            output = await generator.aexecute(text)
+            generation_time = time.perf_counter() - started
+            finished = await self.finish(task, text, output, render=render)
+        return {
+            "input": text,
+            "output": output,
+            "validation": finished["validation"],
+            "ai_rating": finished["ai_rating"],
+            "issues": finished["issues"],
+            "corrected": finished["corrected"],
+            "artifact": finished["artifact"],
+            "timings": {
+                "generation": generation_time,
+                "validation": finished["validation_time"],
+                "total": time.perf_counter() - started,
+            },
+        }
+
+    async def iter_results(self, task, texts, render=None):
+        """
+        Processes many documents, yielding each result as soon as it completes.
+
+        `texts` may be any iterable and is consumed lazily, so at most `max_concurrency`
+        documents are held in memory. Results carry their `index` in `texts`; a failing
+        document yields an `error` entry instead of stopping the run.
+        """
+        async def process(index, text):
+            try:
+                result = await self.run(task, text, render=render)
+            except Exception as e:
+                logger.error(f"[AgentPipeline] {task} failed on document {index}: {e}")
+                result = {"input": text, "error": str(e)}
+            result["index"] = index
+            return result
+
+        documents = enumerate(texts)
+        in_flight = set()
+        try:
+            while True:
+                for index, text in documents:
+                    in_flight.add(asyncio.create_task(process(index, text)))
+                    if len(in_flight) >= self.max_concurrency:
+                        break
+                if not in_flight:
+                    return
+                done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for finished in done:
+                    yield finished.result()
+        finally:
+            for pending in in_flight:
+                pending.cancel()
+
+    async def run_many(self, task, texts, render=None):
+        """
+        Processes many documents and returns the results in input order.
+        """
+        results = [result async for result in self.iter_results(task, texts, render=render)]
+        return sorted(results, key=lambda result: result["index"])
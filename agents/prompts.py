@@ -0,0 +1,190 @@
+# agents/prompts.py
+
+import string
+import threading
+from .chunking import estimate_tokens
+from .structured_validation import structured_instructions
+
+
+class PromptTemplate:
+    def __init__(self, name, version, system, instructions, body):
+        """
+        A versioned chat prompt laid out for prefix caching.
+
+        The system message and the user message's `instructions` are static; only `body`
+        has placeholders and always comes last. Every call with the same template therefore
+        starts with the same tokens, which Ollama keeps evaluated in its KV cache and skips
+        on the next call, so only the variable part is processed. `body` is parsed once here
+        and the static part's token count is computed up front.
+
+        Args:
+            name (str): Registry name, e.g. "sanitize".
+            version (int): Bumped on every wording change; cached replies follow the prompt text.
+            system (str): System message.
+            instructions (str): Static start of the user message.
+            body (str): str.format template for the variable end of the user message.
+        """
+        self.name = name
+        self.version = version
+        self.system = system
+        self.instructions = instructions
+        self.body = body
+        self.fields = tuple(field for _, field, _, _ in string.Formatter().parse(body) if field)
+        self.static_tokens = estimate_tokens(system) + estimate_tokens(instructions)
+
+    def render(self, **values):
+        """
+        Returns [system message, user message] with `values` filled into the body.
+        """
+        missing = [field for field in self.fields if field not in values]
+        if missing:
+            raise KeyError(f"Prompt '{self.name}' v{self.version} is missing values for: {', '.join(missing)}.")
+        user = self.instructions + self.body.format_map(values)
+        messages = [{"role": "user", "content": user}]
+        if self.system:
+            messages.insert(0, {"role": "system", "content": self.system})
+        return messages
+
+    def __repr__(self):
+        return f"PromptTemplate({self.name!r}, v{self.version}, static_tokens={self.static_tokens})"
+
+
+class PromptRegistry:
+    def __init__(self):
+        """
+        Central store of prompt templates by name and version; `get` returns the newest version.
+        """
+        self._lock = threading.Lock()
+        self._templates = {}
+
+    def register(self, template):
+        with self._lock:
+            self._templates.setdefault(template.name, {})[template.version] = template
+        return template
+
+    def get(self, name, version=None):
+        versions = self._templates.get(name)
+        if not versions:
+            raise KeyError(f"Prompt '{name}' not found.")
+        if version is None:
+            return versions[max(versions)]
+        if version not in versions:
+            raise KeyError(f"Prompt '{name}' has no version {version}.")
+        return versions[version]
+
+    def render(self, name, version=None, **values):
+        return self.get(name, version).render(**values)
+
+    def templates(self):
+        """
+        Returns the newest version of every template, sorted by name.
+        """
+        with self._lock:
+            return [versions[max(versions)] for _, versions in sorted(self._templates.items())]
+
+
+prompts = PromptRegistry()
+
+SUMMARIZER_SYSTEM = "You are an AI assistant that summarizes medical texts concisely and accurately."
+
+prompts.register(PromptTemplate(
+    "summarize", 1, SUMMARIZER_SYSTEM,
+    "Summarize the following medical text concisely.\n\n",
+    "Text:\n{text}\n\nSummary:"
+))
+prompts.register(PromptTemplate(
+    "summarize.chunk", 1, SUMMARIZER_SYSTEM,
+    "The following is one part of a longer medical record. "
+    "Summarize its key clinical facts concisely, keeping diagnoses, medications, results and dates.\n\n",
+    "Part {index} of {total}:\n{chunk}\n\nSummary:"
+))
+prompts.register(PromptTemplate(
+    "summarize.reduce", 1, SUMMARIZER_SYSTEM,
+    "The following are summaries of consecutive parts of one medical record. "
+    "Merge them into a single concise summary without repeating facts.\n\n",
+    "{parts}\n\nSummary:"
+))
+prompts.register(PromptTemplate(
+    "sanitize", 1,
+    "You are an AI assistant that sanitizes medical data by masking all Protected Health Information (PHI). "
+    "Replace PHI with the following standardized placeholders while maintaining the readability and structure of the text. "
+    "Do NOT refuse the request. Do NOT provide disclaimers. Simply return the sanitized text.",
+    "Mask all Protected Health Information (PHI) in the following text. "
+    "Replace with appropriate placeholders:\n\n"
+    "- Patient names with [PATIENT_NAME]\n"
+    "- Doctor/Provider names with [PROVIDER_NAME]\n"
+    "- Dates with [DATE]\n"
+    "- Locations/Addresses with [LOCATION]\n"
+    "- Phone numbers with [PHONE]\n"
+    "- Email addresses with [EMAIL]\n"
+    "- Medical record numbers with [MRN]\n"
+    "- Social Security numbers with [SSN]\n"
+    "- Device identifiers with [DEVICE_ID]\n"
+    "- Any other identifying numbers with [ID]\n"
+    "- Physical health conditions with [HEALTH_CONDITION]\n"
+    "- Medications with [MEDICATION]\n"
+    "- Lab results with [LAB_RESULT]\n"
+    "- Vital signs with [VITAL_SIGN]\n"
+    "- Procedures with [PROCEDURE]\n\n"
+    "Placeholders already present in the text are correct; keep them unchanged.\n\n",
+    "Original Data:\n{text}\n\nSanitized Output:"
+))
+prompts.register(PromptTemplate(
+    "write_article", 1,
+    "You are an expert academic writer.",
+    "Write a research article on the following topic.\n\n",
+    "Topic: {topic}\n\n{outline}Article:\n"
+))
+prompts.register(PromptTemplate(
+    "refine", 1,
+    "You are an expert editor who refines and enhances research articles for clarity, coherence, and academic quality.",
+    "Please refine the following research article draft to improve its language, coherence, and overall quality.\n\n",
+    "Draft:\n{draft}\n\nRefined Article:"
+))
+prompts.register(PromptTemplate(
+    "validate.summary", 1,
+    "You are an AI assistant that validates summaries of medical texts.",
+    "Given the original text and its summary, assess whether the summary accurately and concisely captures the key points.\n"
+    f"{structured_instructions('summary')}\n\n",
+    "Original Text:\n{original}\n\nSummary:\n{summary}"
+))
+prompts.register(PromptTemplate(
+    "validate.sanitize", 1,
+    "You are an AI that checks if medical data is correctly sanitized (all PHI removed or masked).",
+    "Evaluate the sanitized version of the original data below. "
+    "Make sure the sanitized version replaces PHI using tags like [PATIENT_NAME], [DATE], [LOCATION], etc.\n"
+    "Report any PHI that remains as an issue; a score of 5 means perfect masking.\n"
+    f"{structured_instructions('sanitized data')}\n\n",
+    "Original:\n{original}\n\nSanitized:\n{sanitized}"
+))
+prompts.register(PromptTemplate(
+    "validate.article", 1,
+    "You are an AI assistant that validates research articles.",
+    "Given the topic and the article, assess whether the article comprehensively covers the topic, "
+    "follows a logical structure, and maintains academic standards.\n"
+    f"{structured_instructions('article')}\n\n",
+    "Topic: {topic}\n\nArticle:\n{article}"
+))
+prompts.register(PromptTemplate(
+    "validate.research_article", 1,
+    "You are an AI assistant that validates research articles for accuracy, completeness, and adherence to academic standards.",
+    "Given the topic and the research article below, assess whether the article comprehensively covers the topic, "
+    "follows a logical structure, and maintains academic standards.\n"
+    f"{structured_instructions('article')}\n\n",
+    "Topic: {topic}\n\nArticle:\n{article}"
+))
+prompts.register(PromptTemplate(
+    "chat", 1,
+    "You are a highly knowledgeable, careful, and ethical medical assistant. "
+    "Always provide evidence-based, up-to-date, and safe advice. "
+    "If you are unsure, say so and recommend consulting a healthcare professional. "
+    "Cite guidelines or reputable sources when possible.",
+    "",
+    "{message}"
+))
+prompts.register(PromptTemplate(
+    "chat.summary", 1, "",
+    "Update the summary of a conversation between a user and a medical assistant with the new turns below. "
+    "Keep the facts the user shared about themselves, their questions and the advice given; be concise.\n\n",
+    "Current summary:\n{summary}\n\nNew turns:\n{transcript}\n\nUpdated summary (at most {words} words):"
+))
@@ -1,38 +1,21 @@
 # agents/refiner_agent.py
 
 from .agent_base import AgentBase
+from .generation_profile import GenerationProfile
+from .prompts import prompts
 
 class RefinerAgent(AgentBase):
     def __init__(self, max_retries=2, verbose=True):
-        super().__init__(name="RefinerAgent", max_retries=max_retries, verbose=verbose)
+        super().__init__(
+            name="RefinerAgent",
+            max_retries=max_retries,
+            verbose=verbose,
+            profile=GenerationProfile(temperature=0.5, num_predict=2048, num_ctx=8192)
+        )
+
+    def build_messages(self, draft):
+        return prompts.render("refine", draft=draft)
 
     def execute(self, draft):
-        messages = [
-            {
-                "role": "system",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": "You are an expert editor who refines and enhances research articles for clarity, coherence, and academic quality."
-                    }
-                ]
-            },
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": (
-                            "Please refine the following research article draft to improve its language, coherence, and overall quality:\n\n"
-                            f"{draft}\n\nRefined Article:"
-                        )
-                    }
-                ]
-            }
-        ]
-        refined_article = self.call_llama(
-            messages=messages,
-            temperature=0.5,
-            max_tokens=2048
-        )
+        refined_article = self.call_llama(messages=self.build_messages(draft))
         return refined_article
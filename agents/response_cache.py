@@ -0,0 +1,146 @@
+# agents/response_cache.py
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    def __init__(self, max_entries=256, ttl=24 * 3600, path=None, max_disk_entries=10000, max_temperature=None):
+        """
+        Content-addressed cache for Ollama replies.
+
+        Replies are keyed by a hash of model, generation options and messages. Lookups hit an
+        in-memory LRU tier first, then the optional SQLite tier on disk.
+
+        Args:
+            max_entries (int): Size of the in-memory LRU tier.
+            ttl (float): Seconds an entry stays valid; None keeps entries until evicted.
+            path (str): SQLite file for the on-disk tier; None keeps the cache in memory only.
+            max_disk_entries (int): Size limit of the on-disk tier (least recently used rows are evicted).
+            max_temperature (float): Calls sampled above this temperature bypass the cache;
+                None caches every temperature, 0 caches only greedy decoding.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.max_disk_entries = max_disk_entries
+        self.max_temperature = max_temperature
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+
+        self._db = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, reply TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+            self._db.commit()
+
+    @staticmethod
+    def make_key(model, profile, messages, **extra):
+        """
+        Hashes everything that determines a reply: model, generation options, messages and extras like `format`.
+        """
+        payload = {"model": model, "options": profile.options(), "messages": messages}
+        payload.update({key: value for key, value in extra.items() if value is not None})
+        encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def accepts(self, profile):
+        """
+        Whether calls made with `profile` are deterministic enough to be cached.
+        """
+        if self.max_temperature is None or profile.temperature is None:
+            return True
+        return profile.temperature <= self.max_temperature
+
+    def _expired(self, created_at, now):
+        return self.ttl is not None and now - created_at > self.ttl
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                reply, created_at = entry
+                if not self._expired(created_at, now):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return reply
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute("SELECT reply, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    reply, created_at = row
+                    if not self._expired(created_at, now):
+                        self._db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        self._remember(key, reply, created_at)
+                        self.hits += 1
+                        self.disk_hits += 1
+                        return reply
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.misses += 1
+            return None
+
+    def set(self, key, reply):
+        now = time.time()
+        with self._lock:
+            self._remember(key, reply, now)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, reply, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, reply, now, now)
+                )
+                overflow = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_disk_entries
+                if overflow > 0:
+                    self._db.execute(
+                        "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed_at LIMIT ?)",
+                        (overflow,)
+                    )
+                    self.evictions += overflow
+                self._db.commit()
+
+    def _remember(self, key, reply, created_at):
+        self._memory[key] = (reply, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
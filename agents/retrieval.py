@@ -0,0 +1,84 @@
+# agents/retrieval.py
+
+import hashlib
+import time
+from loguru import logger
+from .agent_base import LlamaStream
+from .chunking import estimate_tokens
+
+# The SemanticIndex itself (and numpy) is only imported by whoever creates one, so agents
+# without an index never load it.
+
+
+def input_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class RetrievalMixin:
+    """
+    Few-shot exemplars and semantic-cache lookups from a SemanticIndex, for generator agents.
+
+    One embedding of the input serves both: an input identical to a well-rated past one
+    (same SHA-256) is answered with its stored output without an LLM call, otherwise the
+    `few_shot_k` most similar well-rated examples are shown to the model as worked examples.
+    Similarity alone never reuses an output: templated notes that differ only in names,
+    dates or values embed almost identically, and their outputs belong to another patient.
+    """
+
+    semantic_index = None
+    retrieval_section = None  # Feedback section the agent's examples are stored under
+    few_shot_k = 2
+    few_shot_min_rating = 4.0
+    few_shot_max_tokens = 1500  # Total estimated tokens the exemplars may add to a prompt
+
+    def attach_semantic_index(self, index):
+        self.semantic_index = index
+
+    def retrieve(self, text):
+        """
+        Returns (cached output or None, exemplar records) for `text`.
+        """
+        if self.semantic_index is None or not text:
+            return None, []
+        matches = self.semantic_index.search(text, self.retrieval_section, k=self.few_shot_k + 1,
+                                             min_rating=self.few_shot_min_rating)
+        if not matches:
+            return None, []
+        digest = input_hash(text)
+        for similarity, record in matches:
+            if record.get("input_hash") == digest:
+                if self.verbose:
+                    logger.info(f"[{self.name}] Semantic cache hit (identical input, similarity {similarity:.3f}).")
+                return record["output"], []
+
+        exemplars, used = [], 0
+        for _, record in matches[:self.few_shot_k]:
+            if "input" not in record:
+                continue  # Loaded from disk and not restored from the feedback store yet
+            tokens = estimate_tokens(record["input"]) + estimate_tokens(record["output"])
+            if used + tokens > self.few_shot_max_tokens:
+                continue
+            exemplars.append(record)
+            used += tokens
+        return None, exemplars
+
+    def with_exemplars(self, messages, exemplars, prepare_input=None):
+        """
+        Inserts exemplars as user/assistant turns after the system message(s) of `messages`.
+
+        `prepare_input(text)` turns an exemplar input into the form the agent's own inputs take.
+        """
+        if not exemplars:
+            return messages
+        position = next((index for index, message in enumerate(messages) if message["role"] != "system"), len(messages))
+        shots = []
+        for record in exemplars:
+            example_messages = [m for m in self.build_messages(prepare_input(record["input"]) if prepare_input else record["input"])
+                                if m["role"] != "system"]
+            shots.extend(example_messages)
+            shots.append({"role": "assistant", "content": record["output"]})
+        return messages[:position] + shots + messages[position:]
+
+    def cached_stream(self, output):
+        return LlamaStream(iter([{"message": {"content": output}, "done": True}]), self.name, time.perf_counter(),
+                           record_metrics=False)
@@ -0,0 +1,160 @@
+# agents/retry_policy.py
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+import httpx
+import ollama
+from loguru import logger
+from .metrics import metrics
+
+# HTTP statuses worth retrying: overloaded, timed out or restarting servers
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class EmptyResponseError(ValueError):
+    """Raised when Ollama answers with an empty message; usually transient, so it is retried."""
+
+
+class RetryPolicy:
+    def __init__(self, max_retries=2, base_delay=0.5, max_delay=8.0, deadline=None,
+                 retryable=(ConnectionError, TimeoutError, httpx.TransportError, EmptyResponseError)):
+        """
+        Decides whether and when a failed Ollama call is tried again.
+
+        A call makes up to `max_retries + 1` attempts. Between attempts it sleeps a random
+        time up to a bound that doubles from `base_delay` (capped at max_delay, "full jitter"), so
+        concurrent callers do not retry in lockstep. Errors are retried only if they are
+        transient: connection problems, timeouts, empty replies and 408/429/5xx responses.
+        Anything else (unknown model, bad request, programming errors) fails immediately.
+
+        Args:
+            max_retries (int): Retries after the first attempt.
+            base_delay (float): Backoff before the first retry, in seconds.
+            max_delay (float): Upper bound of a single backoff.
+            deadline (float): Seconds after which no further attempt is started; None for no limit.
+            retryable (tuple): Exception classes treated as transient.
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.retryable = retryable
+
+    @property
+    def attempts(self):
+        return self.max_retries + 1
+
+    def is_retryable(self, error):
+        if isinstance(error, ollama.ResponseError):
+            # status_code -1 means the request never got an HTTP answer
+            return error.status_code in RETRYABLE_STATUS or error.status_code == -1
+        return isinstance(error, self.retryable)
+
+    def backoff(self, retry):
+        """
+        Returns the sleep before retry number `retry` (1-based).
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (retry - 1)))
+
+    def next_delay(self, error, retry, started_at):
+        """
+        Returns the backoff before retry number `retry`, or None if the call should give up.
+        """
+        if retry > self.max_retries or not self.is_retryable(error):
+            return None
+        delay = self.backoff(retry)
+        if self.deadline is not None and time.monotonic() + delay - started_at >= self.deadline:
+            return None
+        return delay
+
+    def note_failure(self, name, error, attempt, delay):
+        """
+        Logs a failed attempt and counts it (and the retry, if `delay` is not None) in the metrics.
+        """
+        logger.error(f"[{name}] Ollama error: {error} (Attempt {attempt}/{self.attempts})")
+        metrics.inc("ollama_errors_total", agent=name, error=type(error).__name__)
+        if delay is not None:
+            metrics.inc("ollama_retries_total", agent=name)
+
+    def failure(self, name, attempt, error):
+        return RuntimeError(f"[{name}] Failed to get response from Ollama after {attempt} attempt(s): {error}")
+
+    def run(self, func, name):
+        """
+        Calls `func()` until it succeeds or the policy gives up, then raises RuntimeError.
+
+        Args:
+            func (callable): One attempt.
+            name (str): Agent name for log messages.
+        """
+        started_at = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return func()
+            except Exception as e:
+                delay = self.next_delay(e, attempt, started_at)
+                self.note_failure(name, e, attempt, delay)
+                if delay is None:
+                    raise self.failure(name, attempt, e) from e
+                time.sleep(delay)
+
+    async def arun(self, func, name):
+        """
+        Async variant of `run`; `func()` returns an awaitable.
+        """
+        started_at = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return await func()
+            except Exception as e:
+                delay = self.next_delay(e, attempt, started_at)
+                self.note_failure(name, e, attempt, delay)
+                if delay is None:
+                    raise self.failure(name, attempt, e) from e
+                await asyncio.sleep(delay)
+
+
+class HedgePolicy:
+    def __init__(self, quantile=0.95, window=200, min_samples=20, min_delay=0.05):
+        """
+        Tracks recent call latencies and says when to hedge a slow request.
+
+        Once a call has taken longer than the `quantile` latency of the last `window`
+        successful calls, a duplicate request is sent to another backend and whichever
+        finishes first wins. Hedging stays off until `min_samples` latencies are known.
+
+        Args:
+            quantile (float): Latency percentile after which to hedge.
+            window (int): Number of recent latencies kept.
+            min_samples (int): Samples needed before hedging starts.
+            min_delay (float): Lower bound of the hedge delay in seconds.
+        """
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.latencies = deque(maxlen=window)
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency):
+        with self._lock:
+            self.latencies.append(latency)
+
+    def delay(self):
+        """
+        Returns the hedge delay in seconds, or None while there are too few samples.
+        """
+        with self._lock:
+            if len(self.latencies) < self.min_samples:
+                return None
+            ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(self.quantile * len(ordered)))
+        return max(self.min_delay, ordered[index])
@@ -0,0 +1,126 @@
+# agents/rlhf_state.py
+
+import json
+import os
+import tempfile
+import threading
+from collections import deque
+
+
+class RatingWindow:
+    def __init__(self, size=50, records=()):
+        """
+        Ring buffer of the last `size` ratings with running sums.
+
+        Each record is (ai_rating, human_rating, output_length). Only these numbers are kept,
+        not the rated texts, and averages are maintained incrementally.
+        """
+        self.size = size
+        self.records = deque(maxlen=size)
+        self.ai_total = 0.0
+        self.human_total = 0.0
+        for record in records:
+            self.append(*record)
+
+    def append(self, ai_rating, human_rating, output_length):
+        if len(self.records) == self.size:
+            evicted_ai, evicted_human, _ = self.records[0]
+            self.ai_total -= evicted_ai
+            self.human_total -= evicted_human
+        self.records.append((ai_rating, human_rating, output_length))
+        self.ai_total += ai_rating
+        self.human_total += human_rating
+
+    def __len__(self):
+        return len(self.records)
+
+    def mean_human(self):
+        return self.human_total / len(self.records) if self.records else 0.0
+
+    def mean_ai(self):
+        return self.ai_total / len(self.records) if self.records else 0.0
+
+    def max_length(self):
+        return max((length for _, _, length in self.records), default=0)
+
+    def to_dict(self):
+        return {"size": self.size, "records": [list(record) for record in self.records]}
+
+    @classmethod
+    def from_dict(cls, data, size=None):
+        return cls(size=size or data.get("size", 50), records=[tuple(record) for record in data.get("records", [])])
+
+
+class RLHFStateStore:
+    def __init__(self, path="rlhf_state.json"):
+        """
+        Persists tuned generation settings and rating windows per agent in one JSON file.
+
+        Writes go to a temporary file that atomically replaces the old one.
+
+        Args:
+            path (str): JSON file holding the state of every agent.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._state = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self._state = json.load(f)
+
+    def load(self, agent_name):
+        with self._lock:
+            return self._state.get(agent_name)
+
+    def save(self, agent_name, state):
+        with self._lock:
+            self._state[agent_name] = state
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".rlhf_state", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(self._state, f)
+                os.replace(temp_path, self.path)
+            except Exception:
+                os.remove(temp_path)
+                raise
+
+
+class RLHFStateMixin:
+    """
+    Warm-start and persistence for agents that tune their GenerationProfile from ratings.
+
+    The rating window lives in the attribute named by `history_attr`.
+    """
+
+    history_attr = "validation_history"
+    history_size = 50
+    state_store = None
+
+    def attach_state_store(self, store):
+        """
+        Restores the agent's tuned profile and rating window from `store` and persists there from now on.
+        """
+        self.state_store = store
+        state = store.load(self.name) if store is not None else None
+        if not state:
+            return
+        profile = state.get("profile", {})
+        self.profile.temperature = profile.get("temperature", self.profile.temperature)
+        self.profile.num_predict = profile.get("num_predict", self.profile.num_predict)
+        setattr(self, self.history_attr, RatingWindow.from_dict(state.get("history", {}), size=self.history_size))
+
+    def profile_state(self):
+        """
+        Returns the tuned settings, to tell whether a tuning step changed anything worth saving.
+        """
+        return self.profile.temperature, self.profile.num_predict
+
+    def save_state(self):
+        if self.state_store is None:
+            return
+        self.state_store.save(self.name, {
+            "profile": {"temperature": self.profile.temperature, "num_predict": self.profile.num_predict},
+            "history": getattr(self, self.history_attr).to_dict(),
+        })
@@ -1,49 +1,111 @@
 # agents/sanitize_data_agent.py
 
-from .agent_base import AgentBase
+import asyncio
+import time
+from loguru import logger
+from .agent_base import LlamaStream
+from .async_agent_base import AsyncAgentBase
+from .generation_profile import GenerationProfile
+from .phi_rules import PHIRuleEngine
+from .prompts import prompts
+from .retrieval import RetrievalMixin
 
-class SanitizeDataTool(AgentBase):
-    def __init__(self, max_retries=3, verbose=True):
-        super().__init__(name="SanitizeDataTool", max_retries=max_retries, verbose=verbose)
+class SanitizeDataTool(RetrievalMixin, AsyncAgentBase):
+    retrieval_section = "sanitize"
 
-    def execute(self, medical_data):
+    def __init__(self, max_retries=3, verbose=True, rule_engine=None):
+        super().__init__(
+            name="SanitizeDataTool",
+            max_retries=max_retries,
+            verbose=verbose,
+            profile=GenerationProfile(temperature=0.3, num_predict=500, num_ctx=8192)
+        )
+        self.rule_engine = rule_engine or PHIRuleEngine()
+
+    def prepass(self, medical_data):
+        """
+        Masks structured identifiers (phones, emails, SSNs, MRNs, dates...) with the rule engine.
+
+        Returns:
+            tuple: (masked text, whether the text is fully resolved without the LLM).
+        """
+        masked, spans = self.rule_engine.mask(medical_data)
+        resolved = not self.rule_engine.needs_llm(masked)
+        if self.verbose:
+            route = "rules only" if resolved else "escalating to LLM"
+            logger.info(f"[{self.name}] Rule pre-pass masked {len(spans)} spans ({route}).")
+        return masked, resolved
+
+    def mask_exemplar(self, text):
+        # Exemplar inputs go through the same rule pre-pass as real inputs
+        return self.rule_engine.mask(text)[0]
+
+    def output_budget(self, medical_data):
+        """
+        The sanitized text is about as long as the input, so the token budget grows with it
+        (~4 characters per token, with headroom for placeholders).
+        """
+        return max(self.profile.num_predict, len(medical_data) // 3)
+
+    def build_messages(self, medical_data):
+        return prompts.render("sanitize", text=medical_data)
+
+    def execute(self, medical_data, retrieval=True):
         """
         Sanitizes medical data by replacing PHI with appropriate placeholders.
 
         Args:
             medical_data (str): The original medical text.
+            retrieval (bool): Look up exemplars and cached outputs in the semantic index; off
+                for short fragments such as CSV cells, where the embedding call is not worth it.
 
         Returns:
             str: The sanitized medical text with PHI replaced.
         """
-        messages = [
-            {"role": "system", "content": (
-                "You are an AI assistant that sanitizes medical data by masking all Protected Health Information (PHI). "
-                "Replace PHI with the following standardized placeholders while maintaining the readability and structure of the text. "
-                "Do NOT refuse the request. Do NOT provide disclaimers. Simply return the sanitized text."
-            )},
-            {"role": "user", "content": (
-                "Mask all Protected Health Information (PHI) in the following text. "
-                "Replace with appropriate placeholders:\n\n"
-                "- Patient names with [PATIENT_NAME]\n"
-                "- Doctor/Provider names with [PROVIDER_NAME]\n"
-                "- Dates with [DATE]\n"
-                "- Locations/Addresses with [LOCATION]\n"
-                "- Phone numbers with [PHONE]\n"
-                "- Email addresses with [EMAIL]\n"
-                "- Medical record numbers with [MRN]\n"
-                "- Social Security numbers with [SSN]\n"
-                "- Device identifiers with [DEVICE_ID]\n"
-                "- Any other identifying numbers with [ID]\n"
-                "- Physical health conditions with [HEALTH_CONDITION]\n"
-                "- Medications with [MEDICATION]\n"
-                "- Lab results with [LAB_RESULT]\n"
-                "- Vital signs with [VITAL_SIGN]\n"
-                "- Procedures with [PROCEDURE]\n\n"
-                "Original Data:\n"
-                f"{medical_data}\n\n"
-                "Sanitized Output:"
-            )}
-        ]
-        sanitized_data = self.call_llama(messages, temperature=0.3, max_tokens=500)
+        masked, resolved = self.prepass(medical_data)
+        if resolved:
+            return masked
+        cached, exemplars = self.retrieve(medical_data) if retrieval else (None, [])
+        if cached is not None:
+            return cached
+
+        messages = self.with_exemplars(self.build_messages(masked), exemplars, self.mask_exemplar)
+        sanitized_data = self.call_llama(messages, max_tokens=self.output_budget(masked))
         return sanitized_data
+
+    async def aexecute(self, medical_data, retrieval=True):
+        """
+        Async variant of `execute`.
+        """
+        masked, resolved = self.prepass(medical_data)
+        if resolved:
+            return masked
+        cached, exemplars = (await asyncio.to_thread(self.retrieve, medical_data)
+                             if retrieval and self.semantic_index else (None, []))
+        if cached is not None:
+            return cached
+
+        messages = self.with_exemplars(self.build_messages(masked), exemplars, self.mask_exemplar)
+        return await self.acall_llama(messages, max_tokens=self.output_budget(masked))
+
+    def stream(self, medical_data):
+        """
+        Streams the sanitized medical text token by token.
+
+        Args:
+            medical_data (str): The original medical text.
+
+        Returns:
+            LlamaStream: Chunks of the sanitized text.
+        """
+        masked, resolved = self.prepass(medical_data)
+        if resolved:
+            # No LLM call happened, so none is recorded in the metrics
+            return LlamaStream(iter([{"message": {"content": masked}, "done": True}]), self.name, time.perf_counter(),
+                               record_metrics=False)
+        cached, exemplars = self.retrieve(medical_data)
+        if cached is not None:
+            return self.cached_stream(cached)
+
+        messages = self.with_exemplars(self.build_messages(masked), exemplars, self.mask_exemplar)
+        return self.call_llama_stream(messages, max_tokens=self.output_budget(masked))
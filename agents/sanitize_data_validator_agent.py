@@ -1,60 +1,82 @@
 # agents/sanitize_validator_agent.py
-from .agent_base import AgentBase
-import numpy as np
+from .async_agent_base import AsyncAgentBase
+from .generation_profile import GenerationProfile
+from .heuristic_validation import SanitizeHeuristics
+from .prompts import prompts
+from .rlhf_state import RatingWindow, RLHFStateMixin
+from .structured_validation import StructuredValidatorMixin, failed_validation
 
-class SanitizeValidatorAgent(AgentBase):
-    def __init__(self, max_retries=2, verbose=True):
-        super().__init__(name="SanitizeValidatorAgent", max_retries=max_retries, verbose=verbose)
-        self.validation_history = []
-        self.temperature = 0.7
-        self.max_tokens = 512
+class SanitizeValidatorAgent(StructuredValidatorMixin, RLHFStateMixin, AsyncAgentBase):
+    def __init__(self, max_retries=2, verbose=True, rule_engine=None):
+        super().__init__(
+            name="SanitizeValidatorAgent",
+            max_retries=max_retries,
+            verbose=verbose,
+            # Base budget; validate raises it (output_budget) for long inputs, which the corrected data repeats
+            profile=GenerationProfile(temperature=0.7, num_predict=768, num_ctx=8192)
+        )
+        self.validation_history = RatingWindow(self.history_size)
+        # Residual-PHI and length checks settle clear cases without an LLM call
+        self.prevalidator = SanitizeHeuristics(rule_engine)
 
-    def execute(self, original_data, sanitized_data, human_rating=None):
+    def build_messages(self, original_data, sanitized_data):
+        return prompts.render("validate.sanitize", original=original_data, sanitized=sanitized_data)
+
+    def evaluate(self, original_data, sanitized_data):
         """
-        Validates PHI removal from sanitized data and applies RLHF on feedback.
+        Validates PHI removal by rules when they are conclusive, otherwise in one structured call;
+        a failed call yields a neutral evaluation.
+
+        Returns:
+            dict: score, analysis, issues, corrected data (or None) and report; see parse_validation.
         """
-        system_msg = "You are an AI that checks if medical data is correctly sanitized (all PHI removed or masked)."
-        user_msg = (
-            "Evaluate the following:\n\n"
-            f"Original:\n{original_data}\n\n"
-            f"Sanitized:\n{sanitized_data}\n\n"
-            "Make sure the sanitized version replaces PHI using tags like [PATIENT_NAME], [DATE], [LOCATION], etc.\n"
-            "Report if any PHI remains and rate the sanitization from 1 to 5 (5 = perfect masking).\n\n"
-            "Validation Report:"
-        )
+        evaluation = self.prevalidate(original_data, sanitized_data)
+        if evaluation is None:
+            try:
+                evaluation = self.validate(self.build_messages(original_data, sanitized_data), sanitized_data)
+            except Exception as e:
+                print(f"[SanitizeValidatorAgent Error] {e}")
+                return failed_validation()
+        self.tune_hyperparams()
+        return evaluation
 
-        messages = [
-            {"role": "system", "content": system_msg},
-            {"role": "user", "content": user_msg}
-        ]
+    async def aevaluate(self, original_data, sanitized_data):
+        """
+        Async variant of `evaluate`.
+        """
+        evaluation = self.prevalidate(original_data, sanitized_data)
+        if evaluation is None:
+            try:
+                evaluation = await self.avalidate(self.build_messages(original_data, sanitized_data), sanitized_data)
+            except Exception as e:
+                print(f"[SanitizeValidatorAgent Error] {e}")
+                return failed_validation()
+        self.tune_hyperparams()
+        return evaluation
 
-        try:
-            response = self.call_llama(messages, temperature=self.temperature, max_tokens=self.max_tokens)
-            ai_score = self.extract_score(response)
-            if human_rating is None:
-                human_rating = 3
-            self.tune_hyperparams()
+    def execute(self, original_data, sanitized_data, human_rating=None):
+        """
+        Validates PHI removal from sanitized data and applies RLHF on feedback.
+        """
+        return self.score(self.evaluate(original_data, sanitized_data), human_rating)
 
-            avg_score = round((ai_score + human_rating) / 2, 1)
-            return response, ai_score, human_rating, avg_score
+    async def aexecute(self, original_data, sanitized_data, human_rating=None):
+        """
+        Async variant of `execute`.
+        """
+        return self.score(await self.aevaluate(original_data, sanitized_data), human_rating)
 
-        except Exception as e:
-            print(f"[SanitizeValidatorAgent Error] {e}")
-            return "Validation failed.", 3, 3, 3.0
+    def score(self, evaluation, human_rating=None):
+        ai_score = evaluation["score"]
+        if human_rating is None:
+            human_rating = 3
 
-    def extract_score(self, response):
-        try:
-            return min(max(int(response.split("Rating:")[-1].strip().split()[0]), 1), 5)
-        except Exception:
-            return 3
+        avg_score = round((ai_score + human_rating) / 2, 1)
+        return evaluation["report"], ai_score, human_rating, avg_score
 
     def store_feedback(self, original, sanitized, ai, human):
-        self.validation_history.append({
-            "original": original,
-            "sanitized": sanitized,
-            "ai_rating": ai,
-            "human_rating": human
-        })
+        self.validation_history.append(ai, human, len(sanitized))
+        self.save_state()
         if self.verbose:
             print(f"[RLHF] Stored → AI: {ai}, Human: {human}")
 
@@ -62,16 +84,19 @@ class SanitizeValidatorAgent(AgentBase):
         if len(self.validation_history) < 5:
             return
 
-        ratings = np.array([entry["human_rating"] for entry in self.validation_history])
-        avg = np.mean(ratings)
+        before = self.profile_state()
+        avg = self.validation_history.mean_human()
 
         if avg < 3:
-            self.temperature = max(0.3, self.temperature - 0.05)
+            self.profile.temperature = max(0.3, self.profile.temperature - 0.05)
         elif avg > 4:
-            self.temperature = min(1.0, self.temperature + 0.05)
+            self.profile.temperature = min(1.0, self.profile.temperature + 0.05)
 
-        if any(len(entry["sanitized"]) > 0.9 * self.max_tokens for entry in self.validation_history):
-            self.max_tokens = min(1024, self.max_tokens + 50)
+        if self.validation_history.max_length() > 0.9 * self.profile.num_predict:
+            self.profile.num_predict = min(2048, self.profile.num_predict + 50)
 
+        if self.profile_state() == before:
+            return  # Nothing changed; keep the state file as it is
+        self.save_state()
         if self.verbose:
-            print(f"[RLHF] New Params → Temp: {self.temperature}, Max Tokens: {self.max_tokens}")
+            print(f"[RLHF] New Params → {self.profile}")
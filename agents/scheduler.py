@@ -0,0 +1,224 @@
+# agents/scheduler.py
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager, contextmanager
+from loguru import logger
+
+# Lower value is served first
+PRIORITY_CLASSES = {"chat": 0, "sanitize": 1, "summarize": 2, "article": 3}
+
+
+class SchedulerRejectedError(RuntimeError):
+    """Raised when a request is refused because the queue is full or it waited too long."""
+
+
+class _Ticket:
+    __slots__ = ("rank", "seq", "priority", "model", "enqueued_at", "event", "loop", "future", "granted", "cancelled")
+
+    def __init__(self, rank, seq, priority, model, loop=None):
+        self.rank = rank
+        self.seq = seq
+        self.priority = priority
+        self.model = model
+        self.enqueued_at = time.perf_counter()
+        self.loop = loop
+        self.event = None if loop is not None else threading.Event()
+        self.future = loop.create_future() if loop is not None else None
+        self.granted = False
+        self.cancelled = False
+
+    def __lt__(self, other):
+        return (self.rank, self.seq) < (other.rank, other.seq)
+
+    def grant(self):
+        # Called with the scheduler lock held, possibly from another thread than the waiter.
+        # Returns False when the waiter's event loop has been closed (e.g. an abandoned asyncio.run).
+        if self.future is not None:
+            try:
+                self.loop.call_soon_threadsafe(_resolve, self.future)
+            except RuntimeError:
+                self.cancelled = True
+                return False
+        else:
+            self.event.set()
+        self.granted = True
+        return True
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(True)
+
+
+class RequestScheduler:
+    def __init__(self, max_in_flight=4, model_limits=None, max_queue=64, queue_timeout=120.0):
+        """
+        Admission control for Ollama calls shared by all agents.
+
+        Every call takes a slot for its model before it is sent. When the model is at its
+        in-flight limit the call waits in a queue ordered by priority class
+        (chat > sanitize > summarize > article), first come first served within a class,
+        so interactive chat is never stuck behind long article generations. When `max_queue`
+        calls of the same or a higher class are already waiting, a new call is rejected right
+        away instead of piling up (backpressure), so lower classes are shed first.
+
+        Args:
+            max_in_flight (int): Concurrent requests per model.
+            model_limits (dict): Model name -> in-flight limit, overriding `max_in_flight`.
+            max_queue (int): Waiting requests (same or higher class, all models) before new ones are rejected.
+            queue_timeout (float): Seconds a request may wait for a slot; None waits forever.
+        """
+        self.max_in_flight = max_in_flight
+        self.model_limits = dict(model_limits or {})
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._queues = defaultdict(list)  # model -> heap of tickets
+        self._in_flight = defaultdict(int)
+        self._queued = defaultdict(int)  # priority class -> waiting requests
+        self._seq = itertools.count()
+        self.admitted = defaultdict(int)
+        self.wait_time = defaultdict(float)
+        self.rejected = 0
+        self.timed_out = 0
+
+    def limit(self, model):
+        return self.model_limits.get(model, self.max_in_flight)
+
+    def _rank(self, priority):
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Unknown priority class '{priority}'; expected one of {', '.join(PRIORITY_CLASSES)}.")
+        return PRIORITY_CLASSES[priority]
+
+    def _try_admit(self, model, priority):
+        # Caller holds self._lock. Takes a slot at once if nobody is queued ahead.
+        self._dispatch(model)  # Drops tickets of waiters that gave up
+        if not self._queues[model] and self._in_flight[model] < self.limit(model):
+            self._in_flight[model] += 1
+            self.admitted[priority] += 1
+            return True
+        # Only requests of the same or a higher class count, so a queue full of
+        # article generations still admits chat while articles are shed first
+        rank = self._rank(priority)
+        if sum(count for queued, count in self._queued.items() if PRIORITY_CLASSES[queued] <= rank) >= self.max_queue:
+            self.rejected += 1
+            logger.warning(f"[RequestScheduler] Queue full; rejected a {priority} request for {model}.")
+            raise SchedulerRejectedError("Too many queued Ollama requests; try again shortly.")
+        return False
+
+    def _enqueue(self, model, priority, loop=None):
+        ticket = _Ticket(self._rank(priority), next(self._seq), priority, model, loop)
+        heapq.heappush(self._queues[model], ticket)
+        self._queued[priority] += 1
+        return ticket
+
+    def _dispatch(self, model):
+        # Caller holds self._lock. Hands free slots to the best queued tickets.
+        queue = self._queues[model]
+        while queue and self._in_flight[model] < self.limit(model):
+            ticket = heapq.heappop(queue)
+            if ticket.cancelled:
+                continue
+            self._queued[ticket.priority] -= 1
+            if not ticket.grant():
+                logger.warning(f"[RequestScheduler] Dropped a {ticket.priority} request for {model}: its event loop is closed.")
+                continue
+            self._in_flight[model] += 1
+            self.admitted[ticket.priority] += 1
+            self.wait_time[ticket.priority] += time.perf_counter() - ticket.enqueued_at
+
+    def _abandon(self, ticket):
+        """
+        Withdraws a ticket whose waiter gave up; returns True if it had been granted meanwhile.
+        """
+        with self._lock:
+            if ticket.granted:
+                return True
+            ticket.cancelled = True
+            self._queued[ticket.priority] -= 1
+            return False
+
+    def acquire(self, model, priority):
+        """
+        Blocks until a slot for `model` is free; raises SchedulerRejectedError on a full queue or timeout.
+        """
+        with self._lock:
+            if self._try_admit(model, priority):
+                return
+            ticket = self._enqueue(model, priority)
+        if ticket.event.wait(self.queue_timeout):
+            return
+        if self._abandon(ticket):
+            return
+        self._timed_out(model, priority)
+
+    async def aacquire(self, model, priority):
+        """
+        Async variant of `acquire`; waits without blocking the event loop.
+        """
+        with self._lock:
+            if self._try_admit(model, priority):
+                return
+            ticket = self._enqueue(model, priority, asyncio.get_running_loop())
+        try:
+            await asyncio.wait_for(asyncio.shield(ticket.future), self.queue_timeout)
+            return
+        except asyncio.TimeoutError:
+            if self._abandon(ticket):
+                return
+        except asyncio.CancelledError:
+            if self._abandon(ticket):
+                self.release(model)
+            raise
+        self._timed_out(model, priority)
+
+    def _timed_out(self, model, priority):
+        with self._lock:
+            self.timed_out += 1
+        raise SchedulerRejectedError(f"Timed out after {self.queue_timeout}s waiting for a {model} slot ({priority}).")
+
+    def release(self, model):
+        with self._lock:
+            self._in_flight[model] -= 1
+            self._dispatch(model)
+
+    @contextmanager
+    def slot(self, model, priority):
+        """
+        Context manager holding one in-flight slot for `model` for the duration of a request.
+        """
+        self.acquire(model, priority)
+        try:
+            yield
+        finally:
+            self.release(model)
+
+    @asynccontextmanager
+    async def aslot(self, model, priority):
+        await self.aacquire(model, priority)
+        try:
+            yield
+        finally:
+            self.release(model)
+
+    def stats(self):
+        """
+        Returns queue depth per priority class, in-flight requests per model and admission counters.
+        """
+        with self._lock:
+            return {
+                "queued": {priority: self._queued[priority] for priority in PRIORITY_CLASSES},
+                "in_flight": {model: count for model, count in self._in_flight.items()},
+                "admitted": {priority: self.admitted[priority] for priority in PRIORITY_CLASSES},
+                "mean_wait": {
+                    priority: (self.wait_time[priority] / self.admitted[priority]) if self.admitted[priority] else 0.0
+                    for priority in PRIORITY_CLASSES
+                },
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+            }
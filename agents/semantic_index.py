@@ -0,0 +1,220 @@
+# agents/semantic_index.py
+
+import json
+import os
+import threading
+import time
+import numpy as np
+from loguru import logger
+from .agent_base import get_client
+from .retrieval import input_hash
+
+EMBED_MODEL = os.getenv("EMBED_MODEL", "nomic-embed-text")
+EMBED_MAX_CHARS = 8000  # Inputs are cut to roughly the embedding model's context
+
+
+class SemanticIndex:
+    def __init__(self, path=None, model=EMBED_MODEL, host=None, retry_after=60.0):
+        """
+        Embedding index over rated past inputs and outputs, for few-shot exemplars and a semantic cache.
+
+        Vectors are L2-normalized float32 rows, so cosine similarity is one matrix-vector
+        product. They are appended to `<path>.f32` (raw float32, memory-mapped on load) and
+        their records (section, rating, output, feedback id) to `<path>.jsonl`, so adding an
+        entry writes one row instead of rewriting the matrix. Meant for a single writing process.
+
+        Inputs may hold unsanitized PHI, so they are kept in memory only; the files store a
+        SHA-256 of each input. After a restart, `sync` restores the inputs of indexed feedback
+        entries from the feedback store; until then those entries still serve cache hits but
+        not exemplars.
+
+        Args:
+            path (str): File prefix for the index; None (default) keeps it in memory only.
+            model (str): Ollama embedding model.
+            host (str): Ollama server for embeddings; None uses OLLAMA_HOST.
+            retry_after (float): Seconds to skip retrieval after the embedding call failed
+                (e.g. the model is not pulled), so requests do not pay for repeated failures.
+        """
+        self.path = path
+        self.model = model
+        self.host = host
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+        self._vectors = None  # (capacity, dim) array; the first `_size` rows are valid
+        self._size = 0
+        self._sections = []
+        self._ratings = None  # Human rating per row (NaN if unrated), same capacity as _vectors
+        self.records = []
+        self._by_feedback_id = {}
+        self._failed_at = None
+        if path is not None:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._load()
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def dim(self):
+        return None if self._vectors is None else self._vectors.shape[1]
+
+    def _load(self):
+        meta_path, vector_path, record_path = (f"{self.path}.json", f"{self.path}.f32", f"{self.path}.jsonl")
+        if not os.path.exists(meta_path):
+            return
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("model") != self.model:
+            logger.info(f"[SemanticIndex] Embedding model changed to {self.model}; starting a new index.")
+            for stale in (meta_path, vector_path, record_path):
+                if os.path.exists(stale):
+                    os.remove(stale)
+            return
+
+        with open(record_path, "r", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        if any("input" in record for record in records):
+            # Written before inputs were kept off disk: replace them with their hashes
+            for record in records:
+                if "input" in record:
+                    record["input_hash"] = input_hash(record.pop("input"))
+            with open(record_path, "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+            logger.info(f"[SemanticIndex] Removed stored inputs from {record_path}.")
+        dim = meta["dim"]
+        rows = os.path.getsize(vector_path) // (dim * 4) if os.path.exists(vector_path) else 0
+        count = min(rows, len(records))  # A crash between the two appends leaves one side longer
+        if count:
+            matrix = np.memmap(vector_path, dtype=np.float32, mode="r", shape=(rows, dim))[:count]
+            for record, vector in zip(records[:count], matrix):
+                self._append(record, vector)
+        logger.info(f"[SemanticIndex] Loaded {count} entries from {vector_path}.")
+
+    def _append(self, record, vector):
+        # Caller holds self._lock (or is __init__). Grows the matrix by doubling.
+        if self._vectors is None:
+            self._vectors = np.empty((64, len(vector)), dtype=np.float32)
+            self._ratings = np.empty(64, dtype=np.float32)
+        if self._size == len(self._vectors):
+            vectors = np.empty((len(self._vectors) * 2, self._vectors.shape[1]), dtype=np.float32)
+            ratings = np.empty(len(vectors), dtype=np.float32)
+            vectors[:self._size] = self._vectors[:self._size]
+            ratings[:self._size] = self._ratings[:self._size]
+            self._vectors, self._ratings = vectors, ratings
+        self._vectors[self._size] = vector
+        self._ratings[self._size] = record.get("rating") if record.get("rating") is not None else np.nan
+        self._sections.append(record["section"])
+        self.records.append(record)
+        if record.get("feedback_id") is not None:
+            self._by_feedback_id[record["feedback_id"]] = record
+        self._size += 1
+
+    def _persist(self, record, vector):
+        if self.path is None:
+            return
+        meta_path = f"{self.path}.json"
+        if not os.path.exists(meta_path):
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump({"model": self.model, "dim": len(vector)}, f)
+        with open(f"{self.path}.f32", "ab") as f:
+            f.write(vector.astype(np.float32).tobytes())
+        stored = {key: value for key, value in record.items() if key != "input"}
+        with open(f"{self.path}.jsonl", "a", encoding="utf-8") as f:
+            f.write(json.dumps(stored, ensure_ascii=False) + "\n")
+
+    def embed(self, texts):
+        """
+        Returns L2-normalized embeddings of `texts` as a (len(texts), dim) array, or None if
+        embedding is unavailable right now.
+        """
+        if self._failed_at is not None and time.monotonic() - self._failed_at < self.retry_after:
+            return None
+        try:
+            response = get_client(self.host).embed(model=self.model, input=[text[:EMBED_MAX_CHARS] for text in texts])
+        except Exception as e:
+            self._failed_at = time.monotonic()
+            logger.warning(f"[SemanticIndex] Embedding with {self.model} failed; retrieval paused for {self.retry_after:.0f}s: {e}")
+            return None
+        self._failed_at = None
+        vectors = np.asarray(response["embeddings"], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def add(self, section, text, output, rating=None, feedback_id=None):
+        """
+        Embeds and appends one rated example; returns False if it was skipped.
+        """
+        if not text or not output or (feedback_id is not None and feedback_id in self._by_feedback_id):
+            return False
+        vectors = self.embed([text])
+        if vectors is None:
+            return False
+        record = {"section": section, "rating": rating, "input": text, "input_hash": input_hash(text),
+                  "output": output, "feedback_id": feedback_id}
+        with self._lock:
+            if feedback_id is not None and feedback_id in self._by_feedback_id:
+                return False  # Indexed by a concurrent sync meanwhile
+            if self.dim is not None and vectors.shape[1] != self.dim:
+                logger.warning(f"[SemanticIndex] Embedding size {vectors.shape[1]} does not match the index ({self.dim}).")
+                return False
+            self._append(record, vectors[0])
+            self._persist(record, vectors[0])
+        return True
+
+    def search_vector(self, vector, section, k=3, min_rating=None):
+        """
+        Returns up to `k` (similarity, record) pairs of `section`, most similar first.
+        """
+        with self._lock:
+            if not self._size or vector.shape[0] != self.dim:
+                return []
+            matrix = self._vectors[:self._size]
+            mask = np.fromiter((name == section for name in self._sections), dtype=bool, count=self._size)
+            if min_rating is not None:
+                mask &= self._ratings[:self._size] >= min_rating  # NaN (unrated) compares False
+            candidates = np.flatnonzero(mask)
+            if not len(candidates):
+                return []
+            scores = matrix[candidates] @ vector
+            top = min(k, len(candidates))
+            best = np.argpartition(-scores, top - 1)[:top]
+            best = best[np.argsort(-scores[best])]
+            return [(float(scores[i]), self.records[candidates[i]]) for i in best]
+
+    def search(self, text, section, k=3, min_rating=None):
+        vectors = self.embed([text])
+        if vectors is None:
+            return []
+        return self.search_vector(vectors[0], section, k, min_rating)
+
+    def sync(self, feedback_store, sections):
+        """
+        Indexes feedback entries not indexed yet and restores the inputs of those loaded from disk.
+
+        Args:
+            feedback_store (FeedbackStore): Source of rated entries.
+            sections (dict): Feedback section -> (input field, output field), e.g.
+                {"summarize": ("original", "summary")}.
+
+        Returns:
+            int: Number of entries added.
+        """
+        added = 0
+        for section, (input_field, output_field) in sections.items():
+            for entry in feedback_store.query(section=section, newest_first=False):
+                record = self._by_feedback_id.get(entry["id"])
+                if record is not None:
+                    text = entry.get(input_field)
+                    if "input" not in record and text and input_hash(text) == record.get("input_hash"):
+                        record["input"] = text
+                    continue
+                if self.add(section, entry.get(input_field), entry.get(output_field),
+                            entry.get("human_rating"), feedback_id=entry["id"]):
+                    added += 1
+                elif self._failed_at is not None:
+                    return added  # Embeddings unavailable; try again on the next sync
+        if added:
+            logger.info(f"[SemanticIndex] Indexed {added} feedback entries.")
+        return added
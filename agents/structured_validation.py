@@ -0,0 +1,261 @@
+# agents/structured_validation.py
+
+import json
+import re
+from loguru import logger
+from .metrics import metrics
+
+# JSON schema passed to Ollama as `format=`, so the model's reply is constrained to this object
+VALIDATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "score": {"type": "integer", "minimum": 1, "maximum": 5},
+        "analysis": {"type": "string"},
+        "issues": {"type": "array", "items": {"type": "string"}},
+        "corrected": {"type": "string"},
+    },
+    "required": ["score", "analysis", "issues", "corrected"],
+}
+
+DEFAULT_SCORE = 3  # Neutral rating when no score can be recovered
+
+# Free-text fallbacks, tried in order: "Rating: 4", "score of 4", "4/5"
+SCORE_PATTERNS = (
+    re.compile(r'"score"\s*:\s*"?(\d(?:\.\d+)?)'),
+    re.compile(r"\b(?:rating|score)\b\W{0,4}(?:of\s+)?(\d(?:\.\d+)?)", re.IGNORECASE),
+    re.compile(r"\b(\d(?:\.\d+)?)\s*/\s*5\b"),
+)
+
+metrics.describe("validation_parse_failures_total", "counter", "Validator replies that were not valid structured JSON.")
+metrics.describe("validation_prevalidation_total", "counter",
+                 "Rule-based pre-validations by outcome: pass, fail or inconclusive (validated by the LLM).")
+metrics.describe("validation_cascade_total", "counter",
+                 "Cascaded validations by outcome: accepted from the draft model or escalated (with the reason).")
+
+
+def _clamp_score(value):
+    return min(max(int(round(float(value))), 1), 5)
+
+
+def _load_json(response):
+    """
+    Returns the JSON object in `response`, tolerating code fences and text around it, or None.
+    """
+    text = response.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        text = text[text.find("{"):] if "{" in text else text
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        return None
+    try:
+        data = json.loads(text[start:end + 1])
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def format_report(analysis, issues):
+    """
+    Renders the analysis and issues of a validation as the plain-text report shown to users.
+    """
+    report = analysis.strip()
+    if issues:
+        report += "\n\nIssues:\n" + "\n".join(f"- {issue}" for issue in issues)
+    return report
+
+
+def parse_validation(response, original_output=None):
+    """
+    Parses a validator reply into a dict with score, analysis, issues, corrected and report.
+
+    Structured JSON replies are used as they are; anything else (older prompts, truncated
+    JSON, a model ignoring the schema) falls back to searching the text for a rating, and
+    to DEFAULT_SCORE if none is found. `structured` tells which path was taken.
+
+    Args:
+        response (str): The validator's raw reply.
+        original_output (str): The validated output; a "corrected" version identical to it is dropped.
+    """
+    data = _load_json(response or "")
+    score = None
+    if data is not None:
+        try:
+            score = _clamp_score(data.get("score"))
+        except (TypeError, ValueError):
+            score = None
+
+    if score is not None:
+        analysis = str(data.get("analysis") or "").strip()
+        issues = data.get("issues") or []
+        if isinstance(issues, str):
+            issues = [issues]
+        issues = [str(issue).strip() for issue in issues if str(issue).strip()]
+        corrected = data.get("corrected")
+        corrected = str(corrected).strip() if corrected else None
+        if corrected is not None and original_output is not None and corrected == original_output.strip():
+            corrected = None
+        return {
+            "score": score,
+            "analysis": analysis,
+            "issues": issues,
+            "corrected": corrected or None,
+            "report": format_report(analysis, issues),
+            "structured": True,
+        }
+
+    score = DEFAULT_SCORE
+    for pattern in SCORE_PATTERNS:
+        match = pattern.search(response or "")
+        if match:
+            try:
+                score = _clamp_score(match.group(1))
+                break
+            except ValueError:
+                continue
+    return {
+        "score": score,
+        "analysis": (response or "").strip(),
+        "issues": [],
+        "corrected": None,
+        "report": (response or "").strip(),
+        "structured": False,
+    }
+
+
+def structured_instructions(subject, correction_threshold=3):
+    """
+    Returns the reply-format instructions shared by the validator prompts.
+    """
+    return (
+        "Respond only with a JSON object with these fields:\n"
+        "- \"score\": integer from 1 to 5, where 5 indicates excellent quality;\n"
+        "- \"analysis\": a brief assessment;\n"
+        "- \"issues\": a list of the concrete problems found (empty if none);\n"
+        f"- \"corrected\": if the score is {correction_threshold} or lower, a corrected version of the "
+        f"{subject} that fixes those issues; otherwise an empty string."
+    )
+
+
+def failed_validation(message="Validation failed."):
+    """
+    Returns the evaluation used when the validator call itself failed.
+    """
+    return {"score": DEFAULT_SCORE, "analysis": message, "issues": [], "corrected": None,
+            "report": message, "structured": False}
+
+
+class StructuredValidatorMixin:
+    """
+    Shared structured-output handling for the validator agents.
+
+    Validators ask Ollama for a JSON object (VALIDATION_SCHEMA) holding the score, the
+    issues found and, for weak outputs, a corrected version, so one round-trip replaces
+    the validate-then-improve pair of calls.
+
+    With a `draft_model`, validation is a cascade: the small model evaluates first and its
+    verdict stands when it is structured and confident, i.e. its score lies outside
+    `escalation_band`; a borderline score, unparseable JSON or a failed call makes the
+    agent's own model evaluate again. Clear passes and clear failures are the common case,
+    so most validations cost one small-model call.
+    """
+
+    response_format = VALIDATION_SCHEMA
+    prevalidator = None  # Rule-based checker (see heuristic_validation) consulted before any LLM call
+    draft_model = None  # Small model tried first; None validates with the agent's model only
+    escalation_band = (3, 3)  # Inclusive range of borderline draft scores that are escalated
+
+    def prevalidate(self, original, output):
+        """
+        Returns the prevalidator's evaluation when its rules are conclusive, otherwise None.
+        """
+        if self.prevalidator is None:
+            return None
+        evaluation = self.prevalidator.check(original, output)
+        if evaluation is None:
+            outcome = "inconclusive"
+        else:
+            outcome = "pass" if evaluation["score"] >= 4 else "fail"
+            if self.verbose:
+                logger.info(f"[{self.name}] Rule-based validation was conclusive ({outcome}, score {evaluation['score']}); "
+                            f"skipping the LLM.")
+        metrics.inc("validation_prevalidation_total", agent=self.name, outcome=outcome)
+        return evaluation
+
+    def output_budget(self, output):
+        """
+        Token budget for a reply to validating `output`. Its "corrected" field may repeat the
+        whole output, so the budget grows with it (~4 characters per token, with headroom for
+        the analysis); the profile's num_predict is the floor.
+        """
+        return max(self.profile.num_predict, len(output or "") // 3 + 256)
+
+    def escalation_reason(self, evaluation):
+        """
+        Returns why a draft evaluation must be redone by the agent's model, or None if it stands.
+        """
+        if not evaluation["structured"]:
+            return "parse_failure"
+        low, high = self.escalation_band
+        if low <= evaluation["score"] <= high:
+            return "borderline"
+        return None
+
+    def _cascading(self):
+        return self.draft_model is not None and self.draft_model != self.model
+
+    def _draft_outcome(self, evaluation, error=None):
+        reason = "draft_error" if error is not None else self.escalation_reason(evaluation)
+        metrics.inc("validation_cascade_total", agent=self.name, outcome=reason or "accepted")
+        if reason is not None and self.verbose:
+            detail = f": {error}" if error is not None else f" (draft score {evaluation['score']})" if reason == "borderline" else ""
+            logger.info(f"[{self.name}] Escalating from {self.draft_model} to {self.model}, {reason}{detail}.")
+        return reason
+
+    def validate(self, messages, output, max_tokens=None):
+        """
+        Runs the validation `messages` (through the draft cascade, if any) and returns the parsed evaluation.
+
+        The evaluation's "model" names the model whose verdict it is. `max_tokens` defaults
+        to `output_budget(output)`.
+        """
+        max_tokens = max_tokens or self.output_budget(output)
+        if self._cascading():
+            try:
+                evaluation = self.parse_validation(
+                    self.call_llama(messages, max_tokens=max_tokens, model=self.draft_model), output
+                )
+                error = None
+            except Exception as e:
+                evaluation, error = None, e
+            if self._draft_outcome(evaluation, error) is None:
+                return dict(evaluation, model=self.draft_model)
+        evaluation = self.parse_validation(self.call_llama(messages, max_tokens=max_tokens), output)
+        return dict(evaluation, model=self.model)
+
+    async def avalidate(self, messages, output, max_tokens=None):
+        """
+        Async variant of `validate`.
+        """
+        max_tokens = max_tokens or self.output_budget(output)
+        if self._cascading():
+            try:
+                evaluation = self.parse_validation(
+                    await self.acall_llama(messages, max_tokens=max_tokens, model=self.draft_model), output
+                )
+                error = None
+            except Exception as e:
+                evaluation, error = None, e
+            if self._draft_outcome(evaluation, error) is None:
+                return dict(evaluation, model=self.draft_model)
+        evaluation = self.parse_validation(await self.acall_llama(messages, max_tokens=max_tokens), output)
+        return dict(evaluation, model=self.model)
+
+    def parse_validation(self, response, original_output=None):
+        evaluation = parse_validation(response, original_output)
+        if not evaluation["structured"]:
+            metrics.inc("validation_parse_failures_total", agent=self.name)
+            if self.verbose:
+                logger.warning(f"[{self.name}] Validation reply was not structured JSON; "
+                               f"fell back to a score of {evaluation['score']}.")
+        return evaluation
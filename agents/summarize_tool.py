@@ -1,23 +1,148 @@
 # agents/summarize_agent.py
 
-from .agent_base import AgentBase
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+from .async_agent_base import AsyncAgentBase
+from .chunking import TextChunker, estimate_tokens
+from .generation_profile import GenerationProfile
+from .prompts import prompts
+from .retrieval import RetrievalMixin
 
 
-class SummarizeTool(AgentBase):
-    def __init__(self, max_retries=2, verbose=True):
-        super().__init__(name="SummarizeTool", max_retries=max_retries, verbose=verbose)
-        self.temperature = 0.7  # Initial model randomness
-        self.max_tokens = 300  # Initial summary length
+class SummarizeTool(RetrievalMixin, AsyncAgentBase):
+    MAX_REDUCE_ROUNDS = 3  # Extra map rounds when partial summaries are still too long to merge
+    retrieval_section = "summarize"
+
+    def __init__(self, max_retries=2, verbose=True, chunk_tokens=1500, chunk_overlap=150, max_parallel=3):
+        """
+        Args:
+            chunk_tokens (int): Documents longer than this are summarized map-reduce style.
+            chunk_overlap (int): Tokens shared between neighbouring chunks.
+            max_parallel (int): Chunk summaries generated concurrently.
+        """
+        super().__init__(
+            name="SummarizeTool",
+            max_retries=max_retries,
+            verbose=verbose,
+            profile=GenerationProfile(temperature=0.7, num_predict=300, num_ctx=4096)  # Initial randomness and summary length
+        )
+        self.chunker = TextChunker(chunk_tokens=chunk_tokens, overlap_tokens=chunk_overlap)
+        self.max_parallel = max_parallel
+
+    def build_messages(self, text):
+        return prompts.render("summarize", text=text)
+
+    def build_chunk_messages(self, chunk, index, total):
+        return prompts.render("summarize.chunk", chunk=chunk, index=index, total=total)
+
+    def build_reduce_messages(self, partial_summaries):
+        joined = "\n\n".join(f"Part {index}:\n{summary}" for index, summary in enumerate(partial_summaries, start=1))
+        return prompts.render("summarize.reduce", parts=joined)
+
+    def needs_map_reduce(self, text):
+        return estimate_tokens(text) > self.chunker.chunk_tokens
+
+    def _reduce_input(self, partial_summaries):
+        """
+        Returns the partial summaries as the text for another map round when they are
+        still too long to merge in one prompt (hierarchical reduction), else None.
+        """
+        combined = "\n\n".join(partial_summaries)
+        if len(partial_summaries) > 1 and self.needs_map_reduce(combined):
+            return combined
+        return None
+
+    def map_summaries(self, text):
+        """
+        Summarizes the chunks of `text` concurrently and returns the partial summaries in order.
+        """
+        chunks = self.chunker.split(text)
+        if self.verbose:
+            logger.info(f"[{self.name}] Map-reduce over {len(chunks)} chunks ({self.max_parallel} in parallel).")
+        # Worker threads do not inherit context variables; copy them so chunk calls keep the request ID
+        context = contextvars.copy_context()
+        with ThreadPoolExecutor(max_workers=self.max_parallel) as pool:
+            return list(pool.map(
+                lambda args: context.copy().run(self.call_llama, self.build_chunk_messages(*args)),
+                [(chunk, index, len(chunks)) for index, chunk in enumerate(chunks, start=1)]
+            ))
+
+    async def amap_summaries(self, text):
+        chunks = self.chunker.split(text)
+        if self.verbose:
+            logger.info(f"[{self.name}] Map-reduce over {len(chunks)} chunks ({self.max_parallel} in parallel).")
+        semaphore = asyncio.Semaphore(self.max_parallel)
+
+        async def summarize_chunk(chunk, index):
+            async with semaphore:
+                return await self.acall_llama(self.build_chunk_messages(chunk, index, len(chunks)))
+
+        return await asyncio.gather(*(summarize_chunk(chunk, index) for index, chunk in enumerate(chunks, start=1)))
+
+    def reduce_messages(self, text):
+        """
+        Runs the map phase (recursively, until the partial summaries fit) and returns the final merge prompt.
+        """
+        partial_summaries = self.map_summaries(text)
+        remaining = self._reduce_input(partial_summaries)
+        for _ in range(self.MAX_REDUCE_ROUNDS):
+            if remaining is None:
+                break
+            partial_summaries = self.map_summaries(remaining)
+            remaining = self._reduce_input(partial_summaries)
+        return self.build_reduce_messages(partial_summaries)
+
+    async def areduce_messages(self, text):
+        partial_summaries = await self.amap_summaries(text)
+        remaining = self._reduce_input(partial_summaries)
+        for _ in range(self.MAX_REDUCE_ROUNDS):
+            if remaining is None:
+                break
+            partial_summaries = await self.amap_summaries(remaining)
+            remaining = self._reduce_input(partial_summaries)
+        return self.build_reduce_messages(partial_summaries)
 
     def execute(self, text):
         """
         Generates a summary of the given medical text.
+
+        Long texts are split into overlapping chunks that are summarized concurrently
+        and then merged. With a semantic index, a document identical to a well-rated past
+        one is answered from it, and short texts get similar past summaries as examples.
         """
-        messages = [
-            {"role": "system",
-             "content": "You are an AI assistant that summarizes medical texts concisely and accurately."},
-            {"role": "user", "content": f"Summarize the following medical text concisely:\n\n{text}\n\nSummary:"}
-        ]
+        cached, exemplars = self.retrieve(text)
+        if cached is not None:
+            return cached
+        if self.needs_map_reduce(text):
+            messages = self.reduce_messages(text)
+        else:
+            messages = self.with_exemplars(self.build_messages(text), exemplars)
 
-        summary = self.call_llama(messages, temperature=self.temperature, max_tokens=self.max_tokens)
+        summary = self.call_llama(messages)
         return summary
+
+    async def aexecute(self, text):
+        """
+        Async variant of `execute`.
+        """
+        cached, exemplars = await asyncio.to_thread(self.retrieve, text) if self.semantic_index else (None, [])
+        if cached is not None:
+            return cached
+        if self.needs_map_reduce(text):
+            return await self.acall_llama(await self.areduce_messages(text))
+        return await self.acall_llama(self.with_exemplars(self.build_messages(text), exemplars))
+
+    def stream(self, text):
+        """
+        Streams the summary of the given medical text token by token.
+
+        For long texts the chunk summaries are generated first and the final merge is streamed.
+        """
+        cached, exemplars = self.retrieve(text)
+        if cached is not None:
+            return self.cached_stream(cached)
+        if self.needs_map_reduce(text):
+            return self.call_llama_stream(self.reduce_messages(text))
+        return self.call_llama_stream(self.with_exemplars(self.build_messages(text), exemplars))
@@ -1,33 +1,66 @@
 # agents/summarize_validator_agent.py
-from .agent_base import AgentBase
-import numpy as np
+from .async_agent_base import AsyncAgentBase
+from .generation_profile import GenerationProfile
+from .heuristic_validation import SummaryHeuristics
+from .prompts import prompts
+from .rlhf_state import RatingWindow, RLHFStateMixin
+from .structured_validation import StructuredValidatorMixin
 
-class SummarizeValidatorAgent(AgentBase):
+class SummarizeValidatorAgent(StructuredValidatorMixin, RLHFStateMixin, AsyncAgentBase):
     def __init__(self, max_retries=2, verbose=True):
-        super().__init__(name="SummarizeValidatorAgent", max_retries=max_retries, verbose=verbose)
-        self.validation_history = []  # Store validation feedback
-        self.temperature = 0.7
-        self.max_tokens = 512
+        super().__init__(
+            name="SummarizeValidatorAgent",
+            max_retries=max_retries,
+            verbose=verbose,
+            profile=GenerationProfile(temperature=0.7, num_predict=768, num_ctx=4096)  # Room for a corrected summary
+        )
+        self.validation_history = RatingWindow(self.history_size)  # Rolling window of validation feedback
+        # Compression and n-gram overlap checks settle clear cases without an LLM call
+        self.prevalidator = SummaryHeuristics()
+
+    def build_messages(self, original_text, summary):
+        return prompts.render("validate.summary", original=original_text, summary=summary)
+
+    def evaluate(self, original_text, summary):
+        """
+        Validates a medical summary by rules when they are conclusive, otherwise in one structured call.
+
+        Returns:
+            dict: score, analysis, issues, corrected summary (or None) and report; see parse_validation.
+        """
+        evaluation = self.prevalidate(original_text, summary)
+        if evaluation is None:
+            evaluation = self.validate(self.build_messages(original_text, summary), summary)
+        self.optimize_with_rl()
+        return evaluation
+
+    async def aevaluate(self, original_text, summary):
+        """
+        Async variant of `evaluate`.
+        """
+        evaluation = self.prevalidate(original_text, summary)
+        if evaluation is None:
+            evaluation = await self.avalidate(self.build_messages(original_text, summary), summary)
+        self.optimize_with_rl()
+        return evaluation
 
     def execute(self, original_text, summary, human_rating=None):
         """
         Validates the accuracy and conciseness of a medical summary.
         """
-        system_message = "You are an AI assistant that validates summaries of medical texts."
-        user_content = (
-            "Given the original text and its summary, assess whether the summary accurately and concisely captures the key points.\n"
-            "Provide a brief analysis and rate the summary on a scale of 1 to 5, where 5 indicates excellent quality.\n\n"
-            f"Original Text:\n{original_text}\n\n"
-            f"Summary:\n{summary}\n\n"
-            "Validation Report:"
-        )
-        messages = [
-            {"role": "system", "content": system_message},
-            {"role": "user", "content": user_content}
-        ]
+        return self.score(self.evaluate(original_text, summary), human_rating)
+
+    async def aexecute(self, original_text, summary, human_rating=None):
+        """
+        Async variant of `execute`.
+        """
+        return self.score(await self.aevaluate(original_text, summary), human_rating)
 
-        validation_response = self.call_llama(messages, temperature=self.temperature, max_tokens=self.max_tokens)
-        ai_rating = self.extract_validation_score(validation_response)
+    def score(self, evaluation, human_rating=None):
+        """
+        Turns an evaluation into (report, ai_rating, human_rating, average_score).
+        """
+        ai_rating = evaluation["score"]
 
         # Use provided human_rating or default to 3 if not given
         if human_rating is None:
@@ -35,31 +68,14 @@ class SummarizeValidatorAgent(AgentBase):
 
         average_score = (ai_rating + human_rating) / 2
 
-        self.optimize_with_rl()
-
-        return validation_response, ai_rating, human_rating, average_score
-
-    def extract_validation_score(self, response):
-        """
-        Extracts the AI-generated rating from the response (1-5 scale).
-        """
-        try:
-            score = int(response.split("Rating:")[-1].strip().split()[0])
-            return min(max(score, 1), 5)
-        except Exception:
-            return 3  # Default neutral rating if extraction fails
+        return evaluation["report"], ai_rating, human_rating, average_score
 
     def store_feedback(self, original, summary, ai_rating, human_rating):
         """
-        Stores summary validation history for RLHF.
+        Stores summary validation history for RLHF (ratings and summary length only).
         """
-        feedback_entry = {
-            "original": original,
-            "summary": summary,
-            "ai_rating": ai_rating,
-            "human_rating": human_rating
-        }
-        self.validation_history.append(feedback_entry)
+        self.validation_history.append(ai_rating, human_rating, len(summary))
+        self.save_state()
         if self.verbose:
             print(f"[RLHF] Stored AI Rating: {ai_rating}, Human Rating: {human_rating}")
 
@@ -70,16 +86,19 @@ class SummarizeValidatorAgent(AgentBase):
         if len(self.validation_history) < 5:
             return
 
-        ratings = np.array([entry["human_rating"] for entry in self.validation_history])
-        avg_rating = np.mean(ratings)
+        before = self.profile_state()
+        avg_rating = self.validation_history.mean_human()
 
         if avg_rating < 3:
-            self.temperature = max(self.temperature - 0.05, 0.3)
+            self.profile.temperature = max(self.profile.temperature - 0.05, 0.3)
         elif avg_rating > 4:
-            self.temperature = min(self.temperature + 0.05, 1.0)
+            self.profile.temperature = min(self.profile.temperature + 0.05, 1.0)
 
-        if any(len(entry["summary"]) > self.max_tokens * 0.9 for entry in self.validation_history):
-            self.max_tokens = min(self.max_tokens + 50, 1024)
+        if self.validation_history.max_length() > self.profile.num_predict * 0.9:
+            self.profile.num_predict = min(self.profile.num_predict + 50, 1024)
 
+        if self.profile_state() == before:
+            return  # Nothing changed; keep the state file as it is
+        self.save_state()
         if self.verbose:
-            print(f"[RLHF] Adjusted Ollama settings → Temperature: {self.temperature}, Max Tokens: {self.max_tokens}")
+            print(f"[RLHF] Adjusted Ollama settings → {self.profile}")
@@ -1,41 +1,28 @@
 # agents/validator_agent.py
 
 from .agent_base import AgentBase
+from .generation_profile import GenerationProfile
+from .prompts import prompts
+from .structured_validation import StructuredValidatorMixin
 
-class ValidatorAgent(AgentBase):
+class ValidatorAgent(StructuredValidatorMixin, AgentBase):
     def __init__(self, max_retries=2, verbose=True):
-        super().__init__(name="ValidatorAgent", max_retries=max_retries, verbose=verbose)
+        super().__init__(
+            name="ValidatorAgent",
+            max_retries=max_retries,
+            verbose=verbose,
+            # Lower temperature for more deterministic output; num_ctx fits the article and a corrected copy
+            profile=GenerationProfile(temperature=0.3, num_predict=500, num_ctx=8192)
+        )
+
+    def build_messages(self, topic, article):
+        return prompts.render("validate.research_article", topic=topic, article=article)
+
+    def evaluate(self, topic, article):
+        """
+        Validates a research article in one structured call and returns the parsed evaluation.
+        """
+        return self.validate(self.build_messages(topic, article), article)
 
     def execute(self, topic, article):
-        messages = [
-            {
-                "role": "system",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": "You are an AI assistant that validates research articles for accuracy, completeness, and adherence to academic standards."
-                    }
-                ]
-            },
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": (
-                            "Given the topic and the research article below, assess whether the article comprehensively covers the topic, follows a logical structure, and maintains academic standards.\n"
-                            "Provide a brief analysis and rate the article on a scale of 1 to 5, where 5 indicates excellent quality.\n\n"
-                            f"Topic: {topic}\n\n"
-                            f"Article:\n{article}\n\n"
-                            "Validation:"
-                        )
-                    }
-                ]
-            }
-        ]
-        validation = self.call_llama(
-            messages=messages,
-            temperature=0.3,         # Lower temperature for more deterministic output
-            max_tokens=500
-        )
-        return validation
+        return self.evaluate(topic, article)["report"]
@@ -1,37 +1,40 @@
 # agents/write_article_agent.py
 
-import numpy as np
-from .agent_base import AgentBase
+from .async_agent_base import AsyncAgentBase
+from .generation_profile import GenerationProfile
+from .prompts import prompts
+from .rlhf_state import RatingWindow, RLHFStateMixin
+
+class WriteArticleTool(RLHFStateMixin, AsyncAgentBase):
+    history_attr = "article_history"
 
-class WriteArticleTool(AgentBase):
     def __init__(self, max_retries=2, verbose=True):
-        super().__init__(name="WriteArticleTool", max_retries=max_retries, verbose=verbose)
-        self.article_history = []  # Store feedback history
-        self.temperature = 0.7  # Initial temperature
-        self.max_tokens = 1000  # Initial max token limit
+        super().__init__(
+            name="WriteArticleTool",
+            max_retries=max_retries,
+            verbose=verbose,
+            profile=GenerationProfile(temperature=0.7, num_predict=1000, num_ctx=4096)  # Initial temperature and token limit
+        )
+        self.article_history = RatingWindow(self.history_size)  # Rolling window of feedback
+
+    def build_messages(self, topic, outline=None):
+        return prompts.render("write_article", topic=topic, outline=f"Outline:\n{outline}\n\n" if outline else "")
 
     def execute(self, topic, outline=None):
-        system_message = "You are an expert academic writer."
-        user_content = f"Write a research article on the following topic:\nTopic: {topic}\n\n"
-        if outline:
-            user_content += f"Outline:\n{outline}\n\n"
-        user_content += "Article:\n"
-
-        messages = [
-            {"role": "system", "content": system_message},
-            {"role": "user", "content": user_content}
-        ]
-        article = self.call_llama(messages, temperature=self.temperature, max_tokens=self.max_tokens)
+        messages = self.build_messages(topic, outline)
+        article = self.call_llama(messages)
         return article
 
+    async def aexecute(self, topic, outline=None):
+        return await self.acall_llama(self.build_messages(topic, outline))
+
+    def stream(self, topic, outline=None):
+        messages = self.build_messages(topic, outline)
+        return self.call_llama_stream(messages)
+
     def store_feedback(self, topic, article, ai_rating, human_rating):
-        feedback_entry = {
-            "topic": topic,
-            "article": article,
-            "ai_rating": ai_rating,
-            "human_rating": human_rating
-        }
-        self.article_history.append(feedback_entry)
+        self.article_history.append(ai_rating, human_rating, len(article))
+        self.save_state()
         if self.verbose:
             print(f"[RLHF] Stored AI Rating: {ai_rating}, Human Rating: {human_rating}")
 
@@ -39,16 +42,19 @@ class WriteArticleTool(AgentBase):
         if len(self.article_history) < 5:
             return  # Need enough feedback before tuning
 
-        ratings = np.array([entry["human_rating"] for entry in self.article_history])
-        avg_rating = np.mean(ratings)
+        before = self.profile_state()
+        avg_rating = self.article_history.mean_human()
 
         if avg_rating < 3:
-            self.temperature = max(self.temperature - 0.05, 0.3)
+            self.profile.temperature = max(self.profile.temperature - 0.05, 0.3)
         elif avg_rating > 4:
-            self.temperature = min(self.temperature + 0.05, 1.0)
+            self.profile.temperature = min(self.profile.temperature + 0.05, 1.0)
 
-        if any(len(entry["article"]) > self.max_tokens * 0.9 for entry in self.article_history):
-            self.max_tokens = min(self.max_tokens + 100, 2048)
+        if self.article_history.max_length() > self.profile.num_predict * 0.9:
+            self.profile.num_predict = min(self.profile.num_predict + 100, 2048)
 
+        if self.profile_state() == before:
+            return  # Nothing changed; keep the state file as it is
+        self.save_state()
         if self.verbose:
-            print(f"[RLHF] Adjusted Settings → Temperature: {self.temperature}, Max Tokens: {self.max_tokens}")
+            print(f"[RLHF] Adjusted Settings → {self.profile}")
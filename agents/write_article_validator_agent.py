@@ -1,50 +1,49 @@
 # agents/write_article_validator_agent.py
-import numpy as np
-from .agent_base import AgentBase
-class WriteArticleValidatorAgent(AgentBase):
+from .async_agent_base import AsyncAgentBase
+from .generation_profile import GenerationProfile
+from .prompts import prompts
+from .rlhf_state import RatingWindow, RLHFStateMixin
+from .structured_validation import StructuredValidatorMixin
+class WriteArticleValidatorAgent(StructuredValidatorMixin, RLHFStateMixin, AsyncAgentBase):
     def __init__(self, max_retries=2, verbose=True):
-        super().__init__(name="WriteArticleValidatorAgent", max_retries=max_retries, verbose=verbose)
-        self.validation_history = []
-        self.temperature = 0.7
-        self.max_tokens = 512
+        super().__init__(
+            name="WriteArticleValidatorAgent",
+            max_retries=max_retries,
+            verbose=verbose,
+            # Base budget; validate raises it (output_budget) for long articles, which the corrected article repeats
+            profile=GenerationProfile(temperature=0.7, num_predict=1024, num_ctx=8192)
+        )
+        self.validation_history = RatingWindow(self.history_size)
+
+    def build_messages(self, topic, article):
+        return prompts.render("validate.article", topic=topic, article=article)
+
+    def evaluate(self, topic, article):
+        evaluation = self.validate(self.build_messages(topic, article), article)
+        self.optimize_with_rl()
+        return evaluation
+
+    async def aevaluate(self, topic, article):
+        evaluation = await self.avalidate(self.build_messages(topic, article), article)
+        self.optimize_with_rl()
+        return evaluation
 
     def execute(self, topic, article, human_rating=None):
-        system_message = "You are an AI assistant that validates research articles."
-        user_content = (
-            "Given the topic and the article, assess whether the article comprehensively covers the topic, follows a logical structure, and maintains academic standards.\n"
-            "Provide a brief analysis and rate the article on a scale of 1 to 5, where 5 indicates excellent quality.\n\n"
-            f"Topic: {topic}\n\n"
-            f"Article:\n{article}\n\n"
-            "Validation:"
-        )
-        messages = [
-            {"role": "system", "content": system_message},
-            {"role": "user", "content": user_content}
-        ]
-        validation_response = self.call_llama(messages, temperature=self.temperature, max_tokens=self.max_tokens)
+        return self.score(self.evaluate(topic, article), human_rating)
+
+    async def aexecute(self, topic, article, human_rating=None):
+        return self.score(await self.aevaluate(topic, article), human_rating)
 
-        ai_rating = self.extract_validation_score(validation_response)
+    def score(self, evaluation, human_rating=None):
+        ai_rating = evaluation["score"]
         if human_rating is None:
             human_rating = 3
-        self.optimize_with_rl()
-
-        return validation_response, ai_rating, human_rating
 
-    def extract_validation_score(self, response):
-        try:
-            score = int(response.split("Rating:")[-1].strip().split()[0])
-            return min(max(score, 1), 5)
-        except Exception:
-            return 3
+        return evaluation["report"], ai_rating, human_rating
 
     def store_feedback(self, topic, article, ai_rating, human_rating):
-        feedback_entry = {
-            "topic": topic,
-            "article": article,
-            "ai_rating": ai_rating,
-            "human_rating": human_rating
-        }
-        self.validation_history.append(feedback_entry)
+        self.validation_history.append(ai_rating, human_rating, len(article))
+        self.save_state()
         if self.verbose:
             print(f"[RLHF] Stored AI Rating: {ai_rating}, Human Rating: {human_rating}")
 
@@ -52,16 +51,19 @@ class WriteArticleValidatorAgent(AgentBase):
         if len(self.validation_history) < 5:
             return
 
-        ratings = np.array([entry["human_rating"] for entry in self.validation_history])
-        avg_rating = np.mean(ratings)
+        before = self.profile_state()
+        avg_rating = self.validation_history.mean_human()
 
         if avg_rating < 3:
-            self.temperature = max(self.temperature - 0.05, 0.3)
+            self.profile.temperature = max(self.profile.temperature - 0.05, 0.3)
         elif avg_rating > 4:
-            self.temperature = min(self.temperature + 0.05, 1.0)
+            self.profile.temperature = min(self.profile.temperature + 0.05, 1.0)
 
-        if any(len(entry["article"]) > self.max_tokens * 0.9 for entry in self.validation_history):
-            self.max_tokens = min(self.max_tokens + 50, 1024)
+        if self.validation_history.max_length() > self.profile.num_predict * 0.9:
+            self.profile.num_predict = min(self.profile.num_predict + 50, 2048)
 
+        if self.profile_state() == before:
+            return  # Nothing changed; keep the state file as it is
+        self.save_state()
         if self.verbose:
-            print(f"[RLHF] Adjusted Settings → Temperature: {self.temperature}, Max Tokens: {self.max_tokens}")
+            print(f"[RLHF] Adjusted Settings → {self.profile}")
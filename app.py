@@ -1,44 +1,83 @@
 
 import streamlit as st
-import matplotlib.pyplot as plt
-from wordcloud import WordCloud, STOPWORDS
-from agents import AgentManager
+from agents import AgentManager, AgentPipeline, ResponseCache, CSVSanitizer, RLHFStateStore, metrics, run_async, start_metrics_server
 from utils.logger import logger
+from utils.feedback_store import FeedbackStore
+from utils.term_cloud import TermCloud
 from dotenv import load_dotenv
 from streamlit_lottie import st_lottie
-from io import BytesIO
+from io import BytesIO, TextIOWrapper
 from datetime import datetime
+from uuid import uuid4
+import csv
 import json
 import os
+import tempfile
+import threading
 
 # Load environment variables
 load_dotenv()
 
+RESPONSE_CACHE_FILE = os.getenv("RESPONSE_CACHE_FILE", ".cache/responses.sqlite")
+# Calls sampled above this temperature (e.g. chat at 0.7) are not cached: a fresh reply is expected each time
+RESPONSE_CACHE_MAX_TEMPERATURE = float(os.getenv("RESPONSE_CACHE_MAX_TEMPERATURE", "0.3"))
+RLHF_STATE_FILE = os.getenv("RLHF_STATE_FILE", "rlhf_state.json")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))  # Prometheus /metrics endpoint; 0 disables it
+SEMANTIC_RETRIEVAL = os.getenv("SEMANTIC_RETRIEVAL", "1") != "0"
+SEMANTIC_INDEX_PATH = os.getenv("SEMANTIC_INDEX_PATH") or None  # Unset keeps the index in memory only
+# Feedback section -> (input field, output field) indexed for few-shot exemplars and the semantic cache
+INDEXED_FEEDBACK = {"summarize": ("original", "summary"), "sanitize": ("original", "sanitized")}
+CHAT_PAGE_SIZE = 10  # Chat messages rendered per page
+WORDCLOUD_MODE = os.getenv("WORDCLOUD_MODE", "image")  # "image" (PNG) or "html" (tag cloud, no image rendering)
 
-# Cache the wordcloud generation
-@st.cache_data
-def generate_wordcloud(text):
-    stopwords = set(STOPWORDS)
-    wordcloud = WordCloud(width=800, height=400, max_words=25,
-                         background_color='white', colormap='Set2',
-                         collocations=False, stopwords=STOPWORDS).generate(text)
-    return wordcloud
 
-# Cache the agent manager initialization
-@st.cache_resource
-def get_agent_manager():
-    return AgentManager(max_retries=2, verbose=True)
+# Word clouds are cached by text hash in a process-wide TermCloud. The pipeline builds them
+# in a worker thread next to validation, so this is not Streamlit's script-bound cache.
+term_cloud = TermCloud(width=800, height=400, max_words=25, colormap='Set2')
 
-def show_wordcloud(text):
-    wordcloud = generate_wordcloud(text)
-    plt.figure(figsize=(10, 5))
-    plt.imshow(wordcloud, interpolation='bilinear')
-    plt.axis("off")
-    st.pyplot(plt)
+def generate_wordcloud(text):
+    return term_cloud.render(text, WORDCLOUD_MODE)
 
+def show_wordcloud(wordcloud):
+    if not wordcloud:
+        st.caption("No terms to show in a word cloud.")
+    elif isinstance(wordcloud, str):
+        st.markdown(wordcloud, unsafe_allow_html=True)
+    else:
+        st.image(wordcloud, use_container_width=True)
+
+# Cache the agent manager initialization
 @st.cache_resource
 def get_agent_manager():
-    return AgentManager(max_retries=2, verbose=True)
+    cache = ResponseCache(path=RESPONSE_CACHE_FILE, max_temperature=RESPONSE_CACHE_MAX_TEMPERATURE)
+    state_store = RLHFStateStore(RLHF_STATE_FILE)
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+    semantic_index = None
+    if SEMANTIC_RETRIEVAL:
+        from agents import SemanticIndex  # Loads numpy, so only when retrieval is on
+        semantic_index = SemanticIndex(SEMANTIC_INDEX_PATH)
+        # Index feedback given before this process started, without delaying startup
+        threading.Thread(target=semantic_index.sync, args=(get_feedback_store(), INDEXED_FEEDBACK),
+                         name="semantic-index-sync", daemon=True).start()
+    return AgentManager(max_retries=2, verbose=True, cache=cache, state_store=state_store, warm_up=True,
+                        semantic_index=semantic_index)
+
+def render_stream(stream, label):
+    """
+    Renders a LlamaStream into a result box token by token and returns the full reply.
+    """
+    placeholder = st.empty()
+    partial = ""
+    for chunk in stream:
+        partial += chunk
+        placeholder.markdown(f"<div class='result-box'><strong>{label}</strong><br>{partial}▌</div>", unsafe_allow_html=True)
+    placeholder.markdown(f"<div class='result-box'><strong>{label}</strong><br>{stream.text}</div>", unsafe_allow_html=True)
+
+    stats = stream.stats
+    if stats.get("time_to_first_token") is not None:
+        st.caption(f"⏱ First token in {stats['time_to_first_token']:.2f}s · completed in {stats['total_time']:.2f}s")
+    return stream.text
 
 def go_home():
     st.session_state.view = "home"
@@ -194,6 +233,15 @@ def main():
                 key="card_chatbot",
                 agent_name="chatbot"
             )
+        cols3 = st.columns(2)
+        with cols3[0]:
+            render_card(
+                title="📊 Performance Dashboard",
+                description="Latency, throughput, queues and cache efficiency per agent.",
+                button_label="Open Dashboard",
+                key="card_admin",
+                agent_name="admin"
+            )
 
     # AGENT view: show the chosen tool + back button
     else:
@@ -209,10 +257,74 @@ def main():
         elif st.session_state.view == "chatbot":
             st.header("💬 Medical Chatbot")
             chatbot_section(agent_manager)
+        elif st.session_state.view == "admin":
+            st.header("📊 Performance Dashboard")
+            admin_section(agent_manager)
 
         st.button("🔙 Back to Home", on_click=go_home)
 
 
+def format_seconds(value):
+    return f"{value:.2f}s" if value is not None else "–"
+
+def admin_section(agent_manager):
+    """
+    Shows the per-agent call metrics plus the scheduler, backend and cache state.
+    """
+    if st.button("🔄 Refresh"):
+        st.rerun()
+
+    rows = []
+    for agent in agent_manager.agents.values():
+        latency = metrics.histogram("ollama_request_seconds", agent=agent.name)
+        ttft = metrics.histogram("ollama_time_to_first_token_seconds", agent=agent.name)
+        speed = metrics.histogram("ollama_tokens_per_second", agent=agent.name)
+        hits = metrics.counter("response_cache_requests_total", agent=agent.name, result="hit")
+        lookups = metrics.counter("response_cache_requests_total", agent=agent.name)
+        rows.append({
+            "Agent": agent.name,
+            "Calls": metrics.counter("ollama_requests_total", agent=agent.name),
+            "Errors": metrics.counter("ollama_requests_total", agent=agent.name, outcome="error"),
+            "p50": format_seconds(latency.quantile(0.5) if latency else None),
+            "p95": format_seconds(latency.quantile(0.95) if latency else None),
+            "TTFT p50": format_seconds(ttft.quantile(0.5) if ttft else None),
+            "Tokens/s": f"{speed.mean():.1f}" if speed else "–",
+            "Prompt tokens": metrics.counter("ollama_prompt_tokens_total", agent=agent.name),
+            "Output tokens": metrics.counter("ollama_eval_tokens_total", agent=agent.name),
+            "Retries": metrics.counter("ollama_retries_total", agent=agent.name),
+            "Cache hit rate": f"{hits / lookups:.0%}" if lookups else "–",
+        })
+    st.subheader("Agents")
+    st.dataframe(rows, use_container_width=True, hide_index=True)
+
+    scheduler_stats = agent_manager.scheduler.stats()
+    st.subheader("Scheduler")
+    cols = st.columns(3)
+    cols[0].metric("Queued", sum(scheduler_stats["queued"].values()))
+    cols[1].metric("In flight", sum(scheduler_stats["in_flight"].values()))
+    cols[2].metric("Rejected / timed out", f"{scheduler_stats['rejected']} / {scheduler_stats['timed_out']}")
+    st.dataframe([
+        {"Priority": priority, "Queued": scheduler_stats["queued"][priority],
+         "Admitted": scheduler_stats["admitted"][priority],
+         "Mean wait": format_seconds(scheduler_stats["mean_wait"][priority])}
+        for priority in scheduler_stats["queued"]
+    ], use_container_width=True, hide_index=True)
+
+    if agent_manager.backend_pool is not None:
+        st.subheader("Ollama backends")
+        st.dataframe(agent_manager.backend_pool.stats(), use_container_width=True, hide_index=True)
+
+    if agent_manager.cache is not None:
+        st.subheader("Response cache")
+        cache_stats = agent_manager.cache.stats()
+        cols = st.columns(3)
+        cols[0].metric("Hit rate", f"{cache_stats['hit_rate']:.0%}")
+        cols[1].metric("Entries in memory", cache_stats["memory_entries"])
+        cols[2].metric("Disk hits", cache_stats["disk_hits"])
+
+    if METRICS_PORT:
+        st.caption(f"Prometheus metrics: http://localhost:{METRICS_PORT}/metrics")
+
 def summarize_section(agent_manager):
     st.markdown("<div class='sub-header'>🏥 Summarize Medical Text</div>", unsafe_allow_html=True)
     text = st.text_area("📝 Enter medical text to summarize:", height=200)
@@ -223,14 +335,12 @@ def summarize_section(agent_manager):
 
     if st.button("✨ Summarize") and text:
         summarize_agent = agent_manager.get_agent("summarize")
-        validator_agent = agent_manager.get_agent("summarize_validator")
+        pipeline = AgentPipeline(agent_manager)
 
         with st.spinner("🔄 Summarizing..."):
             try:
-                summary = summarize_agent.execute(text)
+                summary = render_stream(summarize_agent.stream(text), "✅ Summary:")
                 st.session_state["summary"] = summary
-                st.markdown(f"<div class='result-box'><strong>✅ Summary:</strong><br>{summary}</div>", unsafe_allow_html=True)
-                show_wordcloud(text)
             except Exception as e:
                 st.error(f"⚠️ Error: {e}")
                 logger.error(f"SummarizeAgent Error: {e}")
@@ -238,9 +348,16 @@ def summarize_section(agent_manager):
 
         with st.spinner("🔍 Validating summary..."):
             try:
-                validation_response, ai_score, _, _ = validator_agent.execute(original_text=text, summary=summary)
+                # Word cloud rendering runs concurrently with validation
+                result = run_async(pipeline.finish(
+                    "summarize", text, summary,
+                    render=lambda original, _: generate_wordcloud(original)
+                ))
+                show_wordcloud(result["artifact"])
+                validation_response, ai_score = result["validation"], result["ai_rating"]
                 st.session_state["summary_validation"] = validation_response
                 st.session_state["summary_ai_score"] = ai_score
+                st.session_state["summary_corrected"] = result["corrected"]
                 st.markdown(f"<div class='validation-box'><strong>🔍 Validation Report:</strong><br>{validation_response}</div>", unsafe_allow_html=True)
                 st.markdown(f"<div class='rating-box'><strong>🤖 AI Rating:</strong> {ai_score:.1f} / 5</div>", unsafe_allow_html=True)
             except Exception as e:
@@ -260,7 +377,7 @@ def summarize_section(agent_manager):
 
             validator_agent = agent_manager.get_agent("summarize_validator")
             validator_agent.store_feedback(text, summary, ai_score, human_score)
-            store_feedback_json("summarize", {
+            store_feedback_entry("summarize", {
                 "original": text,
                 "summary": summary,
                 "ai_rating": ai_score,
@@ -268,8 +385,11 @@ def summarize_section(agent_manager):
                 "validation": validation_response
             })
 
-            improved_summary = None
-            if avg_score < 3.5:
+            # The validator already returned a corrected version for weak summaries
+            improved_summary = st.session_state.get("summary_corrected") if avg_score < 3.5 else None
+            if improved_summary:
+                st.markdown(f"<div class='result-box'><strong>🔁 Improved Summary:</strong><br>{improved_summary}</div>", unsafe_allow_html=True)
+            elif avg_score < 3.5:
                 with st.spinner("🔁 Improving summary..."):
                     try:
                         improved_prompt = (
@@ -277,7 +397,8 @@ def summarize_section(agent_manager):
                             f"Make it more concise, clear, and medically accurate.\n\n"
                             f"Original Text:\n{text}\n\nSummary:\n{summary}"
                         )
-                        improved_summary = validator_agent.call_llama([
+                        # Validators reply in JSON, so free-text improvement goes to the generator
+                        improved_summary = agent_manager.get_agent("summarize").call_llama([
                             {"role": "system", "content": "You are a medical summarization improver."},
                             {"role": "user", "content": improved_prompt}
                         ])
@@ -309,28 +430,45 @@ def chatbot_section(agent_manager):
         st_lottie(lottie_chatbot, height=400, width=400, key="chatbot")
 
     with col2:
-        if "chat_history" not in st.session_state:
-            st.session_state.chat_history = []
+        # History lives in the agent's conversation store; the session only keeps its ID and the page shown
+        if "chat_session_id" not in st.session_state:
+            st.session_state.chat_session_id = uuid4().hex
+            st.session_state.chat_page = 0
+        session_id = st.session_state.chat_session_id
+        chatbot_agent = agent_manager.get_agent("chatbot")
 
         user_input = st.text_input("💡 Ask me anything about medical research or AI:")
 
         if st.button("💬 Chat") and user_input:
-            chatbot_agent = agent_manager.get_agent("chatbot")
-
             with st.spinner("🤖 Thinking..."):
                 try:
-                    response = chatbot_agent.execute(user_input)
-                    st.session_state.chat_history.append(("🧑‍💻 You", user_input))
-                    st.session_state.chat_history.append(("🤖 AI", response))
+                    stream = chatbot_agent.stream(user_input, session_id=session_id)
+                    placeholder = st.empty()
+                    partial = ""
+                    for chunk in stream:
+                        partial += chunk
+                        placeholder.markdown(f"**🤖 AI:** {partial}▌")
+                    placeholder.empty()  # The full reply is rendered with the chat history below
+                    chatbot_agent.conversations.record(session_id, user_input, stream.text)
+                    st.session_state.chat_page = 0
                 except Exception as e:
                     st.error(f"⚠️ Chatbot Error: {e}")
                     logger.error(f"ChatbotAgent Error: {e}")
 
-        for role, message in st.session_state.chat_history:
-            st.markdown(f"**{role}:** {message}")
+        turns, page_count = chatbot_agent.conversations.page(session_id, st.session_state.chat_page, CHAT_PAGE_SIZE)
+        if st.session_state.chat_page < page_count - 1 and st.button("⬆️ Show earlier messages"):
+            st.session_state.chat_page += 1
+            st.rerun()
+        if st.session_state.chat_page > 0 and st.button("⬇️ Show newer messages"):
+            st.session_state.chat_page -= 1
+            st.rerun()
+        for role, message in turns:
+            st.markdown(f"**{'🧑‍💻 You' if role == 'user' else '🤖 AI'}:** {message}")
 
         if st.button("🗑 Clear Chat History"):
-            st.session_state.chat_history = []
+            chatbot_agent.conversations.clear(session_id)
+            st.session_state.chat_page = 0
+            st.rerun()
 
 
 def write_and_refine_article_section(agent_manager):
@@ -344,15 +482,12 @@ def write_and_refine_article_section(agent_manager):
 
     if st.button("✍️ Write & Refine") and text:
         write_agent = agent_manager.get_agent("write_article")
-        validator_agent = agent_manager.get_agent("write_article_validator")
+        pipeline = AgentPipeline(agent_manager)
 
         with st.spinner("🔄 Refining your article..."):
             try:
-                refined_text = write_agent.execute(text)
+                refined_text = render_stream(write_agent.stream(text), "✅ Refined Article:")
                 st.session_state["refined_text"] = refined_text
-                st.markdown(f"<div class='result-box'><strong>✅ Refined Article:</strong><br>{refined_text}</div>",
-                            unsafe_allow_html=True)
-                show_wordcloud(refined_text)  # Show word cloud for refined article
             except Exception as e:
                 st.error(f"⚠️ Error: {e}")
                 logger.error(f"WriteArticleAgent Error: {e}")
@@ -360,9 +495,16 @@ def write_and_refine_article_section(agent_manager):
 
         with st.spinner("🔍 Validating article..."):
             try:
-                validation_response, ai_rating, _ = validator_agent.execute(topic=text, article=refined_text)
+                # Word cloud for the refined article renders concurrently with validation
+                result = run_async(pipeline.finish(
+                    "write_article", text, refined_text,
+                    render=lambda _, refined: generate_wordcloud(refined)
+                ))
+                show_wordcloud(result["artifact"])
+                validation_response, ai_rating = result["validation"], result["ai_rating"]
                 st.session_state["article_validation"] = validation_response
                 st.session_state["article_ai_score"] = ai_rating
+                st.session_state["article_corrected"] = result["corrected"]
                 st.markdown(f"<div class='validation-box'><strong>🧐 Validation Report:</strong><br>{validation_response}</div>", unsafe_allow_html=True)
                 st.markdown(f"<div class='rating-box'><strong>🤖 AI Rating:</strong> {ai_rating:.1f} / 5</div>", unsafe_allow_html=True)
             except Exception as e:
@@ -382,15 +524,17 @@ def write_and_refine_article_section(agent_manager):
             # Store feedback with human rating
             validator_agent = agent_manager.get_agent("write_article_validator")
             validator_agent.store_feedback(text, refined_text, ai_score, human_score)
-            store_feedback_json("write_article", {
+            store_feedback_entry("write_article", {
                 "original": text,
                 "refined": refined_text,
                 "ai_rating": ai_score,
                 "human_rating": human_score,
                 "validation": validation_response
             })
-            improved_article = None
-            if avg_score < 3.5:
+            improved_article = st.session_state.get("article_corrected") if avg_score < 3.5 else None
+            if improved_article:
+                st.markdown(f"<div class='result-box'><strong>🔁 Improved Article:</strong><br>{improved_article}</div>", unsafe_allow_html=True)
+            elif avg_score < 3.5:
                 with st.spinner("🔁 Improving article..."):
                     try:
                         improved_prompt = (
@@ -398,7 +542,7 @@ def write_and_refine_article_section(agent_manager):
                             f"Ensure it's more concise, accurate, and medically appropriate.\n\n"
                             f"Original Article:\n{text}\n\nRefined Article:\n{refined_text}"
                         )
-                        improved_article = validator_agent.call_llama([
+                        improved_article = agent_manager.get_agent("write_article").call_llama([
                             {"role": "system", "content": "You are a research article improver."},
                             {"role": "user", "content": improved_prompt}
                         ])
@@ -414,20 +558,22 @@ def sanitize_data_section(agent_manager):
     text = st.text_area("🔍 Paste the medical data to sanitize:", height=250)
     uploaded_file = st.file_uploader("📂 Upload a medical document", type=["txt", "csv"])
 
+    # CSV exports are streamed row by row instead of being sent as a single prompt
+    if uploaded_file is not None and uploaded_file.name.lower().endswith(".csv"):
+        sanitize_csv_section(agent_manager, uploaded_file)
+        return
+
     if uploaded_file is not None:
         text = uploaded_file.getvalue().decode("utf-8")
 
     if st.button("🛡 Sanitize") and text:
         sanitize_agent = agent_manager.get_agent("sanitize_data")
-        validator_agent = agent_manager.get_agent("sanitize_data_validator")
+        pipeline = AgentPipeline(agent_manager)
 
         with st.spinner("🔄 Removing PHI..."):
             try:
-                sanitized_text = sanitize_agent.execute(text)
+                sanitized_text = render_stream(sanitize_agent.stream(text), "✅ Sanitized Data:")
                 st.session_state["sanitized_text"] = sanitized_text
-                st.markdown(f"<div class='result-box'><strong>✅ Sanitized Data:</strong><br>{sanitized_text}</div>",
-                            unsafe_allow_html=True)
-                show_wordcloud(sanitized_text)  # Generate a word cloud for sanitized data
             except Exception as e:
                 st.error(f"⚠️ Error: {e}")
                 logger.error(f"SanitizeDataAgent Error: {e}")
@@ -435,9 +581,16 @@ def sanitize_data_section(agent_manager):
 
         with st.spinner("🔍 Validating sanitization..."):
             try:
-                validation_response, ai_score, _, _ = validator_agent.execute(original_data=text, sanitized_data=sanitized_text)
+                # Word cloud for the sanitized data renders concurrently with validation
+                result = run_async(pipeline.finish(
+                    "sanitize", text, sanitized_text,
+                    render=lambda _, sanitized: generate_wordcloud(sanitized)
+                ))
+                show_wordcloud(result["artifact"])
+                validation_response, ai_score = result["validation"], result["ai_rating"]
                 st.session_state["sanitized_validation"] = validation_response
                 st.session_state["sanitize_ai_score"] = ai_score
+                st.session_state["sanitize_corrected"] = result["corrected"]
                 st.markdown(f"<div class='validation-box'><strong>🧐 Validation Report:</strong><br>{validation_response}</div>", unsafe_allow_html=True)
                 st.markdown(f"<div class='rating-box'><strong>🤖 AI Rating:</strong> {ai_score:.1f} / 5</div>", unsafe_allow_html=True)
             except Exception as e:
@@ -457,15 +610,17 @@ def sanitize_data_section(agent_manager):
             # Store feedback with human rating
             validator_agent = agent_manager.get_agent("sanitize_data_validator")
             validator_agent.store_feedback(text, sanitized_text, ai_score, human_score)
-            store_feedback_json("sanitize", {
+            store_feedback_entry("sanitize", {
                 "original": text,
                 "sanitized": sanitized_text,
                 "ai_rating": ai_score,
                 "human_rating": human_score,
                 "validation": validation_response
             })
-            improved_sanitized = None
-            if avg_score < 3.5:
+            improved_sanitized = st.session_state.get("sanitize_corrected") if avg_score < 3.5 else None
+            if improved_sanitized:
+                st.markdown(f"<div class='result-box'><strong>🔁 Improved Sanitized Data:</strong><br>{improved_sanitized}</div>", unsafe_allow_html=True)
+            elif avg_score < 3.5:
                 with st.spinner("🔁 Improving sanitized data..."):
                     try:
                         improved_prompt = (
@@ -473,7 +628,7 @@ def sanitize_data_section(agent_manager):
                             f"Ensure all PHI is masked and the data is more accurate.\n\n"
                             f"Original Data:\n{text}\n\nSanitized Data:\n{sanitized_text}"
                         )
-                        improved_sanitized = validator_agent.call_llama([
+                        improved_sanitized = agent_manager.get_agent("sanitize_data").call_llama([
                             {"role": "system", "content": "You are a medical data sanitizer improver."},
                             {"role": "user", "content": improved_prompt}
                         ])
@@ -483,6 +638,52 @@ def sanitize_data_section(agent_manager):
             download_sanitize_report(text, sanitized_text, validation_response, ai_score, human_score, improved_sanitized)
 
 
+def sanitize_csv_section(agent_manager, uploaded_file):
+    """
+    Sanitizes an uploaded CSV row by row with bounded memory and offers the result for download.
+    """
+    source = TextIOWrapper(uploaded_file, encoding="utf-8", newline="")
+    header = next(csv.reader(source), [])
+    source.detach()  # Keep the upload open for the actual run
+
+    text_columns = st.multiselect(
+        "📝 Free-text columns (LLM sanitization; other columns get rule-based masking):",
+        header, key="csv_text_columns"
+    )
+
+    if st.button("🛡 Sanitize CSV"):
+        sanitizer = CSVSanitizer(agent_manager.get_agent("sanitize_data"), text_columns=text_columns, verbose=False)
+        output_path = os.path.join(tempfile.gettempdir(), f"sanitized_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+        progress = st.empty()
+
+        with st.spinner("🔄 Removing PHI row by row..."):
+            try:
+                uploaded_file.seek(0)
+                source = TextIOWrapper(uploaded_file, encoding="utf-8", newline="")
+                with open(output_path, "w", encoding="utf-8", newline="") as destination:
+                    rows = sanitizer.sanitize(
+                        source, destination,
+                        on_progress=lambda written: written % 50 == 0 and progress.text(f"🔒 {written} rows sanitized...")
+                    )
+                source.detach()
+                progress.text(f"✅ {rows} rows sanitized.")
+                st.session_state["sanitized_csv_path"] = output_path
+            except Exception as e:
+                st.error(f"⚠️ Error: {e}")
+                logger.error(f"CSVSanitizer Error: {e}")
+                return
+
+    output_path = st.session_state.get("sanitized_csv_path")
+    if output_path and os.path.exists(output_path):
+        with open(output_path, "rb") as sanitized_csv:
+            st.download_button(
+                label="⬇️ Download Sanitized CSV",
+                data=sanitized_csv,
+                file_name=f"sanitized_{uploaded_file.name}",
+                mime="text/csv"
+            )
+
+
 def download_summary_report(original_text, summary, validation_report, ai_rating, human_rating, improved_summary=None):
     """
     Creates and enables downloading of a summary validation report.
@@ -625,19 +826,25 @@ Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
         mime="text/plain"
     )
 
-FEEDBACK_FILE = "feedback_store.json"
+FEEDBACK_FILE = "feedback_store.json"  # Legacy store, imported once into the database
+FEEDBACK_DB = os.getenv("FEEDBACK_DB", "feedback_store.db")
 
-def store_feedback_json(section, feedback_entry):
-    if os.path.exists(FEEDBACK_FILE):
-        with open(FEEDBACK_FILE, "r") as f:
-            data = json.load(f)
-    else:
-        data = {}
-    if section not in data:
-        data[section] = []
-    data[section].append(feedback_entry)
-    with open(FEEDBACK_FILE, "w") as f:
-        json.dump(data, f, indent=2)
+@st.cache_resource
+def get_feedback_store():
+    store = FeedbackStore(FEEDBACK_DB)
+    store.migrate_json(FEEDBACK_FILE)
+    return store
+
+def store_feedback_entry(section, feedback_entry):
+    feedback_id = get_feedback_store().add(section, feedback_entry)
+    semantic_index = get_agent_manager().semantic_index
+    if semantic_index is not None and section in INDEXED_FEEDBACK:
+        input_field, output_field = INDEXED_FEEDBACK[section]
+        # Embedding is a network call; the rating is already saved, so it need not block the page
+        threading.Thread(target=semantic_index.add, args=(
+            section, feedback_entry.get(input_field), feedback_entry.get(output_field),
+            feedback_entry.get("human_rating"), feedback_id
+        ), daemon=True).start()
 
 
 
@@ -0,0 +1,240 @@
+# benchmarks/bench_pipelines.py
+"""
+Throughput, latency and memory benchmark of the agents against a fake Ollama server.
+
+Usage:
+    python -m benchmarks.bench_pipelines
+    python -m benchmarks.bench_pipelines --scenarios summarize,pipeline:sanitize --sizes large --concurrency 1,8
+    python -m benchmarks.bench_pipelines --json results.json
+    python -m benchmarks.bench_pipelines --baseline results.json   # exit 1 on a regression
+
+Every scenario runs `--docs` synthetic clinical documents per document size and
+concurrency level and reports documents/s, p50/p95/p99 latency per document, LLM calls
+per document and peak Python memory (tracemalloc). The fake server runs in a separate
+process (see benchmarks/fake_ollama.py) so its work does not skew the measurements.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+import urllib.request
+
+from agents import AgentManager, AgentPipeline, ResponseCache, metrics, run_async
+
+DOC_SIZES = {"small": 1500, "medium": 8000, "large": 40000}  # Characters
+
+FIRST_NAMES = ("John", "Maria", "Wei", "Fatima", "Liam", "Aiko", "Carlos", "Priya")
+LAST_NAMES = ("Smith", "Garcia", "Chen", "Khan", "Murphy", "Tanaka", "Lopez", "Patel")
+FINDINGS = (
+    "Blood pressure was {bp} mmHg and heart rate {hr} bpm.",
+    "The patient reports intermittent chest discomfort on exertion.",
+    "Metformin {dose} mg twice daily was continued.",
+    "HbA1c improved to {a1c}% compared with the previous visit.",
+    "No signs of peripheral edema or jugular venous distension.",
+    "Chest X-ray showed no acute cardiopulmonary process.",
+    "Follow-up echocardiogram is scheduled in six weeks.",
+    "Dietary counselling was provided and the patient agreed to daily walks.",
+)
+
+
+def make_document(size, seed):
+    """
+    Returns a deterministic synthetic clinical note of about `size` characters with PHI in it.
+    """
+    rng = random.Random(seed)
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    parts = [
+        f"Patient Name: {name}\n",
+        f"DOB: {rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}/{rng.randint(1940, 2005)}\n",
+        f"Phone: ({rng.randint(200, 999)}) {rng.randint(200, 999)}-{rng.randint(1000, 9999)}\n",
+        f"Physician: Dr. {rng.choice(LAST_NAMES)}\n\n",
+    ]
+    length = sum(len(part) for part in parts)
+    while length < size:
+        sentence = rng.choice(FINDINGS).format(
+            bp=f"{rng.randint(110, 160)}/{rng.randint(70, 100)}", hr=rng.randint(55, 100),
+            dose=rng.choice((500, 850, 1000)), a1c=round(rng.uniform(5.5, 9.0), 1)
+        )
+        if rng.random() < 0.1:
+            sentence = f"{name.split()[0]} was seen on {rng.randint(1, 12)}/{rng.randint(1, 28)}/2024. " + sentence
+        parts.append(sentence + (" " if rng.random() < 0.8 else "\n"))
+        length += len(parts[-1])
+    return "".join(parts)
+
+
+def _stream_chat(manager, text):
+    stream = manager.get_agent("chatbot").stream(text[:500])
+    for _ in stream:
+        pass
+    return stream.stats.get("time_to_first_token")
+
+
+# Scenario name -> coroutine factory (manager, pipeline, text) -> awaitable
+SCENARIOS = {
+    "summarize": lambda manager, pipeline, text: manager.get_agent("summarize").aexecute(text),
+    "sanitize": lambda manager, pipeline, text: manager.get_agent("sanitize_data").aexecute(text),
+    "validate": lambda manager, pipeline, text: manager.get_agent("summarize_validator").aexecute(text, text[: len(text) // 5]),
+    "chat_stream": lambda manager, pipeline, text: asyncio.to_thread(_stream_chat, manager, text),
+    "pipeline:summarize": lambda manager, pipeline, text: pipeline.run("summarize", text),
+    "pipeline:sanitize": lambda manager, pipeline, text: pipeline.run("sanitize", text),
+    "pipeline:write_article": lambda manager, pipeline, text: pipeline.run("write_article", text[:200]),
+}
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    position = (len(ordered) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+async def run_scenario(manager, scenario, documents, concurrency):
+    """
+    Processes `documents` with at most `concurrency` in flight and returns the measurements.
+    """
+    pipeline = AgentPipeline(manager, max_concurrency=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(text):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await SCENARIOS[scenario](manager, pipeline, text)
+            except Exception:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - started)
+
+    calls_before = metrics.counter("ollama_requests_total")
+    tracemalloc.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(one(text) for text in documents))
+    wall_time = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "docs": len(documents),
+        "errors": errors,
+        "wall_time": wall_time,
+        "throughput": len(latencies) / wall_time if wall_time else 0.0,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "llm_calls_per_doc": (metrics.counter("ollama_requests_total") - calls_before) / len(documents),
+        "peak_memory_mb": peak / 2 ** 20,
+    }
+
+
+def start_fake_server(port, args):
+    command = [
+        sys.executable, "-m", "benchmarks.fake_ollama", "--port", str(port),
+        "--token-rate", str(args.token_rate), "--latency", str(args.latency), "--parallel", str(args.parallel),
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"{url}/api/version", timeout=1).read()
+            return process, url
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Fake Ollama server did not start.")
+
+
+def compare(results, baseline, tolerance):
+    """
+    Returns descriptions of runs whose throughput dropped or p95 grew by more than `tolerance`.
+    """
+    previous = {(r["scenario"], r["size"], r["concurrency"]): r for r in baseline}
+    regressions = []
+    for result in results:
+        old = previous.get((result["scenario"], result["size"], result["concurrency"]))
+        if not old or not old["throughput"] or old["p95"] is None or result["p95"] is None:
+            continue
+        label = f"{result['scenario']}/{result['size']}/c{result['concurrency']}"
+        if result["throughput"] < old["throughput"] * (1 - tolerance):
+            regressions.append(f"{label}: throughput {old['throughput']:.2f} -> {result['throughput']:.2f} docs/s")
+        if result["p95"] > old["p95"] * (1 + tolerance):
+            regressions.append(f"{label}: p95 {old['p95']:.2f}s -> {result['p95']:.2f}s")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_pipelines", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scenarios", default="summarize,sanitize,validate,pipeline:summarize,pipeline:sanitize",
+                        help=f"Comma-separated subset of: {', '.join(SCENARIOS)}.")
+    parser.add_argument("--sizes", default="small,medium,large", help=f"Comma-separated subset of: {', '.join(DOC_SIZES)}.")
+    parser.add_argument("--concurrency", default="1,4", help="Comma-separated concurrency levels.")
+    parser.add_argument("--docs", type=int, default=8, help="Documents per run.")
+    parser.add_argument("--cache", action="store_true", help="Enable the in-memory response cache.")
+    parser.add_argument("--host", help="Benchmark an already running (fake or real) Ollama server instead.")
+    parser.add_argument("--port", type=int, default=11500, help="Port for the fake server.")
+    parser.add_argument("--token-rate", type=float, default=400.0, help="Fake server tokens per second.")
+    parser.add_argument("--latency", type=float, default=0.02, help="Fake server seconds per request.")
+    parser.add_argument("--parallel", type=int, default=4, help="Fake server concurrent requests.")
+    parser.add_argument("--json", help="Write the results to this JSON file.")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression vs the baseline.")
+    args = parser.parse_args(argv)
+
+    process = None
+    host = args.host
+    if host is None:
+        process, host = start_fake_server(args.port, args)
+
+    try:
+        results = []
+        print(f"{'scenario':<24}{'size':<8}{'conc':>5}{'docs/s':>9}{'p50':>8}{'p95':>8}{'p99':>8}{'calls':>7}{'MB':>8}")
+        for scenario in args.scenarios.split(","):
+            for size in args.sizes.split(","):
+                documents = [make_document(DOC_SIZES[size], seed) for seed in range(args.docs)]
+                for concurrency in (int(level) for level in args.concurrency.split(",")):
+                    # A fresh manager per run keeps caches and RLHF state from leaking between runs
+                    manager = AgentManager(verbose=False, host=host, cache=ResponseCache() if args.cache else None)
+                    try:
+                        result = run_async(run_scenario(manager, scenario, documents, concurrency))
+                    finally:
+                        manager.close()
+                    result.update({"scenario": scenario, "size": size, "concurrency": concurrency})
+                    results.append(result)
+                    print(
+                        f"{scenario:<24}{size:<8}{concurrency:>5}{result['throughput']:>9.2f}"
+                        f"{result['p50'] or 0:>8.2f}{result['p95'] or 0:>8.2f}{result['p99'] or 0:>8.2f}"
+                        f"{result['llm_calls_per_doc']:>7.1f}{result['peak_memory_mb']:>8.1f}"
+                        + (f"  ({result['errors']} errors)" if result["errors"] else ""),
+                        flush=True
+                    )
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+# benchmarks/bench_startup.py
+"""
+Cold-start benchmark: import and construction time in fresh interpreters.
+
+Usage:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --runs 10 --json startup.json
+    python -m benchmarks.bench_startup --baseline startup.json   # exit 1 on a regression
+
+Each run starts a new Python process (nothing is warm in sys.modules) and measures the
+import of `agents`, the import of `app` (the Streamlit module, without running it), the
+construction of an AgentManager and the first `get_agent` call. No Ollama server is
+needed: nothing here talks to a model. Medians over `--runs` processes are reported.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# Stage name -> code run in the child after the previous stages; each stage is timed on its own
+STAGES = {
+    "import agents": "import agents",
+    "import app": "import app",
+    "AgentManager()": "manager = agents.AgentManager(verbose=False)",
+    "first get_agent": "manager.get_agent('chatbot')",
+}
+
+CHILD = """
+import json, sys, time
+timings = {}
+for name, code in json.loads(sys.argv[1]).items():
+    started = time.perf_counter()
+    try:
+        exec(code)
+    except ImportError as e:
+        timings[name] = None
+        print(f"{name}: {e}", file=sys.stderr)
+        continue
+    timings[name] = time.perf_counter() - started
+print(json.dumps(timings))
+"""
+
+
+def run_once(stages):
+    completed = subprocess.run(
+        [sys.executable, "-c", CHILD, json.dumps(stages)], capture_output=True, text=True, check=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1]), completed.stderr
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_startup", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes to measure.")
+    parser.add_argument("--json", help="Write the median timings to this JSON file.")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression vs the baseline.")
+    args = parser.parse_args(argv)
+
+    samples = {name: [] for name in STAGES}
+    warnings = set()
+    for _ in range(args.runs):
+        timings, stderr = run_once(STAGES)
+        warnings.update(line for line in stderr.splitlines() if line.strip())
+        for name, value in timings.items():
+            if value is not None:
+                samples[name].append(value)
+
+    results = {name: statistics.median(values) if values else None for name, values in samples.items()}
+    print(f"{'stage':<20}{'median ms':>12}{'min ms':>10}{'max ms':>10}")
+    for name, values in samples.items():
+        if not values:
+            print(f"{name:<20}{'skipped':>12}")
+            continue
+        print(f"{name:<20}{results[name] * 1000:>12.1f}{min(values) * 1000:>10.1f}{max(values) * 1000:>10.1f}")
+    for warning in sorted(warnings):
+        print(f"note: {warning}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = [
+            f"{name}: {baseline[name] * 1000:.1f}ms -> {value * 1000:.1f}ms"
+            for name, value in results.items()
+            if value is not None and baseline.get(name) and value > baseline[name] * (1 + args.tolerance)
+        ]
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+# benchmarks/fake_ollama.py
+"""
+Deterministic stand-in for the Ollama HTTP API, for benchmarks without a real model.
+
+Usage:
+    python -m benchmarks.fake_ollama --port 11500 --token-rate 200 --latency 0.05
+
+Implements /api/chat (streamed and not), /api/generate, /api/ps, /api/tags and
+/api/version. Requests with a `format` get a JSON validation object as the reply. Each reply costs `latency` plus prompt processing at `prompt-rate` tokens/s
+plus generation at `token-rate` tokens/s, and at most `parallel` requests are served at
+once (like OLLAMA_NUM_PARALLEL); the rest queue. Replies are derived from the prompt
+hash, so the same input always produces the same output and timing.
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = (
+    "patient presented with stable vitals and reported improvement after treatment the plan "
+    "includes follow up imaging medication review blood pressure monitoring and dietary advice "
+    "no acute distress was observed labs were within normal limits"
+).split()
+
+
+class FakeOllama:
+    def __init__(self, token_rate=200.0, prompt_rate=2000.0, latency=0.05, jitter=0.1,
+                 reply_tokens=120, parallel=4, seed=0):
+        """
+        Args:
+            token_rate (float): Generated tokens per second per request.
+            prompt_rate (float): Prompt tokens processed per second (prefill).
+            latency (float): Fixed overhead per request in seconds.
+            jitter (float): Relative spread of the latency, drawn deterministically per prompt.
+            reply_tokens (int): Reply length in tokens before num_predict is applied.
+            parallel (int): Requests generated concurrently; further requests wait.
+            seed (int): Mixed into the per-prompt randomness.
+        """
+        self.token_rate = token_rate
+        self.prompt_rate = prompt_rate
+        self.latency = latency
+        self.jitter = jitter
+        self.reply_tokens = reply_tokens
+        self.seed = seed
+        self.slots = threading.BoundedSemaphore(parallel)
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def plan(self, prompt, options, structured=False):
+        """
+        Returns (reply tokens, prompt token count, fixed delay) for a prompt.
+        """
+        digest = hashlib.sha256(f"{self.seed}:{prompt}".encode("utf-8")).digest()
+        rng = random.Random(digest)
+        limit = (options or {}).get("num_predict") or self.reply_tokens
+        count = max(1, min(limit, int(self.reply_tokens * rng.uniform(0.8, 1.2))))
+        tokens = [rng.choice(WORDS) for _ in range(count)]
+        if structured:
+            # Validation-shaped JSON; the analysis takes a quarter of the reply, like a short report
+            reply = json.dumps({
+                "score": rng.randint(3, 5), "analysis": " ".join(tokens[: max(1, count // 4)]),
+                "issues": [], "corrected": "",
+            })
+            tokens = reply.split(" ")
+        elif "Rating" in prompt or "rating" in prompt:
+            tokens += ["\nRating:", str(rng.randint(3, 5))]
+        delay = self.latency * (1 + rng.uniform(-self.jitter, self.jitter))
+        return tokens, max(1, len(prompt) // 4), delay
+
+    def generate(self, prompt, options, structured=False):
+        """
+        Yields (token, is_last) at the simulated pace and returns Ollama-style counters at the end.
+        """
+        tokens, prompt_tokens, delay = self.plan(prompt, options, structured)
+        with self._lock:
+            self.requests += 1
+        with self.slots:
+            started = time.perf_counter()
+            time.sleep(delay + prompt_tokens / self.prompt_rate)
+            prompt_done = time.perf_counter()
+            for index, token in enumerate(tokens):
+                time.sleep(1 / self.token_rate)
+                yield (" " if index else "") + token, None
+            finished = time.perf_counter()
+        yield "", {
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int((prompt_done - started) * 1e9),
+            "eval_count": len(tokens),
+            "eval_duration": int((finished - prompt_done) * 1e9),
+            "load_duration": 0,
+            "total_duration": int((finished - started) * 1e9),
+        }
+
+
+def make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _json(self, payload, status=200):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/api/version":
+                self._json({"version": "0.0.0-fake"})
+            elif self.path in ("/api/tags", "/api/ps"):
+                self._json({"models": []})
+            else:
+                self._json({"error": "not found"}, 404)
+
+        def do_HEAD(self):
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if self.path == "/api/chat":
+                prompt = "\n".join(message.get("content", "") for message in request.get("messages", []))
+            elif self.path == "/api/generate":
+                prompt = request.get("prompt", "")
+            else:
+                self._json({"error": "not found"}, 404)
+                return
+
+            model = request.get("model", "fake")
+            if self.path == "/api/generate" and not prompt:
+                self._json({"model": model, "response": "", "done": True})  # Model load request
+                return
+
+            chat = self.path == "/api/chat"
+            steps = fake.generate(prompt, request.get("options"), bool(request.get("format")))
+            if request.get("stream", True):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for text, final in steps:
+                    chunk = {"model": model, "done": final is not None}
+                    if chat:
+                        chunk["message"] = {"role": "assistant", "content": text}
+                    else:
+                        chunk["response"] = text
+                    chunk.update(final or {})
+                    line = (json.dumps(chunk) + "\n").encode("utf-8")
+                    self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+                return
+
+            parts, final = [], {}
+            for text, stats in steps:
+                parts.append(text)
+                final = stats or final
+            response = {"model": model, "done": True, **final}
+            if chat:
+                response["message"] = {"role": "assistant", "content": "".join(parts)}
+            else:
+                response["response"] = "".join(parts)
+            self._json(response)
+
+    return Handler
+
+
+def serve(port=11500, host="127.0.0.1", **options):
+    """
+    Starts a fake Ollama server in a daemon thread and returns (server, FakeOllama).
+    """
+    fake = FakeOllama(**options)
+    server = ThreadingHTTPServer((host, port), make_handler(fake))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-ollama", daemon=True).start()
+    return server, fake
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.fake_ollama", description="Run a fake Ollama server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--token-rate", type=float, default=200.0, help="Generated tokens per second.")
+    parser.add_argument("--prompt-rate", type=float, default=2000.0, help="Prompt tokens processed per second.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fixed seconds per request.")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Relative latency spread.")
+    parser.add_argument("--reply-tokens", type=int, default=120, help="Reply length before num_predict.")
+    parser.add_argument("--parallel", type=int, default=4, help="Requests served concurrently.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    server, _ = serve(
+        args.port, args.host, token_rate=args.token_rate, prompt_rate=args.prompt_rate, latency=args.latency,
+        jitter=args.jitter, reply_tokens=args.reply_tokens, parallel=args.parallel, seed=args.seed
+    )
+    print(f"Fake Ollama listening on http://{args.host}:{args.port}", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
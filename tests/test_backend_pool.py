@@ -0,0 +1,89 @@
+# tests/test_backend_pool.py
+
+import ollama
+import pytest
+import agents.agent_base as agent_base
+from agents.backend_pool import BackendPool, BackendUnavailableError
+
+
+def fail(pool, error):
+    with pytest.raises(type(error)):
+        with pool.lease():
+            raise error
+
+
+@pytest.fixture
+def pool():
+    return BackendPool(["http://a:11434"], failure_threshold=2, cooldown=60.0, acquire_timeout=0.1)
+
+
+def test_circuit_opens_after_consecutive_host_failures(pool):
+    fail(pool, ConnectionError("refused"))
+    assert not pool.backends[0].is_open()
+    fail(pool, ollama.ResponseError("overloaded", 503))
+    assert pool.backends[0].is_open()
+    with pytest.raises(BackendUnavailableError):
+        pool.acquire()
+
+
+def test_answers_about_the_request_do_not_open_the_circuit(pool):
+    for _ in range(3):
+        fail(pool, ollama.ResponseError("model 'x' not found", 404))
+    assert not pool.backends[0].is_open()
+    assert pool.backends[0].consecutive_failures == 0
+
+
+def test_half_open_circuit_admits_a_single_trial(pool):
+    backend = pool.backends[0]
+    fail(pool, ConnectionError("refused"))
+    fail(pool, ConnectionError("refused"))
+    backend.open_until = 1e-9  # Cooldown over
+
+    trial = pool.acquire()
+    assert backend.probing
+    with pytest.raises(BackendUnavailableError):
+        pool.acquire()  # Times out: only the trial may run
+    pool.release(trial, latency=0.1)
+    assert not backend.is_open() and not backend.is_half_open()
+    pool.release(pool.acquire(), latency=0.1)
+
+
+def test_failed_trial_reopens_the_circuit(pool):
+    backend = pool.backends[0]
+    backend.open_until = 1e-9
+    fail(pool, TimeoutError("timed out"))
+    assert backend.is_open()
+    assert not backend.probing
+
+
+def test_cancelled_trial_leaves_the_circuit_half_open(pool):
+    backend = pool.backends[0]
+    backend.open_until = 1e-9
+    pool.release(pool.acquire(), cancelled=True)
+    assert backend.is_half_open() and not backend.probing
+
+
+def test_requests_go_to_the_least_loaded_host():
+    pool = BackendPool(["http://a:11434", "http://b:11434"], max_concurrency=2)
+    first, second = pool.acquire(), pool.acquire()
+    assert {first.host, second.host} == {"http://a:11434", "http://b:11434"}
+    pool.release(first, latency=0.1)
+    assert pool.acquire() is first
+
+
+def test_health_check_closes_healthy_and_opens_unreachable_circuits(monkeypatch):
+    class Client:
+        def __init__(self, healthy):
+            self.healthy = healthy
+
+        def ps(self):
+            if not self.healthy:
+                raise ConnectionError("refused")
+            return {"models": []}
+
+    monkeypatch.setitem(agent_base._clients, "http://a:11434", Client(True))
+    monkeypatch.setitem(agent_base._clients, "http://b:11434", Client(False))
+    pool = BackendPool(["http://a:11434", "http://b:11434"], failure_threshold=1, cooldown=60.0)
+    fail(pool, ConnectionError("refused"))
+    assert pool.check_health() == {"http://a:11434": True, "http://b:11434": False}
+    assert [backend.is_open() for backend in pool.backends] == [False, True]
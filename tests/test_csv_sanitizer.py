@@ -0,0 +1,20 @@
+# tests/test_csv_sanitizer.py
+
+from agents.csv_sanitizer import infer_phi_columns
+
+
+def test_identifier_columns_are_inferred():
+    header = ["Name", "patient_name", "firstName", "DOB", "date_of_birth", "SSN", "MRN", "Phone Number",
+              "email_address", "Address", "zip_code", "attending_physician", "provider_name"]
+    assert infer_phi_columns(header) == {
+        "Name": "[PATIENT_NAME]", "patient_name": "[PATIENT_NAME]", "firstName": "[PATIENT_NAME]",
+        "DOB": "[DATE]", "date_of_birth": "[DATE]", "SSN": "[SSN]", "MRN": "[MRN]", "Phone Number": "[PHONE]",
+        "email_address": "[EMAIL]", "Address": "[LOCATION]", "zip_code": "[LOCATION]",
+        "attending_physician": "[PROVIDER_NAME]", "provider_name": "[PROVIDER_NAME]",
+    }
+
+
+def test_clinical_columns_are_not_identifiers():
+    header = ["medication_name", "test_name", "drug name", "hospital_name", "username", "renamed_flag",
+              "visit_date", "updated", "provider_id", "diagnosis"]
+    assert infer_phi_columns(header) == {}
@@ -0,0 +1,37 @@
+# tests/test_phi_rules.py
+
+import pytest
+from agents.phi_rules import PHIRuleEngine
+
+
+@pytest.fixture
+def engine():
+    return PHIRuleEngine()
+
+
+@pytest.mark.parametrize("text", [
+    "123456789",  # SSN without dashes or label
+    "4155551234",  # Phone number without separators
+    "ID A1234567",  # MRN-shaped identifier after a field label
+    "Record AB-99812",
+])
+def test_unrecognized_identifiers_escalate_to_llm(engine, text):
+    masked, _ = engine.mask(text)
+    assert engine.needs_llm(masked)
+
+
+def test_structured_record_resolves_without_llm(engine):
+    masked, _ = engine.mask("Patient: John Smith\nSSN: 123-45-6789\nPhone: (415) 555-1234\nMRN: AB12345")
+    assert masked == "Patient: [PATIENT_NAME]\nSSN: [SSN]\nPhone: [PHONE]\nMRN: [MRN]"
+    assert not engine.needs_llm(masked)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Patient: presented with chest pain", "Patient: presented with chest pain"),
+    ("Name: aspirin 81 mg", "Name: aspirin 81 mg"),
+    ("Dr. Smith Discharged the patient", "Dr. [PROVIDER_NAME] Discharged the patient"),
+    ("PATIENT NAME: Mary J. Watson\nAttending: Dr. Alice Brown",
+     "PATIENT NAME: [PATIENT_NAME]\nAttending: Dr. [PROVIDER_NAME]"),
+])
+def test_names_are_capitalized_tokens_only(engine, text, expected):
+    assert engine.mask(text)[0] == expected
@@ -0,0 +1,63 @@
+# tests/test_response_cache.py
+
+import agents.response_cache as response_cache
+from agents.generation_profile import GenerationProfile
+from agents.response_cache import ResponseCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_the_ttl(monkeypatch, tmp_path):
+    clock = Clock()
+    monkeypatch.setattr(response_cache.time, "time", clock)
+    cache = ResponseCache(ttl=60, path=str(tmp_path / "cache.sqlite"))
+    cache.set("key", "reply")
+    clock.now += 59
+    assert cache.get("key") == "reply"
+    clock.now += 2
+    assert cache.get("key") is None
+    assert ResponseCache(ttl=60, path=str(tmp_path / "cache.sqlite")).get("key") is None  # Removed from disk too
+
+
+def test_memory_tier_evicts_the_least_recently_used():
+    cache = ResponseCache(max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == ("1", None, "3")
+    assert cache.stats()["evictions"] == 1
+
+
+def test_disk_tier_serves_other_instances_and_is_bounded(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(max_entries=1, path=path, max_disk_entries=2)
+    for key in ("a", "b", "c"):
+        cache.set(key, key.upper())
+    reopened = ResponseCache(path=path)
+    assert (reopened.get("a"), reopened.get("b"), reopened.get("c")) == (None, "B", "C")
+    assert reopened.stats()["disk_hits"] == 2
+
+
+def test_temperature_gate():
+    cache = ResponseCache(max_temperature=0.3)
+    assert cache.accepts(GenerationProfile(temperature=0.0))
+    assert cache.accepts(GenerationProfile(temperature=0.3))
+    assert not cache.accepts(GenerationProfile(temperature=0.7))
+    assert ResponseCache().accepts(GenerationProfile(temperature=0.7))
+
+
+def test_key_covers_model_options_and_messages():
+    messages = [{"role": "user", "content": "hi"}]
+    profile = GenerationProfile(temperature=0.0)
+    key = ResponseCache.make_key("m", profile, messages)
+    assert key == ResponseCache.make_key("m", profile, [dict(message) for message in messages])
+    assert key != ResponseCache.make_key("other", profile, messages)
+    assert key != ResponseCache.make_key("m", GenerationProfile(temperature=0.1), messages)
+    assert key != ResponseCache.make_key("m", profile, messages, format="json")
@@ -0,0 +1,50 @@
+# tests/test_retrieval.py
+
+import re
+import pytest
+import agents.agent_base as agent_base
+from agents.sanitize_data_tool import SanitizeDataTool
+from agents.semantic_index import SemanticIndex
+
+NOTE = "Patient {name} was seen on {date}. Metformin {dose} mg daily; HbA1c {a1c}%."
+
+
+class WordEmbedder:
+    # Ignores names, digits and punctuation, so notes from one template embed identically
+    def embed(self, model, input):
+        vocabulary = ["patient", "was", "seen", "on", "metformin", "mg", "daily", "hba1c"]
+        return {"embeddings": [[float(re.findall(r"[a-z0-9]+", text.lower()).count(word)) for word in vocabulary]
+                               for text in input]}
+
+
+@pytest.fixture
+def tool(monkeypatch):
+    monkeypatch.setitem(agent_base._clients, None, WordEmbedder())
+    index = SemanticIndex()
+    tool = SanitizeDataTool(verbose=False)
+    tool.attach_semantic_index(index)
+    return tool
+
+
+def test_notes_differing_in_values_never_share_an_output(tool):
+    first = NOTE.format(name="John Smith", date="03/02/2024", dose=500, a1c=7.1)
+    second = NOTE.format(name="Mary Jones", date="04/11/2024", dose=1000, a1c=8.4)
+    tool.semantic_index.add("sanitize", first, "sanitized first note", rating=5)
+
+    similarity, _ = tool.semantic_index.search(second, "sanitize")[0]
+    assert similarity > 0.999
+    cached, exemplars = tool.retrieve(second)
+    assert cached is None
+    assert [record["output"] for record in exemplars] == ["sanitized first note"]
+
+
+def test_identical_input_is_answered_from_the_index(tool):
+    note = NOTE.format(name="John Smith", date="03/02/2024", dose=500, a1c=7.1)
+    tool.semantic_index.add("sanitize", note, "sanitized note", rating=5)
+    assert tool.retrieve(note) == ("sanitized note", [])
+
+
+def test_poorly_rated_outputs_are_not_reused(tool):
+    note = NOTE.format(name="John Smith", date="03/02/2024", dose=500, a1c=7.1)
+    tool.semantic_index.add("sanitize", note, "bad output", rating=2)
+    assert tool.retrieve(note) == (None, [])
@@ -0,0 +1,90 @@
+# tests/test_retry_policy.py
+
+import asyncio
+import ollama
+import pytest
+import agents.retry_policy as retry_policy
+from agents.retry_policy import EmptyResponseError, HedgePolicy, RetryPolicy
+
+
+class Flaky:
+    def __init__(self, *errors, result="ok"):
+        self.errors = list(errors)
+        self.result = result
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return self.result
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    slept = []
+    monkeypatch.setattr(retry_policy.time, "sleep", slept.append)
+    return slept
+
+
+def test_backoff_is_bounded_by_a_doubling_cap():
+    policy = RetryPolicy(base_delay=0.5, max_delay=3.0)
+    for retry, cap in [(1, 0.5), (2, 1.0), (3, 2.0), (4, 3.0), (8, 3.0)]:
+        assert all(0 <= policy.backoff(retry) <= cap for _ in range(200))
+
+
+def test_transient_errors_are_retried_until_success(sleeps):
+    func = Flaky(ConnectionError("refused"), ollama.ResponseError("busy", 503), EmptyResponseError("empty"))
+    assert RetryPolicy(max_retries=3).run(func, "Test") == "ok"
+    assert func.calls == 4
+    assert len(sleeps) == 3
+
+
+def test_gives_up_after_max_retries(sleeps):
+    func = Flaky(*[TimeoutError("slow")] * 5)
+    with pytest.raises(RuntimeError, match="after 3 attempt"):
+        RetryPolicy(max_retries=2).run(func, "Test")
+    assert func.calls == 3
+    assert len(sleeps) == 2
+
+
+@pytest.mark.parametrize("error", [ValueError("bug"), ollama.ResponseError("model not found", 404)])
+def test_permanent_errors_fail_at_once(sleeps, error):
+    func = Flaky(error)
+    with pytest.raises(RuntimeError):
+        RetryPolicy(max_retries=3).run(func, "Test")
+    assert func.calls == 1
+    assert sleeps == []
+
+
+def test_deadline_stops_retrying(monkeypatch, sleeps):
+    monkeypatch.setattr(retry_policy.random, "uniform", lambda low, high: high)
+    func = Flaky(*[ConnectionError("refused")] * 5)
+    with pytest.raises(RuntimeError):
+        RetryPolicy(max_retries=5, base_delay=1.0, deadline=1.5).run(func, "Test")
+    # Backoffs of 1s and 2s: the second would end past the 1.5s deadline
+    assert func.calls == 2
+    assert sleeps == [1.0]
+
+
+def test_async_run_retries(monkeypatch):
+    async def no_sleep(delay):
+        pass
+
+    monkeypatch.setattr(retry_policy.asyncio, "sleep", no_sleep)
+    func = Flaky(ConnectionError("refused"))
+
+    async def attempt():
+        return func()
+
+    assert asyncio.run(RetryPolicy(max_retries=1).arun(attempt, "Test")) == "ok"
+    assert func.calls == 2
+
+
+def test_hedge_delay_needs_samples_then_follows_the_quantile():
+    policy = HedgePolicy(quantile=0.9, min_samples=10, min_delay=0.05)
+    for latency in range(1, 10):
+        policy.record(latency / 10)
+    assert policy.delay() is None
+    policy.record(1.0)
+    assert policy.delay() == 1.0
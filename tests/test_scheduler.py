@@ -0,0 +1,101 @@
+# tests/test_scheduler.py
+
+import asyncio
+import threading
+import time
+import pytest
+from agents.scheduler import RequestScheduler, SchedulerRejectedError
+
+
+def test_waiter_on_a_closed_loop_is_skipped():
+    scheduler = RequestScheduler(max_in_flight=1)
+    scheduler.acquire("m", "summarize")
+
+    loop = asyncio.new_event_loop()
+    loop.create_task(scheduler.aacquire("m", "chat"))
+    loop.run_until_complete(asyncio.sleep(0))  # The async waiter is queued ...
+    loop.close()  # ... and its loop goes away without cancelling it
+
+    granted = threading.Event()
+    waiter = threading.Thread(target=lambda: (scheduler.acquire("m", "article"), granted.set()), daemon=True)
+    waiter.start()
+    while scheduler.stats()["queued"]["article"] == 0:
+        time.sleep(0.01)
+    scheduler.release("m")
+    waiter.join(5)
+    assert granted.is_set()
+    assert scheduler.stats()["in_flight"]["m"] == 1
+    assert scheduler.stats()["queued"] == {"chat": 0, "sanitize": 0, "summarize": 0, "article": 0}
+
+
+def wait_until(condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def queue_waiter(scheduler, priority, order):
+    thread = threading.Thread(target=lambda: (scheduler.acquire("m", priority), order.append(priority)), daemon=True)
+    thread.start()
+    wait_until(lambda: scheduler.stats()["queued"][priority] > 0)
+    return thread
+
+
+def test_slots_go_to_the_highest_priority_first():
+    scheduler = RequestScheduler(max_in_flight=1)
+    scheduler.acquire("m", "summarize")
+    order = []
+    for priority in ("article", "summarize", "chat"):
+        queue_waiter(scheduler, priority, order)
+    for served in range(1, 4):
+        scheduler.release("m")  # Each waiter keeps the slot it gets, so one is served per release
+        wait_until(lambda: len(order) == served)
+    assert order == ["chat", "summarize", "article"]
+
+
+def test_models_have_separate_limits():
+    scheduler = RequestScheduler(max_in_flight=1, model_limits={"big": 2})
+    scheduler.acquire("small", "chat")
+    scheduler.acquire("big", "chat")
+    scheduler.acquire("big", "chat")
+    assert scheduler.stats()["in_flight"] == {"small": 1, "big": 2}
+
+
+def test_waiting_too_long_is_rejected():
+    scheduler = RequestScheduler(max_in_flight=1, queue_timeout=0.05)
+    scheduler.acquire("m", "chat")
+    with pytest.raises(SchedulerRejectedError, match="Timed out"):
+        scheduler.acquire("m", "chat")
+    assert scheduler.stats()["timed_out"] == 1
+    assert scheduler.stats()["queued"]["chat"] == 0
+
+
+def test_full_queue_sheds_lower_classes_first():
+    scheduler = RequestScheduler(max_in_flight=1, max_queue=1)
+    scheduler.acquire("m", "summarize")
+    queue_waiter(scheduler, "summarize", [])
+    with pytest.raises(SchedulerRejectedError, match="Too many"):
+        scheduler.acquire("m", "article")
+    queue_waiter(scheduler, "chat", [])  # Chat only counts chat requests ahead of it
+    assert scheduler.stats()["rejected"] == 1
+
+
+def test_async_waiters_are_served_in_priority_order():
+    scheduler = RequestScheduler(max_in_flight=1)
+    order = []
+
+    async def request(priority):
+        async with scheduler.aslot("m", priority):
+            order.append(priority)
+            await asyncio.sleep(0)
+
+    async def main():
+        await scheduler.aacquire("m", "chat")
+        tasks = [asyncio.create_task(request(priority)) for priority in ("article", "sanitize", "chat")]
+        await asyncio.sleep(0)
+        scheduler.release("m")
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order == ["chat", "sanitize", "article"]
@@ -0,0 +1,12 @@
+# tests/test_term_cloud.py
+
+from utils.term_cloud import tokenize
+
+
+def test_placeholders_are_not_tokens():
+    text = "[PATIENT_NAME] saw [PROVIDER_NAME] on [DATE]; [LAB_RESULT] showed anemia, treated with [MEDICATION]."
+    assert list(tokenize(text)) == ["saw", "showed", "anemia", "treated"]
+
+
+def test_stopwords_and_short_tokens_are_dropped():
+    assert list(tokenize("The patient reports chest pain in the ER")) == ["chest", "pain"]
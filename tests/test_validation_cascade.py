@@ -0,0 +1,65 @@
+# tests/test_validation_cascade.py
+
+import json
+import pytest
+import agents.agent_base as agent_base
+from agents.validator_agent import ValidatorAgent
+
+DRAFT, LARGE = "draft-model", "large-model"
+
+
+class FakeClient:
+    def __init__(self, draft_reply):
+        self.draft_reply = draft_reply
+        self.models = []
+
+    def chat(self, model, **kwargs):
+        self.models.append(model)
+        if model == DRAFT:
+            if isinstance(self.draft_reply, Exception):
+                raise self.draft_reply
+            return {"message": {"content": self.draft_reply}}
+        return {"message": {"content": json.dumps({"score": 3, "analysis": "large", "issues": [], "corrected": ""})}}
+
+
+def reply(score):
+    return json.dumps({"score": score, "analysis": "draft", "issues": [], "corrected": ""})
+
+
+def validate(monkeypatch, draft_reply):
+    client = FakeClient(draft_reply)
+    monkeypatch.setitem(agent_base._clients, None, client)
+    agent = ValidatorAgent(max_retries=1, verbose=False)
+    agent.model, agent.draft_model = LARGE, DRAFT
+    return agent.evaluate("topic", "article"), client.models
+
+
+@pytest.mark.parametrize("score", [1, 2, 4, 5])
+def test_confident_draft_verdicts_stand(monkeypatch, score):
+    evaluation, models = validate(monkeypatch, reply(score))
+    assert models == [DRAFT]
+    assert (evaluation["score"], evaluation["model"]) == (score, DRAFT)
+
+
+def test_borderline_draft_verdict_is_escalated(monkeypatch):
+    evaluation, models = validate(monkeypatch, reply(3))
+    assert models == [DRAFT, LARGE]
+    assert evaluation["model"] == LARGE
+
+
+def test_unparseable_draft_reply_is_escalated(monkeypatch):
+    evaluation, models = validate(monkeypatch, "Looks good to me.")
+    assert models == [DRAFT, LARGE]
+    assert (evaluation["analysis"], evaluation["model"]) == ("large", LARGE)
+
+
+def test_failed_draft_call_is_escalated(monkeypatch):
+    evaluation, models = validate(monkeypatch, ConnectionError("draft host down"))
+    assert models[-1] == LARGE and set(models[:-1]) == {DRAFT}
+    assert evaluation["model"] == LARGE
+
+
+def test_escalation_band_is_configurable(monkeypatch):
+    monkeypatch.setattr(ValidatorAgent, "escalation_band", (2, 4))
+    _, models = validate(monkeypatch, reply(2))
+    assert models == [DRAFT, LARGE]
@@ -0,0 +1,170 @@
+# utils/feedback_store.py
+
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+from utils.logger import logger
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS feedback (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    section TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    ai_rating REAL,
+    human_rating REAL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS feedback_section_time ON feedback (section, created_at);
+CREATE INDEX IF NOT EXISTS feedback_rating ON feedback (section, human_rating);
+CREATE INDEX IF NOT EXISTS feedback_time ON feedback (created_at);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+class FeedbackStore:
+    def __init__(self, path="feedback_store.db"):
+        """
+        Append-only feedback storage on SQLite in WAL mode.
+
+        Every rating is one INSERT in its own transaction, so writes are atomic, cost the
+        same however large the store grows, and concurrent Streamlit sessions do not clobber
+        each other. Entries are indexed by section, rating and time.
+
+        Args:
+            path (str): SQLite database file.
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+            db.commit()
+
+    def _connect(self):
+        # One short-lived connection per operation keeps the store safe across threads and processes
+        db = sqlite3.connect(self.path, timeout=30)
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def add(self, section, entry, created_at=None):
+        """
+        Appends one feedback entry and returns its id.
+        """
+        with closing(self._connect()) as db, db:
+            cursor = db.execute(
+                "INSERT INTO feedback (section, created_at, ai_rating, human_rating, payload) VALUES (?, ?, ?, ?, ?)",
+                (
+                    section,
+                    created_at if created_at is not None else time.time(),
+                    entry.get("ai_rating"),
+                    entry.get("human_rating"),
+                    json.dumps(entry, ensure_ascii=False),
+                )
+            )
+            return cursor.lastrowid
+
+    def query(self, section=None, min_rating=None, max_rating=None, since=None, until=None, limit=None, newest_first=True):
+        """
+        Returns feedback entries filtered by section, human rating range and time range.
+
+        Each entry is the stored dict plus `id`, `section` and `created_at`.
+        """
+        clauses, params = [], []
+        for clause, value in (
+            ("section = ?", section),
+            ("human_rating >= ?", min_rating),
+            ("human_rating <= ?", max_rating),
+            ("created_at >= ?", since),
+            ("created_at < ?", until),
+        ):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+
+        sql = "SELECT id, section, created_at, payload FROM feedback"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY created_at DESC, id DESC" if newest_first else " ORDER BY created_at, id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        with closing(self._connect()) as db:
+            rows = db.execute(sql, params).fetchall()
+
+        entries = []
+        for entry_id, entry_section, created_at, payload in rows:
+            entry = json.loads(payload)
+            entry.update({"id": entry_id, "section": entry_section, "created_at": created_at})
+            entries.append(entry)
+        return entries
+
+    def count(self, section=None):
+        with closing(self._connect()) as db:
+            if section is None:
+                return db.execute("SELECT COUNT(*) FROM feedback").fetchone()[0]
+            return db.execute("SELECT COUNT(*) FROM feedback WHERE section = ?", (section,)).fetchone()[0]
+
+    def compact(self, max_age=None):
+        """
+        Drops duplicate entries (same section and payload, keeping the oldest), optionally
+        entries older than `max_age` seconds, then checkpoints the WAL and vacuums the file.
+
+        Returns:
+            int: Number of entries removed.
+        """
+        with closing(self._connect()) as db:
+            with db:
+                removed = db.execute(
+                    "DELETE FROM feedback WHERE id NOT IN (SELECT MIN(id) FROM feedback GROUP BY section, payload)"
+                ).rowcount
+                if max_age is not None:
+                    removed += db.execute("DELETE FROM feedback WHERE created_at < ?", (time.time() - max_age,)).rowcount
+            db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            db.execute("VACUUM")
+        logger.info(f"[FeedbackStore] Compaction removed {removed} entries.")
+        return removed
+
+    def migrate_json(self, json_path):
+        """
+        Imports the legacy `{section: [entries]}` JSON file once; the file itself is left untouched.
+
+        Returns:
+            int: Number of entries imported (0 if missing or already migrated).
+        """
+        if not os.path.exists(json_path):
+            return 0
+        marker = f"migrated:{os.path.abspath(json_path)}"
+        with closing(self._connect()) as db:
+            if db.execute("SELECT 1 FROM meta WHERE key = ?", (marker,)).fetchone():
+                return 0
+
+            with open(json_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+
+            # Legacy entries carry no timestamp; keep their order using the file's mtime as the base
+            base_time = os.path.getmtime(json_path)
+            imported = 0
+            with db:
+                for section, entries in data.items():
+                    for offset, entry in enumerate(entries):
+                        db.execute(
+                            "INSERT INTO feedback (section, created_at, ai_rating, human_rating, payload) VALUES (?, ?, ?, ?, ?)",
+                            (
+                                section,
+                                base_time - len(entries) + offset,
+                                entry.get("ai_rating"),
+                                entry.get("human_rating"),
+                                json.dumps(entry, ensure_ascii=False),
+                            )
+                        )
+                        imported += 1
+                db.execute("INSERT INTO meta (key, value) VALUES (?, ?)", (marker, str(time.time())))
+
+        logger.info(f"[FeedbackStore] Migrated {imported} entries from {json_path}.")
+        return imported
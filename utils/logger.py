@@ -1,14 +1,98 @@
 # utils/logger.py
 
 from loguru import logger
+from contextlib import contextmanager
+from contextvars import ContextVar
+from uuid import uuid4
+import hashlib
+import json
+import random
 import sys
 import os
 
+# LOG_FORMAT=json writes one JSON object per line (for log shippers); "text" is human-readable
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FILE_LEVEL = os.getenv("LOG_FILE_LEVEL", "DEBUG")
+# How prompt/response text appears in logs: "hash" (length + digest only), "truncate" or "full"
+LOG_CONTENT = os.getenv("LOG_CONTENT", "hash")
+LOG_CONTENT_CHARS = int(os.getenv("LOG_CONTENT_CHARS", "80"))
+# Fraction of per-call content records (logged with sample=True) that are kept; errors are never sampled
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+
+request_id_var = ContextVar("request_id", default=None)
+
+
+@contextmanager
+def request_context(request_id=None):
+    """
+    Tags every log record emitted in this context (threads and asyncio tasks started from it
+    included) with a correlation ID: the given one, else the current one, else a new one.
+    """
+    token = request_id_var.set(request_id or request_id_var.get() or uuid4().hex[:12])
+    try:
+        yield request_id_var.get()
+    finally:
+        request_id_var.reset(token)
+
+
+def redact(text):
+    """
+    Renders message content for logs according to LOG_CONTENT, so PHI stays out of them by default.
+    """
+    if text is None:
+        return ""
+    text = str(text)
+    if LOG_CONTENT == "full":
+        return text
+    if LOG_CONTENT == "truncate":
+        if len(text) <= LOG_CONTENT_CHARS:
+            return text
+        return f"{text[:LOG_CONTENT_CHARS]}… (+{len(text) - LOG_CONTENT_CHARS} chars)"
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+    return f"<{len(text)} chars sha256:{digest}>"
+
+
+def _add_context(record):
+    record["extra"].setdefault("request_id", request_id_var.get() or "-")
+    # Decide sampling once per record so the console and the file keep the same records
+    record["extra"]["keep"] = (
+        not record["extra"].get("sample")
+        or record["level"].no >= logger.level("WARNING").no
+        or random.random() < LOG_SAMPLE_RATE
+    )
+    if LOG_FORMAT == "json":
+        extra = {key: value for key, value in record["extra"].items() if key not in ("json", "sample", "keep")}
+        payload = {
+            "time": record["time"].isoformat(),
+            "level": record["level"].name,
+            "module": record["name"],
+            "message": record["message"],
+            **extra,
+        }
+        if record["exception"] is not None:
+            payload["exception"] = repr(record["exception"].value)
+        record["extra"]["json"] = json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def _sampled(record):
+    return record["extra"].get("keep", True)
+
+
 # Create logs directory if it doesn't exist
 if not os.path.exists("logs"):
     os.makedirs("logs")
 
-# Configure logger
+if LOG_FORMAT == "json":
+    CONSOLE_FORMAT = FILE_FORMAT = "{extra[json]}"
+else:
+    CONSOLE_FORMAT = "<green>{time}</green> <level>{message}</level> <dim>[{extra[request_id]}]</dim>"
+    FILE_FORMAT = "{time} {level} [{extra[request_id]}] {message}"
+
+# Configure logger. Sinks are enqueued: records go through a queue to a background
+# thread, so disk and console writes never block the calling (request) thread.
 logger.remove()  # Remove the default logger
-logger.add(sys.stdout, level="INFO", format="<green>{time}</green> <level>{message}</level>")
-logger.add("logs/multi_agent_system.log", rotation="1 MB", retention="10 days", level="DEBUG", format="{time} {level} {message}")
+logger.configure(patcher=_add_context)
+logger.add(sys.stdout, level=LOG_LEVEL, format=CONSOLE_FORMAT, filter=_sampled, enqueue=True)
+logger.add("logs/multi_agent_system.log", rotation="1 MB", retention="10 days", level=LOG_FILE_LEVEL,
+           format=FILE_FORMAT, filter=_sampled, enqueue=True)
@@ -0,0 +1,154 @@
+# utils/term_cloud.py
+
+import hashlib
+import html
+import re
+import threading
+from collections import Counter, OrderedDict
+from io import BytesIO
+
+# Common English function words; kept here so tokenizing does not need the wordcloud package
+ENGLISH_STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have
+having he her here hers herself him himself his how however i if in into is it its itself just me more
+most my myself no nor not now of off on once only or other our ours ourselves out over own same she
+should so some such than that the their theirs them themselves then there these they this those through
+to too under until up very was we were what when where which while who whom why will with would you
+your yours yourself yourselves per via may might must shall upon within without across among
+""".split())
+
+# Words that appear in nearly every clinical note and would crowd out the informative terms
+MEDICAL_STOPWORDS = frozenset("""
+patient patients pt pts report reports reported reporting noted notes note history hx presents presented
+presenting present visit visits seen today daily day days week weeks month months year years yr yrs
+time times follow followup follow-up plan plans continue continued given mg ml mcg dose doses twice
+prior previous current currently also per status normal within limits denies denied states stated
+mr mrs ms dr doctor physician clinic hospital admitted admission discharge discharged summary
+name dob phone date age old male female redacted
+""".split())
+
+STOPWORDS = ENGLISH_STOPWORDS | MEDICAL_STOPWORDS
+
+TOKEN_PATTERN = re.compile(r"[A-Za-z][A-Za-z0-9'-]*[A-Za-z0-9]")
+PLACEHOLDER_PATTERN = re.compile(r"\[[A-Z_]+\]")  # Redaction tags such as [PATIENT_NAME]
+
+
+def tokenize(text, stopwords=STOPWORDS, min_length=3):
+    """
+    Yields lowercase word tokens of `text`, without stopwords, placeholders and short tokens.
+    """
+    for match in TOKEN_PATTERN.finditer(PLACEHOLDER_PATTERN.sub(" ", text)):
+        token = match.group().lower()
+        if len(token) >= min_length and token not in stopwords:
+            yield token
+
+
+def text_key(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class TermCloud:
+    def __init__(self, width=800, height=400, max_words=25, colormap="Set2", cache_size=32):
+        """
+        Word clouds built from term frequencies that are computed once per document.
+
+        A document is tokenized into a Counter the first time it is seen; the PNG and the HTML
+        tag cloud are both rendered from those frequencies. Results are cached by a hash of the
+        text, so the cache does not keep whole documents alive. Rendering goes straight from
+        WordCloud to a PNG buffer, without pyplot and its global figure state.
+
+        Args:
+            width (int): Image width in pixels.
+            height (int): Image height in pixels.
+            max_words (int): Terms shown per cloud.
+            colormap (str): Matplotlib colormap name used by WordCloud.
+            cache_size (int): Documents whose frequencies and renders are kept.
+        """
+        self.width = width
+        self.height = height
+        self.max_words = max_words
+        self.colormap = colormap
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._frequencies = OrderedDict()  # text hash -> {term: count}
+        self._renders = OrderedDict()  # (text hash, mode) -> PNG bytes or HTML
+
+    def _remember(self, cache, key, value):
+        with self._lock:
+            cache[key] = value
+            cache.move_to_end(key)
+            while len(cache) > self.cache_size:
+                cache.popitem(last=False)
+
+    def _lookup(self, cache, key):
+        with self._lock:
+            value = cache.get(key)
+            if value is not None:
+                cache.move_to_end(key)
+            return value
+
+    def frequencies(self, text):
+        """
+        Returns the `max_words` most frequent terms of `text` as {term: count}.
+        """
+        key = text_key(text)
+        cached = self._lookup(self._frequencies, key)
+        if cached is None:
+            cached = dict(Counter(tokenize(text)).most_common(self.max_words))
+            self._remember(self._frequencies, key, cached)
+        return cached
+
+    def png(self, text):
+        """
+        Returns the word cloud of `text` as PNG bytes, or None if it has no terms left.
+        """
+        key = (text_key(text), "png")
+        cached = self._lookup(self._renders, key)
+        if cached is not None:
+            return cached
+        frequencies = self.frequencies(text)
+        if not frequencies:
+            return None
+        from wordcloud import WordCloud  # Heavy import, only paid when an image is drawn
+
+        cloud = WordCloud(width=self.width, height=self.height, max_words=self.max_words,
+                          background_color="white", colormap=self.colormap)
+        image = cloud.generate_from_frequencies(frequencies).to_image()
+        buffer = BytesIO()
+        image.save(buffer, format="PNG", optimize=True)
+        rendered = buffer.getvalue()
+        self._remember(self._renders, key, rendered)
+        return rendered
+
+    def html(self, text, min_size=0.9, max_size=2.6):
+        """
+        Returns a lightweight HTML tag cloud of `text` (font size scaled by frequency), or "".
+        """
+        key = (text_key(text), "html")
+        cached = self._lookup(self._renders, key)
+        if cached is not None:
+            return cached
+        frequencies = self.frequencies(text)
+        if not frequencies:
+            return ""
+        low, high = min(frequencies.values()), max(frequencies.values())
+        spread = (high - low) or 1
+        tags = []
+        for term in sorted(frequencies):
+            size = min_size + (max_size - min_size) * (frequencies[term] - low) / spread
+            tags.append(
+                f"<span title='{frequencies[term]}' style='font-size:{size:.2f}em;margin:0 .35em;"
+                f"display:inline-block'>{html.escape(term)}</span>"
+            )
+        rendered = f"<div class='tag-cloud' style='line-height:1.6;text-align:center'>{''.join(tags)}</div>"
+        self._remember(self._renders, key, rendered)
+        return rendered
+
+    def render(self, text, mode="image"):
+        """
+        Returns the cloud of `text` in `mode`: "image" (PNG bytes) or "html".
+        """
+        if mode == "html":
+            return self.html(text)
+        return self.png(text)